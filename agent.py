@@ -1,34 +1,2181 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
+import csv
 import json
+import os
 import re
+import sqlite3
+import numpy as np
 import requests
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Iterator
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict, is_dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from collections import OrderedDict, deque
+from functools import wraps
+from zoneinfo import ZoneInfo
+import asyncio
+import bisect
+import contextvars
+import difflib
+import hashlib
+import hmac
+import io
+import heapq
+import ipaddress
+import itertools
+import math
+import queue
+import random
+import socket
+import socketserver
+import threading
 import time
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit
+
+try:
+    import orjson  # Optional; several times faster than the standard library encoder
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-ALPHA_VANTAGE_API_KEY = "YOUR_ALPHA_VANTAGE_API_KEY"  # Replace with your actual Alpha Vantage API key
-NEWS_API_KEY = "YOUR_NEWS_API_KEY"  # Replace with your actual News API key
+ALPHA_VANTAGE_API_KEY = "YOUR_ALPHA_VANTAGE_API_KEY"  # Replace with your actual Alpha Vantage API key
+NEWS_API_KEY = "YOUR_NEWS_API_KEY"  # Replace with your actual News API key
+
+# Admission control settings
+ADMISSION_MAX_IN_FLIGHT = 32  # Requests handled at once per worker process
+ADMISSION_MAX_QUEUE = 64  # Requests waiting for a slot before new ones are shed
+ADMISSION_QUEUE_TIMEOUT = 2.0  # Longest a request waits for a slot
+ADMISSION_RETRY_AFTER = 2  # Retry-After seconds sent with a 503
+ADMISSION_ASYNC_POLL = 0.01  # Seconds between checks for coroutines waiting for a slot
+# The async /analyze holds no thread per request, so it admits far more at once
+ADMISSION_ASYNC_MAX_IN_FLIGHT = 2000
+ADMISSION_ASYNC_MAX_QUEUE = 1000
+
+# Pipeline execution settings
+PIPELINE_PARALLEL = True  # Run independent agents concurrently
+PIPELINE_CONCURRENT_STEPS = 3  # Most steps one query runs at once (price, price change and news)
+PIPELINE_MAX_WORKERS = ADMISSION_MAX_IN_FLIGHT * PIPELINE_CONCURRENT_STEPS  # Every admitted query's steps can run at once
+PIPELINE_START_POLL = 0.05  # Seconds between checks for queued steps having started
+PIPELINE_STEP_TIMEOUT = 15.0  # Default per-step timeout in seconds
+PIPELINE_PARTIAL_RESULTS = True  # Continue with remaining steps when an optional step fails
+REQUEST_DEADLINE = 20.0  # End-to-end budget in seconds for one analysis, including time queued for admission
+
+# Instrumentation settings
+METRICS_PREFIX = "stock_analysis"
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Latency buckets in seconds
+PAYLOAD_LOG_SAMPLE_RATE = 0.0  # Fraction of agent payloads logged at INFO; all are logged at DEBUG
+
+# Multi-worker settings
+# host:port of a shared backend server (see run_workers); unset keeps cache and quota state in-process
+SHARED_BACKEND_ADDRESS = os.environ.get("STOCK_ANALYSIS_BACKEND")
+# Shared secret every backend call carries; required to serve the backend on anything but loopback
+SHARED_BACKEND_SECRET = os.environ.get("STOCK_ANALYSIS_BACKEND_SECRET")
+SHARED_BACKEND_TIMEOUT = 2.0  # Socket timeout for backend calls
+SHARED_BACKEND_MAX_KEYS = 100000  # Values held by the backend server before the oldest are dropped
+SHARED_LOCK_TIMEOUT = 30.0  # Longest another worker waits on a single-flight load before loading itself
+SHARED_LOCK_POLL = 0.05  # Seconds between checks while another worker loads
+WORKER_COUNT = 4  # Processes started by run_workers
+
+# Response cache settings
+CACHE_MAX_BYTES = 32 * 1024 * 1024  # Approximate memory cap for cached upstream responses
+CACHE_TTLS = {
+    "GLOBAL_QUOTE": 15,  # Quotes go stale within seconds
+    "NEWS_SENTIMENT": 600,  # News is refreshed every few minutes
+    "LISTING_STATUS": 24 * 3600,  # Listings change at most daily
+    # TIME_SERIES_DAILY entries live until the next market close
+}
+CACHE_SIZE_SAMPLE = 16  # Items of a large value serialized to estimate its size
+CACHE_STALE_GRACE = 600.0  # Seconds past expiry an entry may still answer when its reload fails or runs out of time
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_CLOSE_HOUR = 16
+
+# Persistent response cache settings (shared by all worker processes on a host)
+DISK_CACHE_ENABLED = True
+DISK_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alpha_vantage_cache.sqlite3")
+DISK_CACHE_MAX_AGE = 7 * 24 * 3600  # Entries older than this are deleted by compaction
+DISK_CACHE_COMPACT_INTERVAL = 3600  # Seconds between background compactions
+
+# Alpha Vantage rate limiting (free tier defaults)
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+RATE_LIMIT_PER_MINUTE = 5
+RATE_LIMIT_PER_DAY = 25
+RATE_LIMIT_MAX_QUEUE = 50  # Callers beyond this are rejected immediately
+PRIORITY_INTERACTIVE = 0  # Quotes the user is waiting on
+PRIORITY_NORMAL = 1  # Daily series
+PRIORITY_BACKGROUND = 2  # News and other non-urgent fetches
+RATE_LIMIT_ASYNC_POLL = 0.05  # Seconds between checks for coroutines waiting on the limiter
+RATE_LIMIT_MAX_WAIT = {  # Default queueing budget in seconds when the caller gives no deadline
+    PRIORITY_INTERACTIVE: 5.0,
+    PRIORITY_NORMAL: 8.0,
+    PRIORITY_BACKGROUND: 10.0
+}
+
+# Upstream HTTP client settings
+UPSTREAM_POOL_SIZE = 16  # Keep-alive connections per host
+UPSTREAM_CONNECT_TIMEOUT = 3.05
+UPSTREAM_READ_TIMEOUT = 10
+UPSTREAM_RETRIES = 2  # Retries for connection errors and 5xx responses
+UPSTREAM_BACKOFF = 0.5  # Exponential backoff factor in seconds
+UPSTREAM_BACKOFF_JITTER = 0.25  # Random jitter added to each backoff in seconds
+
+# Market data provider settings
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+YAHOO_HEADERS = {"User-Agent": "Mozilla/5.0"}  # Yahoo refuses the default python-requests agent
+PROVIDER_ORDER = ["alpha_vantage", "yahoo"]  # Tried in this order while their circuits are closed
+PROVIDER_HEDGE_AFTER = {"quote": 1.5, "daily_bars": 4.0, "news": 3.0}  # Seconds before the next provider is also asked
+PROVIDER_POOL_SIZE = 32  # Threads running provider calls, so a slow one can be hedged
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that take a provider out of rotation
+BREAKER_RESET_TIMEOUT = 30.0  # Seconds before an open circuit lets a trial request through
+
+# Response settings
+RESPONSE_VERSIONS_MAX = 10000  # (ticker, timeframe) pairs whose ETag first-seen time is remembered for Last-Modified
+
+# Async server settings
+ASYNC_THREAD_POOL_SIZE = 64  # Threads for agents that only have a blocking execute
+
+# Record/replay settings
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Batch analysis settings
+BATCH_MAX_TICKERS = 500
+BATCH_MAX_CONCURRENCY = 8  # Tickers analyzed at once per batch
+BULK_QUOTES_ENABLED = True  # REALTIME_BULK_QUOTES needs a premium key; disabled automatically if refused
+BULK_QUOTES_CHUNK = 100  # Symbols per bulk quote request
+BULK_QUOTES_RETRY_AFTER = 300  # Seconds to use per-ticker quotes after a transient bulk failure
+BATCH_REQUIRED_RESULTS = {"ticker_price": "price_info", "ticker_price_change": "price_change_info"}  # Step -> result key; a batch ticker fails if any has an error
+TICKER_SYMBOL_PATTERN = re.compile(r'^[A-Z][A-Z0-9.\-]{0,9}$')
+
+# Price history settings
+TIMEFRAMES = {  # Lookback per timeframe: ("bars", n) counts trading days, ("days", n) calendar days
+    "1D": ("bars", 1),
+    "5D": ("bars", 5),
+    "1M": ("days", 30),
+    "3M": ("days", 91),
+    "6M": ("days", 182),
+    "YTD": ("ytd", 0),
+    "1Y": ("days", 365)
+}
+HISTORY_COMPACT_DAYS = 140  # Calendar days covered by outputsize=compact (100 trading days)
+TRADING_DAYS_PER_YEAR = 252
+MOVING_AVERAGE_WINDOWS = (20, 50, 200)
+VOLATILITY_WINDOW = 20  # Trading days used for realised volatility
+
+# News ingestion settings
+NEWS_FETCH_LIMIT = 50  # Articles requested per NEWS_SENTIMENT call
+NEWS_MAX_ARTICLES = 5000  # Stored articles before the oldest are evicted
+NEWS_RESULTS = 5  # Articles returned per analysis
+NEWS_TIME_FORMAT = "%Y%m%dT%H%M%S"  # Alpha Vantage time_published
+
+# Sentiment aggregation settings
+SENTIMENT_WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+SENTIMENT_BUCKET_SECONDS = 300  # Resolution of the rolling windows
+SENTIMENT_BULLISH_THRESHOLD = 0.15  # Alpha Vantage labels scores >= 0.15 Somewhat-Bullish, <= -0.15 Somewhat-Bearish
+
+# Screener settings
+SCREENER_INITIAL_CAPACITY = 1024  # Rows allocated up front; doubled when full
+SCREENER_DEFAULT_LIMIT = 20
+SCREENER_MAX_LIMIT = 500
+
+# Intraday bar settings
+INTRADAY_BAR_SECONDS = {"1min": 60, "5min": 300, "15min": 900}  # Bar sizes rolled up from observed quotes
+INTRADAY_TIMEFRAMES = {  # Sub-day lookback per timeframe: (bar size, bars)
+    "15min": ("1min", 15),
+    "30min": ("1min", 30),
+    "1H": ("5min", 12),
+    "4H": ("15min", 16)
+}
+INTRADAY_MAX_BYTES_PER_TICKER = 64 * 1024  # Each ticker's ring buffers are sized to fit this
+INTRADAY_MAX_TICKERS = 500  # Least recently quoted tickers are dropped beyond this
+
+# Cache warming settings
+WARM_ENABLED = True
+WARM_WATCHLIST = []  # Tickers preloaded at startup and kept warm, e.g. ["TSLA", "AAPL"]
+WARM_TOP_N = 10  # Most requested tickers kept warm in addition to the watchlist
+WARM_INTERVAL = 5.0  # Seconds between warming passes
+WARM_LEAD = 10.0  # Refresh entries this many seconds before they expire
+WARM_BUDGET_SHARE = 0.2  # Fraction of the per-minute API quota warming may use
+WARM_HALF_LIFE = 3600.0  # Seconds for a ticker's request count to decay by half
+
+# Live quote subscription settings
+QUOTE_POLL_INTERVAL = 15.0  # Seconds between refreshes of a watched ticker
+QUOTE_POLL_BUDGET_SHARE = 0.5  # Fraction of the per-minute API quota pollers may use
+QUOTE_IDLE_TIMEOUT = 60.0  # Seconds a ticker keeps polling after its last subscriber leaves
+QUOTE_KEEPALIVE = 15.0  # Seconds between SSE keepalive comments
+QUOTE_SUBSCRIBER_QUEUE = 100  # Pending updates per subscriber before the oldest are dropped
+QUOTE_MAX_TICKERS = 20  # Tickers per subscription
+
+# Ticker resolution settings
+# Alpha Vantage LISTING_STATUS export (symbol,name,exchange,assetType,ipoDate,delistingDate,status)
+SYMBOL_UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "listing_status.csv")
+SYMBOL_UNIVERSE_FETCH = True  # Download LISTING_STATUS in the background when there is no listing file
+FUZZY_MIN_LENGTH = 4  # Shortest word considered for typo-tolerant matching
+FUZZY_MIN_SIMILARITY = 0.8
+# Capitalised words that are not tickers
+TICKER_STOPWORDS = {
+    "A", "I", "AI", "AM", "AN", "AND", "ANY", "ARE", "AS", "AT", "ATH", "BE", "BUY", "BY", "CEO", "CFO", "CTO",
+    "DID", "DO", "DOW", "EPS", "ETF", "EU", "EV", "FED", "FOR", "GDP", "HOW", "IN", "IPO", "IS", "IT", "ITS",
+    "ME", "MY", "NEWS", "NOW", "OF", "OK", "ON", "OR", "PE", "SEC", "SELL", "SO", "THE", "TO", "UK", "UP", "US",
+    "USA", "USD", "WHAT", "WHY", "YOY", "YTD"
+}
+# Words dropped from the end of listing names to form the alias users actually type
+COMPANY_NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "llc", "lp", "holdings",
+    "holding", "group", "sa", "nv", "ag", "se", "the", "class", "a", "b", "c", "common", "stock", "shares",
+    "ordinary", "new", "com"
+}
+
+@dataclass(slots=True)
+class PriceChange:
+    """How far the price moved over a timeframe"""
+    timeframe: str
+    change: float
+    change_percent: float
+
+@dataclass(slots=True)
+class AnalysisSummary:
+    text: str
+    sentiment: str
+    trend: Optional[Dict[str, Dict[str, Any]]]  # SentimentAggregator.snapshot
+
+@dataclass(slots=True)
+class StockData:
+    """The /analyze response for one ticker"""
+    ticker: str
+    company_name: str
+    current_price: float
+    change: PriceChange
+    news: List["NewsItem"]
+    analysis: AnalysisSummary
+    timestamp: str
+
+    def _body(self) -> Dict[str, Any]:
+        """Response fields that come from the underlying data, i.e. everything but the timestamp"""
+        return {
+            "ticker": self.ticker,
+            "company_name": self.company_name,
+            "current_price": self.current_price,
+            "price_change": self.change.change,
+            "price_change_percent": self.change.change_percent,
+            "sentiment": self.analysis.sentiment,
+            "sentiment_trend": self.analysis.trend,
+            "news_count": len(self.news),
+            "recent_news": [item.to_dict() for item in self.news[:3]],  # Top 3 news items
+            "analysis": self.analysis.text
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self._body(), "timestamp": self.timestamp, "success": True}
+
+    def to_json(self) -> bytes:
+        return dumps_json(self.to_dict())
+
+    def etag(self) -> str:
+        """Changes whenever the quote, price change, news or analysis does; unaffected by the timestamp"""
+        return hashlib.blake2b(dumps_json(self._body()), digest_size=12).hexdigest()
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if is_dataclass(value):
+        return asdict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_json(data: Any) -> bytes:
+    """Compact JSON, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, separators=(",", ":"), default=_json_default).encode()
+
+class Metrics:
+    """Thread-safe counters and latency histograms rendered in the Prometheus text format"""
+
+    def __init__(self, buckets: tuple = METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Optional[Dict[str, str]]) -> tuple:
+        return tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, amount: float = 1):
+        key = (name, self._labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        key = (name, self._labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += value
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus exposition text for all metrics plus the given point-in-time gauges"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            full = f"{METRICS_PREFIX}_{name}"
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{self._format_labels(labels)} {value}")
+
+        for (name, labels), values in histograms:
+            full = f"{METRICS_PREFIX}_{name}"
+            if full not in typed:
+                lines.append(f"# TYPE {full} histogram")
+                typed.add(full)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                bucket_labels = self._format_labels(labels, 'le="%s"' % bound)
+                lines.append(f"{full}_bucket{bucket_labels} {cumulative}")
+            cumulative += values[len(self.buckets)]
+            bucket_labels = self._format_labels(labels, 'le="+Inf"')
+            lines.append(f"{full}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{full}_sum{self._format_labels(labels)} {values[-1]}")
+            lines.append(f"{full}_count{self._format_labels(labels)} {cumulative}")
+
+        for name, value in sorted((gauges or {}).items()):
+            full = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {full} gauge")
+            lines.append(f"{full} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def record_fallback(agent: str):
+    """Count a response served from demo data instead of upstream"""
+    metrics.inc("agent_fallbacks_total", {"agent": agent})
+
+def demo_number(text: str, modulo: int) -> int:
+    """A number in [0, modulo) derived from text, the same in every worker (the built-in hash() is salted per process)"""
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big") % modulo
+
+# time.monotonic() by which the request being served must answer; None outside a request
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the work could start"""
+
+def time_left() -> Optional[float]:
+    """Seconds until the current request's deadline, or None when there is none"""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def out_of_time() -> bool:
+    """Whether the current request's deadline has passed"""
+    left = time_left()
+    return left is not None and left <= 0
+
+def within_deadline(deadline: float) -> float:
+    """The earlier of deadline and the current request's deadline"""
+    request = request_deadline.get()
+    return deadline if request is None else min(deadline, request)
+
+def _instrument(method):
+    """Time an agent's execute and count errors; the context's deadline applies to everything it calls
+
+    A context without a deadline leaves the caller's deadline in force rather than clearing it.
+    """
+    @wraps(method)
+    def wrapper(self, context):
+        start = time.perf_counter()
+        status = "error"
+        token = request_deadline.set(context["deadline"]) if context.get("deadline") is not None else None
+        try:
+            result = method(self, context)
+            status = "error" if isinstance(result, dict) and "error" in result else "ok"
+            return result
+        finally:
+            if token is not None:
+                request_deadline.reset(token)
+            metrics.observe("agent_execute_seconds", time.perf_counter() - start, {"agent": self.name})
+            metrics.inc("agent_executions_total", {"agent": self.name, "status": status})
+    return wrapper
+
+def _instrument_async(method):
+    """Coroutine version of _instrument"""
+    @wraps(method)
+    async def wrapper(self, context):
+        start = time.perf_counter()
+        status = "error"
+        token = request_deadline.set(context["deadline"]) if context.get("deadline") is not None else None
+        try:
+            result = await method(self, context)
+            status = "error" if isinstance(result, dict) and "error" in result else "ok"
+            return result
+        finally:
+            if token is not None:
+                request_deadline.reset(token)
+            metrics.observe("agent_execute_seconds", time.perf_counter() - start, {"agent": self.name})
+            metrics.inc("agent_executions_total", {"agent": self.name, "status": status})
+    return wrapper
+
+def seconds_until_market_close(now: Optional[datetime] = None) -> float:
+    """Seconds until the next weekday market close, when a new daily bar appears"""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    close = now.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if now >= close:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return max(60.0, (close - now).total_seconds())
+
+def last_market_close(now: Optional[datetime] = None) -> datetime:
+    """The most recent weekday market close"""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    close = now.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if now < close:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+def is_fresh(function: str, fetched_at: float) -> bool:
+    """Whether a response fetched at a wall-clock time is still within its freshness window"""
+    if function == "TIME_SERIES_DAILY":
+        return fetched_at >= last_market_close().timestamp()
+    return time.time() - fetched_at < cache_ttl(function)
+
+def cache_ttl(function: str) -> float:
+    """Freshness window for an Alpha Vantage function"""
+    if function == "TIME_SERIES_DAILY":
+        return seconds_until_market_close()
+    return CACHE_TTLS.get(function, 60)
+
+class LocalBackend:
+    """Expiring values, named locks and token buckets held in this process
+
+    The reference implementation of the shared backend interface. Alone it keeps a single
+    process's state; behind serve_backend it is shared by every worker that connects.
+    """
+
+    def __init__(self, max_keys: int = SHARED_BACKEND_MAX_KEYS):
+        self.max_keys = max_keys
+        self.values = {}  # key -> (expires_at, value)
+        self.locks = {}  # name -> (expires_at, token)
+        self.buckets = {}  # name -> ([levels], updated)
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(value, seconds left) for a live key, else None"""
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                return None
+            remaining = entry[0] - time.time()
+            if remaining <= 0:
+                del self.values[key]
+                return None
+            return entry[1], remaining
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self.lock:
+            self.values.pop(key, None)
+            self.values[key] = (time.time() + ttl, value)
+            if len(self.values) > self.max_keys:
+                now = time.time()
+                for expired in [k for k, (expires, _) in self.values.items() if expires <= now]:
+                    del self.values[expired]
+                while len(self.values) > self.max_keys:
+                    del self.values[next(iter(self.values))]
+
+    def delete(self, key: str):
+        with self.lock:
+            self.values.pop(key, None)
+
+    def clear(self, prefix: str = ""):
+        with self.lock:
+            for key in [k for k in self.values if k.startswith(prefix)]:
+                del self.values[key]
+
+    def acquire(self, name: str, ttl: float) -> Optional[str]:
+        """Take a named lock that expires after ttl; returns the token needed to release it, or None"""
+        with self.lock:
+            held = self.locks.get(name)
+            if held is not None and held[0] > time.time():
+                return None
+            token = os.urandom(8).hex()
+            self.locks[name] = (time.time() + ttl, token)
+            return token
+
+    def release(self, name: str, token: str):
+        with self.lock:
+            held = self.locks.get(name)
+            if held is not None and held[1] == token:
+                del self.locks[name]
+
+    def _refill(self, name: str, limits: List[List[float]]) -> List[float]:
+        """Current levels of a bucket set; limits are [capacity, period seconds] pairs. Call with the lock held"""
+        now = time.time()
+        levels, updated = self.buckets.get(name) or ([float(capacity) for capacity, _ in limits], now)
+        elapsed = now - updated
+        levels = [min(capacity, level + elapsed * capacity / period) for level, (capacity, period) in zip(levels, limits)]
+        self.buckets[name] = (levels, now)
+        return levels
+
+    def take_tokens(self, name: str, limits: List[List[float]], amount: float = 1.0) -> float:
+        """Take amount from every bucket if all have it and return 0, else the seconds until they will"""
+        with self.lock:
+            levels = self._refill(name, limits)
+            if all(level >= amount for level in levels):
+                self.buckets[name] = ([level - amount for level in levels], self.buckets[name][1])
+                return 0.0
+            return max(max(0.0, amount - level) * period / capacity
+                       for level, (capacity, period) in zip(levels, limits))
+
+    def bucket_levels(self, name: str, limits: List[List[float]]) -> List[float]:
+        with self.lock:
+            return self._refill(name, limits)
+
+    def cap_tokens(self, name: str, limits: List[List[float]], caps: List[Optional[float]]):
+        """Lower bucket levels to the given caps (None leaves a bucket alone)"""
+        with self.lock:
+            levels = self._refill(name, limits)
+            levels = [level if cap is None else min(level, cap) for level, cap in zip(levels, caps)]
+            self.buckets[name] = (levels, self.buckets[name][1])
+
+# Dataclass records that may be cached in a shared backend, by class name
+SHARED_RECORDS = {}
+
+def shared_record(cls):
+    """Class decorator: instances stored in a SocketBackend come back as the same record type"""
+    SHARED_RECORDS[cls.__name__] = cls
+    return cls
+
+def _encode_record(value):
+    if is_dataclass(value) and type(value).__name__ in SHARED_RECORDS:
+        return {"__record__": type(value).__name__, **asdict(value)}
+    return str(value)
+
+def _decode_record(data: Dict[str, Any]):
+    record = SHARED_RECORDS.get(data.get("__record__"))
+    if record is None:
+        return data
+    return record(**{k: v for k, v in data.items() if k != "__record__"})
+
+class SocketBackend:
+    """Client for a backend served by serve_backend; one JSON line per call over pooled connections"""
+
+    OPERATIONS = ("get", "set", "delete", "clear", "acquire", "release", "take_tokens", "bucket_levels", "cap_tokens")
+
+    def __init__(self, address: str, timeout: float = SHARED_BACKEND_TIMEOUT, secret: Optional[str] = SHARED_BACKEND_SECRET):
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self.secret = secret
+        self.connections = queue.LifoQueue()
+
+    def _call(self, op: str, *args):
+        try:
+            connection = self.connections.get_nowait()
+        except queue.Empty:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            connection = (sock, sock.makefile("rb"))
+        sock, reader = connection
+        try:
+            request = {"op": op, "args": args}
+            if self.secret:
+                request["secret"] = self.secret
+            sock.sendall(json.dumps(request, default=_encode_record).encode() + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("Backend closed the connection")
+        except OSError:
+            reader.close()
+            sock.close()
+            raise
+        self.connections.put(connection)
+        reply = json.loads(line, object_hook=_decode_record)
+        if "error" in reply:
+            raise Exception(f"Backend error: {reply['error']}")
+        return reply["result"]
+
+    def __getattr__(self, op: str):
+        if op not in self.OPERATIONS:
+            raise AttributeError(op)
+        return lambda *args: self._call(op, *args)
+
+def _is_loopback(host: str) -> bool:
+    """Whether every address host resolves to is a loopback address ("" and "0.0.0.0" are not)"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host or None, None, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses)
+
+def serve_backend(address: str = "127.0.0.1:0", backend: Optional[LocalBackend] = None,
+                  secret: Optional[str] = SHARED_BACKEND_SECRET) -> socketserver.ThreadingTCPServer:
+    """Serve a LocalBackend to other processes from a background thread; server.server_address is the bound port
+
+    The protocol has no other authentication, so with a secret every call must carry it, and
+    without one only loopback addresses may be served.
+    """
+    backend = backend or LocalBackend()
+    host, port = address.rsplit(":", 1)
+    if not secret and not _is_loopback(host):
+        raise ValueError(f"Refusing to serve the shared backend on {address} without a secret; "
+                         "set STOCK_ANALYSIS_BACKEND_SECRET or bind to a loopback address")
+
+    class BackendHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if secret and not hmac.compare_digest(str(request.get("secret", "")).encode(), secret.encode()):
+                        self.wfile.write(json.dumps({"error": "Unauthorized"}).encode() + b"\n")
+                        return
+                    if request["op"] not in SocketBackend.OPERATIONS:
+                        raise ValueError(f"Unknown operation {request['op']}")
+                    reply = {"result": getattr(backend, request["op"])(*request["args"])}
+                except Exception as e:
+                    reply = {"error": str(e)}
+                self.wfile.write(json.dumps(reply, default=str).encode() + b"\n")
+
+    class BackendServer(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    server = BackendServer((host, int(port)), BackendHandler)
+    threading.Thread(target=server.serve_forever, name="shared-backend", daemon=True).start()
+    logging.getLogger("SharedBackend").info(f"Serving shared backend on {server.server_address[0]}:{server.server_address[1]}")
+    return server
+
+shared_backend = SocketBackend(SHARED_BACKEND_ADDRESS) if SHARED_BACKEND_ADDRESS else None
+
+class _Flight:
+    """An in-progress upstream load that concurrent callers, threads and coroutines alike, wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.abandoned = False  # The leader was cancelled or ran out of time; waiters load for themselves
+        self.waiters = []  # (loop, asyncio.Future) per waiting coroutine
+        self.lock = threading.Lock()
+
+    def finish(self):
+        with self.lock:
+            self.done.set()
+            waiters, self.waiters = self.waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.done.is_set():
+                return
+            waiter = loop.create_future()
+            self.waiters.append((loop, waiter))
+        await waiter
+
+class ResponseCache:
+    """Thread-safe TTL cache with LRU eviction under a memory cap and single-flight loading
+
+    Threads and coroutines asking for the same key share one load, whichever of them leads it.
+    With a shared backend, local misses are looked up there next, and only the worker
+    holding the backend lock for a key loads it; the others wait for its result.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, backend=None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.entries = OrderedDict()  # key -> (expires_at, size, value)
+        self.flights = {}  # key -> _Flight
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0, "refreshes": 0,
+                         "stale_served": 0, "shared_hits": 0, "shared_errors": 0, "wait_timeouts": 0}
+        self.logger = logging.getLogger("ResponseCache")
+
+    def _join(self, key: tuple) -> tuple:
+        """(cached entry, None, False) on a hit, else (None, flight, whether we lead it)"""
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry, None, False
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.counters["coalesced"] += 1
+                return None, flight, False
+            flight = self.flights[key] = _Flight()
+            self.counters["misses"] += 1
+            return None, flight, True
+
+    @staticmethod
+    def _followed(flight: _Flight) -> bool:
+        """Whether a finished flight answers a waiter; False means the waiter should load for itself"""
+        if flight.abandoned and not out_of_time():
+            return False
+        if flight.error is not None:
+            if isinstance(flight.error, Exception):
+                raise flight.error
+            raise DeadlineExceeded("The load this request was waiting on was cancelled")
+        return True
+
+    def _wait_timed_out(self, key: tuple, loader, ttl: float):
+        """Answer a thread that gave up waiting on another caller's load, as _load_shared does
+
+        Past the request's deadline that is a stale entry or DeadlineExceeded; otherwise the
+        leader has hung and the thread loads for itself.
+        """
+        with self.lock:
+            self.counters["wait_timeouts"] += 1
+        if out_of_time():
+            error = DeadlineExceeded("Request deadline passed waiting on another caller's load")
+            stale = self._stale(key, error)
+            if stale is None:
+                raise error
+            return stale
+        value = loader()
+        if value:
+            self.put(key, value, ttl)
+        return value
+
+    def _fail(self, key: tuple, flight: _Flight, error: BaseException) -> bool:
+        """Record a leader's failed load; True when a stale value answers instead"""
+        flight.value = self._stale(key, error) if isinstance(error, Exception) else None
+        if flight.value is not None:
+            return True
+        flight.error = error
+        flight.abandoned = not isinstance(error, Exception) or isinstance(error, DeadlineExceeded) or out_of_time()
+        return False
+
+    def _land(self, key: tuple, flight: _Flight, ttl: Optional[float]):
+        """Store a leader's result and release its waiters"""
+        with self.lock:
+            del self.flights[key]
+            # Empty results are upstream failures in disguise; don't pin them
+            if flight.error is None and flight.value and ttl is not None:
+                self._store(key, flight.value, ttl)
+        flight.finish()
+
+    def get_or_load(self, key: tuple, loader, ttl: float):
+        """Return a fresh cached value, or load it once no matter how many callers ask concurrently"""
+        entry, flight, leader = self._join(key)
+        if entry is not None:
+            return entry[2]
+        if not leader:
+            give_up = within_deadline(time.monotonic() + SHARED_LOCK_TIMEOUT)
+            if not flight.done.wait(max(0.0, give_up - time.monotonic())):
+                return self._wait_timed_out(key, loader, ttl)
+            return flight.value if self._followed(flight) else self.get_or_load(key, loader, ttl)
+
+        try:
+            flight.value, ttl = self._load_shared(key, loader, ttl)
+        except BaseException as e:
+            if not self._fail(key, flight, e):
+                raise
+            ttl = None  # Keep the stale entry's expiry so the next caller tries again
+        finally:
+            self._land(key, flight, ttl)
+        return flight.value
+
+    async def get_or_load_async(self, key: tuple, loader, ttl: float):
+        """Coroutine version of get_or_load; loader is a no-argument coroutine function"""
+        entry, flight, leader = self._join(key)
+        if entry is not None:
+            return entry[2]
+        if not leader:
+            await flight.wait_async()
+            return flight.value if self._followed(flight) else await self.get_or_load_async(key, loader, ttl)
+
+        try:
+            flight.value, ttl = await self._load_shared_async(key, loader, ttl)
+        except BaseException as e:
+            if not self._fail(key, flight, e):
+                raise
+            ttl = None
+        finally:
+            self._land(key, flight, ttl)
+        return flight.value
+
+    def _shared_key(self, key: tuple) -> str:
+        return "cache:" + json.dumps(key, default=str)
+
+    def _shared_call(self, op: str, *args, default=None):
+        """Call the backend, treating an unreachable backend as a miss rather than an error"""
+        try:
+            return getattr(self.backend, op)(*args)
+        except Exception as e:
+            with self.lock:
+                self.counters["shared_errors"] += 1
+            self.logger.warning(f"Shared backend {op} failed: {e}")
+            return default
+
+    def _load_shared(self, key: tuple, loader, ttl: float) -> tuple:
+        """Run loader unless another worker has or is producing the value; returns (value, ttl)"""
+        if self.backend is None:
+            return loader(), ttl
+        name = self._shared_key(key)
+        give_up = within_deadline(time.monotonic() + SHARED_LOCK_TIMEOUT)
+        while True:
+            found = self._shared_call("get", name)
+            if found is not None:
+                with self.lock:
+                    self.counters["shared_hits"] += 1
+                return found[0], found[1]
+            # False when the backend is unreachable: load locally instead of waiting
+            token = self._shared_call("acquire", f"lock:{name}", SHARED_LOCK_TIMEOUT, default=False)
+            if token is not None or time.monotonic() >= give_up:
+                break
+            time.sleep(SHARED_LOCK_POLL)
+        if token is None and out_of_time():
+            raise DeadlineExceeded("Request deadline passed waiting on another worker's load")
+        try:
+            value = loader()
+            if value:
+                self._shared_call("set", name, value, ttl)
+            return value, ttl
+        finally:
+            if token:
+                self._shared_call("release", f"lock:{name}", token)
+
+    async def _load_shared_async(self, key: tuple, loader, ttl: float) -> tuple:
+        """_load_shared for coroutine loaders; backend calls run in the default executor"""
+        if self.backend is None:
+            return await loader(), ttl
+        loop = asyncio.get_running_loop()
+        name = self._shared_key(key)
+        give_up = within_deadline(time.monotonic() + SHARED_LOCK_TIMEOUT)
+        while True:
+            found = await loop.run_in_executor(None, self._shared_call, "get", name)
+            if found is not None:
+                with self.lock:
+                    self.counters["shared_hits"] += 1
+                return found[0], found[1]
+            token = await loop.run_in_executor(
+                None, lambda: self._shared_call("acquire", f"lock:{name}", SHARED_LOCK_TIMEOUT, default=False)
+            )
+            if token is not None or time.monotonic() >= give_up:
+                break
+            await asyncio.sleep(SHARED_LOCK_POLL)
+        if token is None and out_of_time():
+            raise DeadlineExceeded("Request deadline passed waiting on another worker's load")
+        try:
+            value = await loader()
+            if value:
+                await loop.run_in_executor(None, self._shared_call, "set", name, value, ttl)
+            return value, ttl
+        finally:
+            if token:
+                await loop.run_in_executor(None, self._shared_call, "release", f"lock:{name}", token)
+
+    def _lookup(self, key: tuple) -> Optional[tuple]:
+        """Fresh entry for key, counting the hit; call with the lock held"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry[0] > now:
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry
+        if entry[0] + CACHE_STALE_GRACE <= now:
+            self._remove(key)
+            self.counters["expirations"] += 1
+        return None
+
+    def _stale(self, key: tuple, error: Exception) -> Any:
+        """An expired entry still within CACHE_STALE_GRACE, to answer with when its reload failed"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] + CACHE_STALE_GRACE <= time.monotonic():
+                return None
+            self.counters["stale_served"] += 1
+        self.logger.warning(f"Serving stale {key[0]} for {key[1:]}: {error}")
+        return entry[2]
+
+    @staticmethod
+    def _size(value: Any) -> int:
+        """Approximate serialized size; large containers are measured from a sample of their items"""
+        if isinstance(value, dict) and len(value) > CACHE_SIZE_SAMPLE:
+            sample = dict(itertools.islice(value.items(), CACHE_SIZE_SAMPLE))
+            return len(value) * len(json.dumps(sample, default=str)) // CACHE_SIZE_SAMPLE
+        if isinstance(value, list) and len(value) > CACHE_SIZE_SAMPLE:
+            return len(value) * len(json.dumps(value[:CACHE_SIZE_SAMPLE], default=str)) // CACHE_SIZE_SAMPLE
+        return len(json.dumps(value, default=str))
+
+    def _store(self, key: tuple, value: Any, ttl: float):
+        """Insert an entry and evict least recently used entries over the memory cap"""
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, size, value)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: tuple):
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def expires_in(self, key: tuple) -> Optional[float]:
+        """Seconds until key expires, or None when it isn't cached"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry[0] - time.monotonic() if entry is not None else None
+
+    def refresh(self, key: tuple, loader, ttl: float):
+        """Load and replace an entry without evicting it first, so readers never miss while it reloads"""
+        value = loader()
+        if value:
+            with self.lock:
+                self._store(key, value, ttl)
+                self.counters["refreshes"] += 1
+            if self.backend is not None:
+                self._shared_call("set", self._shared_key(key), value, ttl)
+        return value
+
+    def put(self, key: tuple, value: Any, ttl: float):
+        """Store a value obtained outside get_or_load, e.g. from a bulk request"""
+        with self.lock:
+            self._store(key, value, ttl)
+        if self.backend is not None:
+            self._shared_call("set", self._shared_key(key), value, ttl)
+
+    def invalidate(self, key: Optional[tuple] = None):
+        """Drop one entry, or everything"""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+                self.total_bytes = 0
+            elif key in self.entries:
+                self._remove(key)
+        if self.backend is not None:
+            if key is None:
+                self._shared_call("clear", "cache:")
+            else:
+                self._shared_call("delete", self._shared_key(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+            return {
+                **self.counters,
+                "hit_ratio": round((self.counters["hits"] + self.counters["coalesced"]) / lookups, 4) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+response_cache = ResponseCache(backend=shared_backend)
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot be admitted within the caller's deadline"""
+
+# An Event set while the current call waits in a RateLimiter queue; lets ProviderRouter tell a call
+# held back by our own quota from a slow upstream
+rate_limit_waiting = contextvars.ContextVar("rate_limit_waiting", default=None)
+
+class RateLimiter:
+    """Token buckets (per minute and per day) with a bounded priority wait queue
+
+    The buckets live in a backend: a private LocalBackend by default, or a shared one so
+    every worker draws from the same quota. The wait queue orders callers within this process.
+    """
+
+    def __init__(self, per_minute: int = RATE_LIMIT_PER_MINUTE, per_day: int = RATE_LIMIT_PER_DAY,
+                 max_queue: int = RATE_LIMIT_MAX_QUEUE, backend=None, name: str = "alpha_vantage"):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_queue = max_queue
+        self.limits = [(per_minute, 60), (per_day, 86400)]
+        self.backend = backend if backend is not None else LocalBackend()
+        self.name = f"ratelimit:{name}"
+        self.queue = []  # heap of (priority, sequence)
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.counters = {"acquired": 0, "rejected": 0, "throttled": 0}
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.logger = logging.getLogger("RateLimiter")
+
+    def _levels(self) -> List[float]:
+        """Current [minute, day] token counts"""
+        return self.backend.bucket_levels(self.name, self.limits)
+
+    def _time_until(self, needed: float) -> float:
+        """Seconds until both buckets hold the given number of tokens"""
+        return max(max(0.0, needed - level) * period / capacity
+                   for level, (capacity, period) in zip(self._levels(), self.limits))
+
+    def _enqueue(self, priority: int, deadline: Optional[float], start: float) -> tuple:
+        """Admit a caller to the wait queue, or fail fast; call with the condition held"""
+        if len(self.queue) >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise RateLimitExceeded("Rate limiter queue is full")
+
+        ahead = sum(1 for queued_priority, _ in self.queue if queued_priority <= priority)
+        estimate = self._time_until(ahead + 1)
+        if deadline is not None and start + estimate > deadline:
+            self.counters["rejected"] += 1
+            raise RateLimitExceeded(f"Estimated rate limit wait of {estimate:.1f}s exceeds deadline")
+
+        entry = (priority, next(self.sequence))
+        heapq.heappush(self.queue, entry)
+        return entry
+
+    def _try_take(self, entry: tuple, start: float, deadline: Optional[float]) -> tuple:
+        """Take a token if the entry is at the head; returns (waited, retry_in). Call with the condition held"""
+        now = time.monotonic()
+        at_head = self.queue[0] == entry
+        token_wait = self.backend.take_tokens(self.name, self.limits) if at_head else None
+        if token_wait == 0:
+            heapq.heappop(self.queue)
+            waited = now - start
+            self.counters["acquired"] += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.condition.notify_all()
+            return waited, None
+
+        if deadline is not None and now >= deadline:
+            self.counters["rejected"] += 1
+            raise RateLimitExceeded("Deadline passed while waiting for rate limit")
+
+        # Only the head waits on the clock; the rest wait for the head to move
+        retry_in = token_wait
+        if deadline is not None:
+            retry_in = min(retry_in, deadline - now) if retry_in is not None else deadline - now
+        return None, retry_in
+
+    def _dequeue(self, entry: tuple):
+        self.queue.remove(entry)
+        heapq.heapify(self.queue)
+        self.condition.notify_all()
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> float:
+        """Block until a call may be made and return the time waited; deadline is a time.monotonic() value"""
+        start = time.monotonic()
+        waiting = rate_limit_waiting.get()
+        with self.condition:
+            entry = self._enqueue(priority, deadline, start)
+            try:
+                while True:
+                    waited, retry_in = self._try_take(entry, start, deadline)
+                    if waited is not None:
+                        return waited
+                    if waiting is not None:
+                        waiting.set()
+                    self.condition.wait(retry_in)
+            except RateLimitExceeded:
+                self._dequeue(entry)
+                raise
+            finally:
+                if waiting is not None:
+                    waiting.clear()
+
+    async def acquire_async(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> float:
+        """Like acquire, but waits without blocking the event loop"""
+        start = time.monotonic()
+        with self.condition:
+            entry = self._enqueue(priority, deadline, start)
+        try:
+            while True:
+                with self.condition:
+                    waited, retry_in = self._try_take(entry, start, deadline)
+                if waited is not None:
+                    return waited
+                # Threading notifications can't wake a coroutine, so poll
+                await asyncio.sleep(min(retry_in, RATE_LIMIT_ASYNC_POLL) if retry_in is not None else RATE_LIMIT_ASYNC_POLL)
+        except (RateLimitExceeded, asyncio.CancelledError):
+            with self.condition:
+                self._dequeue(entry)
+            raise
+
+    def report_throttled(self):
+        """Upstream said we're over quota: empty the minute bucket so callers back off for a full minute"""
+        with self.condition:
+            self.backend.cap_tokens(self.name, self.limits, [1.0 - self.per_minute, None])
+            self.counters["throttled"] += 1
+        self.logger.warning("Upstream rate limit hit; backing off")
+
+    def available(self) -> float:
+        """Tokens a new caller could take right now without waiting"""
+        with self.condition:
+            if self.queue:
+                return 0.0
+            return min(self._levels())
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and remaining tokens"""
+        with self.condition:
+            minute_tokens, day_tokens = self._levels()
+            acquired = self.counters["acquired"]
+            return {
+                **self.counters,
+                "queue_depth": len(self.queue),
+                "avg_wait_seconds": round(self.total_wait / acquired, 4) if acquired else 0.0,
+                "max_wait_seconds": round(self.max_wait, 4),
+                "minute_tokens": round(minute_tokens, 2),
+                "day_tokens": round(day_tokens, 2),
+                "shared": not isinstance(self.backend, LocalBackend)
+            }
+
+alpha_vantage_limiter = RateLimiter(backend=shared_backend)
+
+def request_timeout(timeout: tuple) -> tuple:
+    """(connect, read) timeouts cut short by the current request's deadline"""
+    left = time_left()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline passed before the upstream call")
+    return tuple(min(value, left) for value in timeout)
+
+class UpstreamClient:
+    """Shared keep-alive HTTP session with a sized connection pool and retries for upstream calls"""
+
+    def __init__(self, base_url: str = ALPHA_VANTAGE_URL, pool_size: int = UPSTREAM_POOL_SIZE,
+                 connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT, read_timeout: float = UPSTREAM_READ_TIMEOUT,
+                 retries: int = UPSTREAM_RETRIES, backoff: float = UPSTREAM_BACKOFF,
+                 backoff_jitter: float = UPSTREAM_BACKOFF_JITTER, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_jitter = backoff_jitter
+        # Retries are done here rather than by urllib3 so each attempt and backoff fits the request's deadline
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "errors": 0, "retries": 0}
+
+    def get(self, params: Dict[str, Any], url: Optional[str] = None,
+            headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET the upstream endpoint (base_url unless given) over a pooled connection
+
+        Connection errors, timeouts and 5xx responses are retried with backoff and jitter while the
+        request's deadline leaves time for another attempt.
+        """
+        with self.lock:
+            self.in_flight += 1
+            self.counters["requests"] += 1
+        try:
+            for attempt in range(self.retries + 1):
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff_jitter)
+                left = time_left()
+                last = attempt == self.retries or (left is not None and delay >= left)
+                try:
+                    response = self.session.get(url or self.base_url, params=params, headers=headers,
+                                                timeout=request_timeout(self.timeout))
+                    if response.status_code < 500 or last:
+                        return response
+                    response.close()  # Hand the connection back to the pool before retrying
+                except (requests.ConnectionError, requests.Timeout):
+                    if last:
+                        raise
+                with self.lock:
+                    self.counters["retries"] += 1
+                time.sleep(delay)
+        except requests.RequestException:
+            with self.lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilisation and connection reuse across all hosts"""
+        opened = served = idle = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            served += pool.num_requests
+            if pool.pool is not None:
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        with self.lock:
+            return {
+                **self.counters,
+                "in_flight": self.in_flight,
+                "pool_size": self.pool_size,
+                "pool_utilisation": round(self.in_flight / self.pool_size, 4),
+                "connections_opened": opened,
+                "connections_reused": max(0, served - opened),
+                "idle_connections": idle
+            }
+
+upstream_client = UpstreamClient()
+
+def use_upstream_client(client: UpstreamClient) -> UpstreamClient:
+    """Swap the shared upstream client, e.g. for one pointing at a local fake Alpha Vantage server"""
+    global upstream_client
+    previous, upstream_client = upstream_client, client
+    previous.close()
+    return previous
+
+class AsyncUpstreamClient:
+    """Non-blocking counterpart of UpstreamClient, used by the ASGI server"""
+
+    def __init__(self, base_url: str = ALPHA_VANTAGE_URL, pool_size: int = UPSTREAM_POOL_SIZE,
+                 connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT, read_timeout: float = UPSTREAM_READ_TIMEOUT,
+                 retries: int = UPSTREAM_RETRIES, backoff: float = UPSTREAM_BACKOFF,
+                 backoff_jitter: float = UPSTREAM_BACKOFF_JITTER):
+        import httpx
+
+        self.httpx = httpx
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_jitter = backoff_jitter
+        self.timeout = (connect_timeout, read_timeout)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        self.in_flight = 0
+        self.counters = {"requests": 0, "errors": 0, "retries": 0}
+
+    async def get(self, params: Dict[str, Any], url: Optional[str] = None):
+        """GET the upstream endpoint, retrying connection errors and 5xx responses with backoff and jitter"""
+        self.in_flight += 1
+        self.counters["requests"] += 1
+        try:
+            for attempt in range(self.retries + 1):
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff_jitter)
+                left = time_left()
+                last = attempt == self.retries or (left is not None and delay >= left)
+                connect, read = request_timeout(self.timeout)
+                try:
+                    response = await self.client.get(url or self.base_url, params=params,
+                                                     timeout=self.httpx.Timeout(read, connect=connect))
+                    if response.status_code < 500 or last:
+                        return response
+                    await response.aclose()
+                except self.httpx.TransportError:
+                    if last:
+                        self.counters["errors"] += 1
+                        raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "pool_size": self.pool_size,
+            "pool_utilisation": round(min(self.in_flight, self.pool_size) / self.pool_size, 4)
+        }
+
+async_upstream_client: Optional[AsyncUpstreamClient] = None
+
+def get_async_upstream_client() -> AsyncUpstreamClient:
+    """The shared async client, created on first use with the sync client's base URL"""
+    global async_upstream_client
+    if async_upstream_client is None:
+        async_upstream_client = AsyncUpstreamClient(base_url=upstream_client.base_url)
+    return async_upstream_client
+
+class StoredResponse:
+    """A raw upstream response replayed from the disk cache or a fixture"""
+
+    def __init__(self, text: str, status_code: int = 200):
+        self.text = text
+        self.status_code = status_code
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+class DiskCache:
+    """SQLite-backed tier of raw upstream responses that survives restarts
+
+    WAL mode and short autocommit statements make it safe for several worker processes on one host.
+    """
+
+    def __init__(self, path: str = DISK_CACHE_PATH, max_age: float = DISK_CACHE_MAX_AGE,
+                 compact_interval: float = DISK_CACHE_COMPACT_INTERVAL):
+        self.path = path
+        self.max_age = max_age
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "writes": 0, "expired": 0, "errors": 0}
+        self.logger = logging.getLogger("DiskCache")
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, function TEXT NOT NULL, body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses (fetched_at)")
+
+        if compact_interval:
+            threading.Thread(target=self._compact_loop, args=(compact_interval,), name="disk-cache-compact",
+                             daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(params: Dict[str, Any]) -> str:
+        """Canonical key for a request, independent of the API key"""
+        return json.dumps(sorted((k, str(v)) for k, v in params.items() if k != "apikey"))
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get(self, params: Dict[str, Any]) -> Optional[StoredResponse]:
+        """A fresh stored response for the request, or None"""
+        function = params.get("function", "")
+        try:
+            row = self._connection().execute(
+                "SELECT body, fetched_at FROM responses WHERE key = ?", (self.key(params),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Disk cache read failed: {e}")
+            self._count("errors")
+            return None
+        if row is None:
+            self._count("misses")
+            return None
+        if not is_fresh(function, row[1]):
+            self._count("stale")
+            return None
+        self._count("hits")
+        return StoredResponse(row[0])
+
+    def put(self, params: Dict[str, Any], body: str):
+        """Store a successful upstream response body"""
+        try:
+            self._connection().execute(
+                "INSERT INTO responses (key, function, body, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET body = excluded.body, fetched_at = excluded.fetched_at "
+                "WHERE excluded.fetched_at > responses.fetched_at",
+                (self.key(params), params.get("function", ""), body, time.time())
+            )
+            self._count("writes")
+        except sqlite3.Error as e:
+            self.logger.warning(f"Disk cache write failed: {e}")
+            self._count("errors")
+
+    def store_response(self, params: Dict[str, Any], response) -> None:
+        """Persist an upstream response if it is a usable payload rather than an error or rate-limit note"""
+        if response.status_code != 200:
+            return
+        if params.get("function") == "LISTING_STATUS":
+            # The one CSV endpoint; an error comes back as JSON instead
+            if response.text.startswith("symbol,"):
+                self.put(params, response.text)
+            return
+        try:
+            data = json.loads(response.text)
+        except ValueError:
+            return
+        if not isinstance(data, dict) or not data or {"Note", "Information", "Error Message"} & data.keys():
+            return
+        self.put(params, response.text)
+
+    def compact(self):
+        """Delete expired entries and fold the write-ahead log back into the database"""
+        try:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.max_age,)).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            with self.lock:
+                self.counters["expired"] += deleted
+            if deleted:
+                self.logger.info(f"Compacted disk cache, removed {deleted} expired entries")
+        except sqlite3.Error as e:
+            self.logger.warning(f"Disk cache compaction failed: {e}")
+            self._count("errors")
+
+    def _compact_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.compact()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+        try:
+            counters["entries"] = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            pass
+        return counters
+
+disk_cache: Optional[DiskCache] = None  # Opened by start_services() when DISK_CACHE_ENABLED
+
+def fixture_params(params: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+    """What identifies a recorded request: its parameters, plus the URL when it isn't the client's base URL"""
+    return {**params, "url": url} if url else params
+
+def fixture_path(fixture_dir: str, params: Dict[str, Any]) -> str:
+    """Where the recorded response for a request lives"""
+    digest = hashlib.sha1(DiskCache.key(params).encode()).hexdigest()[:16]
+    folder = params.get("function") or urlsplit(params.get("url", "")).netloc or "unknown"
+    return os.path.join(fixture_dir, folder, f"{digest}.json")
+
+class RecordingUpstreamClient(UpstreamClient):
+    """Live upstream client that also saves every response as a replayable fixture"""
+
+    def __init__(self, fixture_dir: str = FIXTURE_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.fixture_dir = fixture_dir
+
+    def get(self, params: Dict[str, Any], url: Optional[str] = None,
+            headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        response = super().get(params, url, headers)
+        recorded = fixture_params(params, url)
+        path = fixture_path(self.fixture_dir, recorded)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "params": {k: v for k, v in recorded.items() if k != "apikey"},
+                "status_code": response.status_code,
+                "body": response.text
+            }, f)
+        return response
+
+class ReplayUpstreamClient(UpstreamClient):
+    """Serves recorded fixtures instead of calling upstream, with optional injected latency and failures"""
+
+    def __init__(self, fixture_dir: str = FIXTURE_DIR, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        super().__init__(base_url=f"replay://{fixture_dir}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.counters["missing"] = 0
+        self.fixtures = {}
+        for root, _, files in os.walk(fixture_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    with open(os.path.join(root, name), encoding="utf-8") as f:
+                        fixture = json.load(f)
+                    self.fixtures[DiskCache.key(fixture["params"])] = (fixture["status_code"], fixture["body"])
+
+    def get(self, params: Dict[str, Any], url: Optional[str] = None,
+            headers: Optional[Dict[str, str]] = None) -> StoredResponse:
+        with self.lock:
+            self.in_flight += 1
+            self.counters["requests"] += 1
+        try:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+            if self.error_rate and self.random.random() < self.error_rate:
+                with self.lock:
+                    self.counters["errors"] += 1
+                raise requests.ConnectionError("Injected replay failure")
+
+            fixture = self.fixtures.get(DiskCache.key(fixture_params(params, url)))
+            if fixture is None:
+                with self.lock:
+                    self.counters["missing"] += 1
+                return StoredResponse(json.dumps({"Error Message": "No recorded fixture for this request"}), 404)
+            return StoredResponse(fixture[1], fixture[0])
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def premium_notice(data: Dict[str, Any]) -> bool:
+    """True when an "Information" payload says the key isn't entitled to the endpoint (not a quota notice)"""
+    return "premium endpoint" in str(data.get("Information", "")).lower()
+
+def alpha_vantage_get(params: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE,
+                      deadline: Optional[float] = None) -> requests.Response:
+    """Issue an Alpha Vantage request once the shared rate limiter admits it, unless it is stored on disk"""
+    if disk_cache is not None:
+        stored = disk_cache.get(params)
+        if stored is not None:
+            return stored
+    if deadline is None:
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT[priority]
+    alpha_vantage_limiter.acquire(priority, within_deadline(deadline))
+    function = params.get("function", "unknown")
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = upstream_client.get(params)
+        status = str(response.status_code)
+        if disk_cache is not None:
+            disk_cache.store_response(params, response)
+        return response
+    finally:
+        metrics.observe("upstream_request_seconds", time.perf_counter() - start, {"function": function})
+        metrics.inc("upstream_requests_total", {"function": function, "status": status})
+
+async def alpha_vantage_get_async(params: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE,
+                                  deadline: Optional[float] = None):
+    """Issue an Alpha Vantage request from a coroutine once the shared rate limiter admits it, unless it is stored on disk"""
+    loop = asyncio.get_running_loop()
+    if disk_cache is not None:
+        stored = await loop.run_in_executor(None, disk_cache.get, params)
+        if stored is not None:
+            return stored
+    if deadline is None:
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT[priority]
+    await alpha_vantage_limiter.acquire_async(priority, within_deadline(deadline))
+    function = params.get("function", "unknown")
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = await get_async_upstream_client().get(params)
+        status = str(response.status_code)
+        if disk_cache is not None:
+            await loop.run_in_executor(None, disk_cache.store_response, params, response)
+        return response
+    finally:
+        metrics.observe("upstream_request_seconds", time.perf_counter() - start, {"function": function})
+        metrics.inc("upstream_requests_total", {"function": function, "status": status})
+
+def yahoo_get(function: str, url: str, params: Dict[str, Any]) -> requests.Response:
+    """Issue a Yahoo Finance request through the shared upstream client, unless it is stored on disk
+
+    function is the Alpha Vantage function the request stands in for, so it is kept fresh as long.
+    """
+    stored_as = {"function": function, "url": url, **params}
+    if disk_cache is not None:
+        stored = disk_cache.get(stored_as)
+        if stored is not None:
+            return stored
+    label = f"yahoo_{function.lower()}"
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = upstream_client.get(params, url=url, headers=YAHOO_HEADERS)
+        status = str(response.status_code)
+        if disk_cache is not None:
+            disk_cache.store_response(stored_as, response)
+        return response
+    finally:
+        metrics.observe("upstream_request_seconds", time.perf_counter() - start, {"function": label})
+        metrics.inc("upstream_requests_total", {"function": label, "status": status})
+
+def cached_response(function: str):
+    """Serve an agent's upstream fetch from the shared response cache, keyed by function and arguments"""
+    def decorator(method):
+        if asyncio.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_wrapper(self, *args):
+                key = (function,) + args
+                return await response_cache.get_or_load_async(key, lambda: method(self, *args), cache_ttl(function))
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, *args):
+            key = (function,) + args
+            return response_cache.get_or_load(key, lambda: method(self, *args), cache_ttl(function))
+
+        def refresh(self, *args):
+            """Reload into the cache while readers keep getting the current entry"""
+            key = (function,) + args
+            return response_cache.refresh(key, lambda: method(self, *args), cache_ttl(function))
+
+        wrapper.cache_key = lambda *args: (function,) + args
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
+
+@shared_record
+@dataclass(slots=True)
+class Quote:
+    """Latest price for one ticker, whichever provider supplied it"""
+    price: float
+    last_updated: str  # YYYY-MM-DD trading day
+    market_status: str
+    provider: str
+    volume: Optional[float]  # Shares traded so far in the trading day
+    timestamp: float  # Unix time of the price; the fetch time when the provider only gives the day
+
+@shared_record
+@dataclass(slots=True)
+class NewsItem:
+    """One article as a provider returns it, or as a response lists it"""
+    title: str
+    summary: str
+    url: str
+    time_published: str  # NEWS_TIME_FORMAT
+    sentiment: str
+    sentiment_score: float = 0.0
+    tickers: Dict[str, List[float]] = field(default_factory=dict)  # ticker -> [sentiment score, relevance]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NewsItem":
+        """A listed article from the dicts agents pass through the pipeline"""
+        return cls(title=data.get("title", ""), summary=data.get("summary", ""), url=data.get("url", ""),
+                   time_published=data.get("time_published", ""), sentiment=data.get("sentiment", "Neutral"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "summary": self.summary,
+            "url": self.url,
+            "time_published": self.time_published,
+            "sentiment": self.sentiment
+        }
+
+DailyBars = Dict[str, List[float]]  # YYYY-MM-DD -> [open, high, low, close, volume]
+
+class ProviderError(Exception):
+    """A provider could not answer; counts against its circuit breaker"""
+
+class SymbolNotFound(ProviderError):
+    """The provider is healthy but has no data for the symbol"""
+
+provider_executor = ThreadPoolExecutor(max_workers=PROVIDER_POOL_SIZE, thread_name_prefix="provider")
+
+class MarketDataProvider:
+    """A source of quotes, daily bars and news, normalised to Quote, DailyBars and NewsItem"""
+
+    name = "provider"
+
+    def quote(self, ticker: str) -> Quote:
+        raise NotImplementedError
+
+    def daily_bars(self, ticker: str, outputsize: str) -> DailyBars:
+        """outputsize "compact" covers roughly the last 100 trading days, "full" everything available"""
+        raise NotImplementedError
+
+    def news(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        raise NotImplementedError
+
+    # Providers without a native async client run their blocking calls on the provider pool, so a
+    # stalled provider can't starve the default executor the disk cache and shared backend use
+    async def _in_pool(self, function, *args):
+        # Copy the context so the request's deadline still applies on the pool thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(provider_executor, context.run, function, *args)
+
+    async def quote_async(self, ticker: str) -> Quote:
+        return await self._in_pool(self.quote, ticker)
+
+    async def daily_bars_async(self, ticker: str, outputsize: str) -> DailyBars:
+        return await self._in_pool(self.daily_bars, ticker, outputsize)
+
+    async def news_async(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        return await self._in_pool(self.news, ticker, time_from)
+
+class AlphaVantageProvider(MarketDataProvider):
+    """Alpha Vantage through the shared rate limiter, disk cache and upstream client"""
+
+    name = "alpha_vantage"
+
+    def quote(self, ticker: str) -> Quote:
+        try:
+            return self._parse_quote(alpha_vantage_get(self._quote_params(ticker), PRIORITY_INTERACTIVE))
+        except requests.RequestException as e:
+            raise ProviderError(f"Network error: {str(e)}")
+        except ValueError as e:
+            raise ProviderError(f"JSON parsing error: {str(e)}")
+
+    async def quote_async(self, ticker: str) -> Quote:
+        try:
+            return self._parse_quote(await alpha_vantage_get_async(self._quote_params(ticker), PRIORITY_INTERACTIVE))
+        except ValueError as e:
+            raise ProviderError(f"JSON parsing error: {str(e)}")
+
+    def daily_bars(self, ticker: str, outputsize: str) -> DailyBars:
+        params = {
+            "function": "TIME_SERIES_DAILY",
+            "symbol": ticker,
+            "outputsize": outputsize,
+            "apikey": ALPHA_VANTAGE_API_KEY
+        }
+        data = self._json(alpha_vantage_get(params, PRIORITY_NORMAL))
+        if "Time Series (Daily)" not in data:
+            raise ProviderError("Unable to fetch daily series")
+        return {
+            date: [float(bar["1. open"]), float(bar["2. high"]), float(bar["3. low"]), float(bar["4. close"]),
+                   float(bar["5. volume"])]
+            for date, bar in data["Time Series (Daily)"].items()
+        }
+
+    def news(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        return self._parse_news(alpha_vantage_get(self._news_params(ticker, time_from), PRIORITY_BACKGROUND))
+
+    async def news_async(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        return self._parse_news(await alpha_vantage_get_async(self._news_params(ticker, time_from), PRIORITY_BACKGROUND))
+
+    def _json(self, response) -> Dict[str, Any]:
+        """Decode a response (requests, httpx or stored), raising on HTTP and API errors"""
+        if response.status_code != 200:
+            raise ProviderError(f"HTTP error: {response.status_code}")
+        data = response.json()
+        # Check for API limit exceeded; reported as a "Note" or, on newer keys, an "Information" notice
+        notice = data.get("Note") or data.get("Information")
+        if notice:
+            if premium_notice(data):
+                raise ProviderError(f"API notice: {notice}")
+            alpha_vantage_limiter.report_throttled()
+            raise ProviderError(f"API limit exceeded: {notice}")
+        # Check for invalid API key or symbol
+        if "Error Message" in data:
+            if "apikey" in data["Error Message"]:
+                raise ProviderError(f"API error: {data['Error Message']}")
+            raise SymbolNotFound(f"API error: {data['Error Message']}")
+        return data
 
-@dataclass
-class StockData:
-    """Data structure for stock information"""
-    ticker: str
-    company_name: str
-    current_price: float
-    price_change: float
-    price_change_percent: float
-    news: List[Dict]
-    analysis: str
+    def _quote_params(self, ticker: str) -> Dict[str, str]:
+        return {
+            "function": "GLOBAL_QUOTE",
+            "symbol": ticker,
+            "apikey": ALPHA_VANTAGE_API_KEY
+        }
+
+    def _parse_quote(self, response) -> Quote:
+        data = self._json(response)
+        quote = data.get("Global Quote")
+        if not quote:
+            raise SymbolNotFound("No Global Quote data in response")
+        price = quote.get("05. price", "0")
+        if not price or price == "0":
+            raise ProviderError("No price data available in response")
+        volume = quote.get("06. volume")
+        return Quote(
+            price=float(price),
+            last_updated=quote.get("07. latest trading day", ""),
+            market_status="CLOSED",  # Simplified
+            provider=self.name,
+            volume=float(volume) if volume else None,
+            timestamp=time.time()  # GLOBAL_QUOTE has no time of day
+        )
+
+    def _news_params(self, ticker: str, time_from: Optional[str] = None) -> Dict[str, Any]:
+        params = {
+            "function": "NEWS_SENTIMENT",
+            "tickers": ticker,
+            "apikey": ALPHA_VANTAGE_API_KEY,
+            "sort": "LATEST",
+            "limit": NEWS_FETCH_LIMIT
+        }
+        if time_from:
+            params["time_from"] = time_from
+        return params
+
+    def _parse_news(self, response) -> List[NewsItem]:
+        data = self._json(response)
+        return [
+            NewsItem(
+                title=item.get("title", ""),
+                summary=item.get("summary", ""),
+                url=item.get("url", ""),
+                time_published=item.get("time_published", ""),
+                sentiment=item.get("overall_sentiment_label", "Neutral"),
+                sentiment_score=float(item.get("overall_sentiment_score", 0) or 0),
+                tickers={
+                    entry["ticker"]: [float(entry.get("ticker_sentiment_score", 0) or 0),
+                                      float(entry.get("relevance_score", 0) or 0)]
+                    for entry in item.get("ticker_sentiment", [])
+                    if entry.get("ticker")
+                }
+            )
+            for item in data.get("feed", [])
+        ]
+
+class YahooFinanceProvider(MarketDataProvider):
+    """Yahoo Finance chart and search endpoints; no API key, no sentiment scores"""
+
+    name = "yahoo"
+
+    def quote(self, ticker: str) -> Quote:
+        result = self._chart(ticker, "GLOBAL_QUOTE", "1d")
+        meta = result["meta"]
+        price = meta.get("regularMarketPrice")
+        if not price:
+            raise ProviderError("No price data available in response")
+        timezone_name = ZoneInfo(meta.get("exchangeTimezoneName") or "America/New_York")
+        regular = (meta.get("currentTradingPeriod") or {}).get("regular") or {}
+        is_open = regular.get("start", 0) <= time.time() < regular.get("end", 0)
+        return Quote(
+            price=float(price),
+            last_updated=datetime.fromtimestamp(meta.get("regularMarketTime", time.time()), timezone_name).date().isoformat(),
+            market_status="OPEN" if is_open else "CLOSED",
+            provider=self.name,
+            volume=float(meta["regularMarketVolume"]) if meta.get("regularMarketVolume") else None,
+            timestamp=float(meta.get("regularMarketTime") or time.time())
+        )
+
+    def daily_bars(self, ticker: str, outputsize: str) -> DailyBars:
+        result = self._chart(ticker, "TIME_SERIES_DAILY", "6mo" if outputsize == "compact" else "max")
+        timezone_name = ZoneInfo(result["meta"].get("exchangeTimezoneName") or "America/New_York")
+        columns = (result.get("indicators", {}).get("quote") or [{}])[0]
+        fields = [columns.get(field) or [] for field in ("open", "high", "low", "close", "volume")]
+        bars = {}
+        for i, timestamp in enumerate(result.get("timestamp") or []):
+            bar = [values[i] if i < len(values) else None for values in fields]
+            if None not in bar:
+                bars[datetime.fromtimestamp(timestamp, timezone_name).date().isoformat()] = [float(v) for v in bar]
+        if not bars:
+            raise ProviderError("Unable to fetch daily series")
+        return bars
+
+    def news(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        params = {"q": ticker, "newsCount": NEWS_FETCH_LIMIT, "quotesCount": 0}
+        try:
+            response = yahoo_get("NEWS_SENTIMENT", YAHOO_SEARCH_URL, params)
+        except requests.RequestException as e:
+            raise ProviderError(f"Network error: {str(e)}")
+        items = []
+        for item in self._json(response).get("news", []):
+            published = datetime.fromtimestamp(item.get("providerPublishTime", 0), timezone.utc).strftime(NEWS_TIME_FORMAT)
+            if time_from and published < time_from:
+                continue
+            items.append(NewsItem(
+                title=item.get("title", ""),
+                summary=item.get("publisher", ""),
+                url=item.get("link", ""),
+                time_published=published,
+                sentiment="Neutral",
+                sentiment_score=0.0,
+                # Zero relevance keeps unscored articles out of the weighted sentiment averages
+                tickers={related: [0.0, 0.0] for related in set(item.get("relatedTickers") or []) | {ticker}}
+            ))
+        return items
+
+    def _chart(self, ticker: str, function: str, range_: str) -> Dict[str, Any]:
+        try:
+            response = yahoo_get(function, YAHOO_CHART_URL.format(ticker=ticker), {"range": range_, "interval": "1d"})
+        except requests.RequestException as e:
+            raise ProviderError(f"Network error: {str(e)}")
+        if response.status_code == 404:
+            raise SymbolNotFound(f"Unknown symbol {ticker}")
+        chart = self._json(response).get("chart") or {}
+        if not chart.get("result"):
+            raise SymbolNotFound(str(chart.get("error") or "No chart data in response"))
+        return chart["result"][0]
+
+    def _json(self, response) -> Dict[str, Any]:
+        """Decode a response, raising ProviderError on HTTP errors and bodies that aren't a JSON object"""
+        if response.status_code != 200:
+            raise ProviderError(f"HTTP error: {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise ProviderError(f"JSON parsing error: {str(e)}")
+        if not isinstance(data, dict):
+            raise ProviderError("Unexpected response format")
+        return data
+
+class CircuitBreaker:
+    """Opens after consecutive failures; once the reset timeout passes, one trial call decides whether it closes"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one trial at a time"""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self.lock:
+            self.trial_in_flight = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # A failed trial restarts the cool-down
+                self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """A call was cancelled before it could succeed or fail"""
+        with self.lock:
+            self.trial_in_flight = False
+
+class ProviderRouter:
+    """Routes each request to the first healthy provider, hedging slow calls and failing over on errors
+
+    Providers are tried in priority order, skipping any whose circuit is open. If the current
+    call hasn't answered within PROVIDER_HEDGE_AFTER for the operation, the next provider is
+    asked too and the first success wins; a failure moves straight on to the next provider.
+
+    A thread can't be cancelled, so in call() the losing attempt of a hedge runs to completion
+    and, for Alpha Vantage, still spends rate-limit quota. A call that is slow only because it
+    is queued on the rate limiter is therefore not hedged. call_async() cancels the loser.
+    """
+
+    def __init__(self, providers: List[MarketDataProvider], hedge_after: Optional[Dict[str, float]] = None):
+        self.providers = providers
+        self.hedge_after = PROVIDER_HEDGE_AFTER if hedge_after is None else hedge_after
+        self.breakers = {provider.name: CircuitBreaker() for provider in providers}
+        self.executor = provider_executor
+        self.lock = threading.Lock()
+        self.counters = {"hedged": 0, "hedge_wins": 0, "hedges_skipped": 0, "failovers": 0, "short_circuited": 0,
+                         "exhausted": 0}
+        self.logger = logging.getLogger("ProviderRouter")
+
+    def _count(self, counter: str):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def _next_allowed(self, remaining: Iterator[MarketDataProvider]) -> Optional[MarketDataProvider]:
+        for provider in remaining:
+            if self.breakers[provider.name].allow():
+                return provider
+            self._count("short_circuited")
+        return None
+
+    def _submit(self, provider: MarketDataProvider, operation: str, args: tuple) -> tuple:
+        """Start an attempt on the pool, carrying the request's deadline with it
+
+        Returns the future and an Event that is set while the attempt waits on the rate limiter.
+        """
+        context = contextvars.copy_context()
+        waiting = threading.Event()
+        context.run(rate_limit_waiting.set, waiting)
+        return self.executor.submit(context.run, self._attempt, provider, operation, args), waiting
+
+    def _finish(self, provider: MarketDataProvider, operation: str, start: float, error: Optional[Exception]):
+        """Record the outcome of one provider call with its breaker and metrics"""
+        if error is not None and (isinstance(error, DeadlineExceeded) or out_of_time()):
+            # Running out of the request's time says nothing about the provider's health
+            self.breakers[provider.name].abandon()
+        else:
+            # Neither does a missing symbol
+            self.breakers[provider.name].record(error is None or isinstance(error, SymbolNotFound))
+        status = "ok" if error is None else type(error).__name__
+        labels = {"provider": provider.name, "operation": operation}
+        metrics.observe("provider_request_seconds", time.perf_counter() - start, labels)
+        metrics.inc("provider_requests_total", {**labels, "status": status})
+
+    def _attempt(self, provider: MarketDataProvider, operation: str, args: tuple):
+        start = time.perf_counter()
+        try:
+            result = getattr(provider, operation)(*args)
+        except Exception as e:
+            self._finish(provider, operation, start, e)
+            raise
+        self._finish(provider, operation, start, None)
+        return result
+
+    async def _attempt_async(self, provider: MarketDataProvider, operation: str, args: tuple):
+        start = time.perf_counter()
+        try:
+            result = await getattr(provider, f"{operation}_async")(*args)
+        except asyncio.CancelledError:
+            self.breakers[provider.name].abandon()
+            raise
+        except Exception as e:
+            self._finish(provider, operation, start, e)
+            raise
+        self._finish(provider, operation, start, None)
+        return result
+
+    def call(self, operation: str, *args):
+        """Run operation ("quote", "daily_bars" or "news") on the providers and return the first success"""
+        remaining = iter(self.providers)
+        primary = self._next_allowed(remaining)
+        if primary is None:
+            self._count("exhausted")
+            raise ProviderError("No market data provider available")
+        hedge_after = self.hedge_after.get(operation)
+        if hedge_after is None or len(self.providers) == 1:
+            return self._call_in_turn(primary, remaining, operation, args)
+
+        pending = {}
+        rate_limited = {}  # future -> Event set while it waits on the rate limiter
+
+        def submit(provider: MarketDataProvider):
+            future, rate_limited[future] = self._submit(provider, operation, args)
+            pending[future] = provider
+
+        submit(primary)
+        errors = []
+        hedged = False
+        hedges = set()
+        while pending:
+            timeout = hedge_after if not hedged else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                if any(rate_limited[future].is_set() for future in pending):
+                    # Held back by our own quota, not a slow upstream: a hedge couldn't cancel the
+                    # queued call, which would still spend quota on an answer nobody reads
+                    self._count("hedges_skipped")
+                    continue
+                # The call is slow: ask the next provider as well
+                hedge = self._next_allowed(remaining)
+                if hedge is not None:
+                    self._count("hedged")
+                    hedges.add(hedge.name)
+                    submit(hedge)
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                if provider is not primary:
+                    self._count("hedge_wins" if provider.name in hedges else "failovers")
+                return result
+            if not pending:
+                fallback = self._next_allowed(remaining)
+                if fallback is not None:
+                    hedged = True  # Already late; don't hedge the failover call
+                    submit(fallback)
+        self._count("exhausted")
+        raise ProviderError("; ".join(errors) or "No market data provider available")
+
+    def _call_in_turn(self, primary: MarketDataProvider, remaining: Iterator[MarketDataProvider], operation: str,
+                      args: tuple):
+        """Failover without hedging, on the calling thread"""
+        errors = []
+        provider = primary
+        while provider is not None:
+            try:
+                result = self._attempt(provider, operation, args)
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+                provider = self._next_allowed(remaining)
+                continue
+            if provider is not primary:
+                self._count("failovers")
+            return result
+        self._count("exhausted")
+        raise ProviderError("; ".join(errors))
+
+    async def call_async(self, operation: str, *args):
+        """call() for coroutines; a hedged call's loser is cancelled once another provider answers"""
+        remaining = iter(self.providers)
+        primary = self._next_allowed(remaining)
+        if primary is None:
+            self._count("exhausted")
+            raise ProviderError("No market data provider available")
+        hedge_after = self.hedge_after.get(operation)
+
+        pending = {asyncio.ensure_future(self._attempt_async(primary, operation, args)): primary}
+        errors = []
+        hedged = False
+        hedges = set()
+        try:
+            while pending:
+                timeout = hedge_after if not hedged else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    hedge = self._next_allowed(remaining)
+                    if hedge is not None:
+                        self._count("hedged")
+                        hedges.add(hedge.name)
+                        pending[asyncio.ensure_future(self._attempt_async(hedge, operation, args))] = hedge
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(f"{provider.name}: {task.exception()}")
+                        continue
+                    if provider is not primary:
+                        self._count("hedge_wins" if provider.name in hedges else "failovers")
+                    return task.result()
+                if not pending:
+                    fallback = self._next_allowed(remaining)
+                    if fallback is not None:
+                        hedged = True
+                        pending[asyncio.ensure_future(self._attempt_async(fallback, operation, args))] = fallback
+        finally:
+            for task in pending:
+                task.cancel()
+        self._count("exhausted")
+        raise ProviderError("; ".join(errors) or "No market data provider available")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "providers": {
+                provider.name: {"state": self.breakers[provider.name].state, "failures": self.breakers[provider.name].failures}
+                for provider in self.providers
+            }
+        }
+
+PROVIDERS = {"alpha_vantage": AlphaVantageProvider, "yahoo": YahooFinanceProvider}
+market_data = ProviderRouter([PROVIDERS[name]() for name in PROVIDER_ORDER])
 
 class BaseAgent:
     """Base class for all agents in the system"""
     
+    blocking = True  # Whether execute waits on I/O and must run off the event loop
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every agent is timed without each subclass having to opt in
+        if "execute" in cls.__dict__:
+            cls.execute = _instrument(cls.execute)
+        if "execute_async" in cls.__dict__:
+            cls.execute_async = _instrument_async(cls.execute_async)
+    
     def __init__(self, name: str):
         self.name = name
         self.logger = logging.getLogger(f"Agent.{name}")
@@ -37,14 +2184,935 @@ class BaseAgent:
         """Execute the agent's main functionality"""
         raise NotImplementedError("Subclasses must implement execute method")
     
+    async def execute_async(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute from a coroutine; adapts the synchronous execute unless a subclass overrides this"""
+        if not self.blocking:
+            return self.execute(context)
+        return await asyncio.get_running_loop().run_in_executor(None, self.execute, context)
+    
     def log_execution(self, input_data: Any, output_data: Any):
-        """Log agent execution for debugging"""
-        self.logger.info(f"Input: {input_data}")
-        self.logger.info(f"Output: {output_data}")
+        """Log agent execution for debugging; payloads are only formatted when they will be emitted"""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            level = logging.DEBUG
+        elif PAYLOAD_LOG_SAMPLE_RATE and random.random() < PAYLOAD_LOG_SAMPLE_RATE:
+            level = logging.INFO
+        else:
+            return
+        self.logger.log(level, "Input: %s", input_data)
+        self.logger.log(level, "Output: %s", output_data)
+
+@dataclass(frozen=True)
+class PriceSeries:
+    """Columnar daily OHLCV history for one ticker, oldest bar first"""
+    dates: np.ndarray  # datetime64[D]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def start_index(self, timeframe: str) -> int:
+        """Index of the bar a timeframe's change is measured from"""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        kind, amount = TIMEFRAMES[timeframe]
+        last = len(self.dates) - 1
+        if kind == "bars":
+            return max(0, last - amount)
+        if kind == "ytd":
+            # Last close of the previous year
+            target = self.dates[-1].astype("datetime64[Y]").astype("datetime64[D]") - np.timedelta64(1, "D")
+        else:
+            target = self.dates[-1] - np.timedelta64(amount, "D")
+        return max(0, int(np.searchsorted(self.dates, target, side="right")) - 1)
+
+    def change(self, timeframe: str) -> Dict[str, float]:
+        start = self.start_index(timeframe)
+        start_price = float(self.close[start])
+        end_price = float(self.close[-1])
+        change = end_price - start_price
+        return {
+            "change": change,
+            "change_percent": (change / start_price) * 100 if start_price else 0.0,
+            "start_price": start_price,
+            "end_price": end_price
+        }
+
+    def returns(self) -> np.ndarray:
+        """Daily log returns"""
+        return np.diff(np.log(self.close))
+
+    def volatility(self, window: int = VOLATILITY_WINDOW) -> Optional[float]:
+        """Annualised volatility of the last window daily returns, in percent"""
+        returns = self.returns()[-window:]
+        if len(returns) < 2:
+            return None
+        return float(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100)
+
+    def moving_average(self, window: int) -> Optional[float]:
+        if len(self.close) < window:
+            return None
+        return float(self.close[-window:].mean())
+
+    def moving_averages(self, window: int) -> np.ndarray:
+        """Simple moving average series (length len - window + 1)"""
+        sums = np.cumsum(np.insert(self.close, 0, 0.0))
+        return (sums[window:] - sums[:-window]) / window
+
+class PriceHistoryStore:
+    """In-memory columnar store of daily bars, filled incrementally from upstream"""
+
+    def __init__(self):
+        self.series = {}  # ticker -> PriceSeries
+        self.expires = {}  # ticker -> monotonic time the next daily bar can appear
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("PriceHistory")
+
+    def get(self, ticker: str, loader) -> PriceSeries:
+        """Return the ticker's history, fetching only days not yet stored once a new close may exist
+
+        loader(ticker, outputsize) returns DailyBars.
+        """
+        with self.lock:
+            ticker_lock = self.locks.setdefault(ticker, threading.Lock())
+        with ticker_lock:
+            series = self.series.get(ticker)
+            if series is not None and self.expires.get(ticker, 0) > time.monotonic():
+                return series
+
+            outputsize = "full"
+            if series is not None and (np.datetime64(datetime.now().date()) - series.dates[-1]) < np.timedelta64(HISTORY_COMPACT_DAYS, "D"):
+                outputsize = "compact"
+            time_series = loader(ticker, outputsize)
+            series = self._merge(series, time_series)
+            if series is None or len(series) < 2:
+                raise Exception("Not enough price history")
+
+            self.series[ticker] = series
+            self.expires[ticker] = time.monotonic() + seconds_until_market_close()
+            return series
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+            self.expires.clear()
+
+    def expires_in(self, ticker: str) -> Optional[float]:
+        """Seconds until a new daily bar may exist for ticker, or None when it isn't stored"""
+        expires = self.expires.get(ticker)
+        return expires - time.monotonic() if expires is not None else None
+
+    def peek(self, ticker: str) -> Optional[PriceSeries]:
+        """Stored history without fetching"""
+        return self.series.get(ticker)
+
+    def _merge(self, series: Optional[PriceSeries], bars: DailyBars) -> Optional[PriceSeries]:
+        """Append bars newer than the stored history, replacing the last stored bar if it has been revised
+
+        A fetch during the session returns the day's bar so far; the next fetch after the close corrects it.
+        """
+        last = str(series.dates[-1]) if series is not None else ""
+        new_bars = sorted((date, bar) for date, bar in bars.items() if date >= last)
+        stored = None
+        if series is not None:
+            stored = np.column_stack([series.open, series.high, series.low, series.close, series.volume])
+            if new_bars and new_bars[0][0] == last:
+                if np.array_equal(stored[-1], np.array(new_bars[0][1], dtype=float)):
+                    new_bars = new_bars[1:]
+                else:
+                    stored = stored[:-1]
+        if not new_bars:
+            return series
+        self.logger.info(f"Appending {len(new_bars)} daily bars")
+
+        dates = np.array([date for date, _ in new_bars], dtype="datetime64[D]")
+        values = np.array([bar for _, bar in new_bars], dtype=float)
+        if series is not None:
+            dates = np.concatenate([series.dates[:len(stored)], dates])
+            values = np.concatenate([stored, values])
+        return PriceSeries(dates, values[:, 0], values[:, 1], values[:, 2], values[:, 3], values[:, 4])
+
+price_history = PriceHistoryStore()
+
+class BarRing:
+    """Fixed-capacity ring buffer of OHLCV bars on a fixed time grid
+
+    Bar n covers [n * seconds, (n + 1) * seconds) in Unix time and lives in slot n % capacity, so any
+    bar is found by arithmetic. Bars with no quote are filled flat at the previous close.
+    """
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.values = np.full((capacity, 5), np.nan)  # open, high, low, close, volume
+        self.newest = None  # Number of the newest bar
+        self.count = 0  # Bars held, up to capacity
+
+    def add(self, timestamp: float, price: float, volume: float):
+        number = int(timestamp // self.seconds)
+        if self.newest is not None and number < self.newest:
+            return  # Its bar has already been overwritten by a newer one
+        if number == self.newest:
+            row = self.values[number % self.capacity]
+            row[1] = max(row[1], price)
+            row[2] = min(row[2], price)
+            row[3] = price
+            row[4] += volume
+            return
+        if self.newest is None:
+            self.count = 1
+        else:
+            gap = min(number - self.newest - 1, self.capacity - 1)
+            if gap:
+                close = self.values[self.newest % self.capacity, 3]
+                self.values[np.arange(number - gap, number) % self.capacity] = (close, close, close, close, 0.0)
+            self.count = min(self.count + number - self.newest, self.capacity)
+        self.values[number % self.capacity] = (price, price, price, price, volume)
+        self.newest = number
+
+    def _start(self, number: int) -> str:
+        return datetime.fromtimestamp(number * self.seconds, timezone.utc).isoformat()
+
+    def bar(self, back: int = 0) -> Optional[Dict[str, Any]]:
+        """The bar back bars before the newest, or None beyond the bars held"""
+        if back >= self.count:
+            return None
+        number = self.newest - back
+        open_, high, low, close, volume = self.values[number % self.capacity].tolist()
+        return {"start": self._start(number), "open": open_, "high": high, "low": low, "close": close, "volume": volume}
+
+    def change(self, bars: int) -> Dict[str, Any]:
+        """Move from the close bars ago to the newest close, or from the oldest open when fewer bars are held"""
+        end_price = float(self.values[self.newest % self.capacity, 3])
+        if bars < self.count:
+            start_price = float(self.values[(self.newest - bars) % self.capacity, 3])
+            since = self._start(self.newest - bars + 1)
+        else:
+            oldest = self.newest - self.count + 1
+            start_price = float(self.values[oldest % self.capacity, 0])
+            since = self._start(oldest)
+        change = end_price - start_price
+        return {
+            "change": change,
+            "change_percent": (change / start_price) * 100 if start_price else 0.0,
+            "start_price": start_price,
+            "end_price": end_price,
+            "since": since
+        }
+
+    def window(self, bars: int) -> Dict[str, Any]:
+        """The newest bars rolled into one OHLCV bar"""
+        held = min(bars, self.count)
+        rows = self.values[np.arange(self.newest - held + 1, self.newest + 1) % self.capacity]
+        return {
+            "bars": held,
+            "open": float(rows[0, 0]),
+            "high": float(rows[:, 1].max()),
+            "low": float(rows[:, 2].min()),
+            "close": float(rows[-1, 3]),
+            "volume": float(rows[:, 4].sum())
+        }
+
+class IntradayBarStore:
+    """Intraday OHLCV bars per ticker, rolled up from every quote the app observes
+
+    Each ticker gets one BarRing per bar size, allocated once to fit max_bytes_per_ticker. Beyond
+    max_tickers the least recently quoted ticker is dropped, so memory never grows past both caps.
+    """
+
+    def __init__(self, bar_seconds: Optional[Dict[str, int]] = None,
+                 max_bytes_per_ticker: int = INTRADAY_MAX_BYTES_PER_TICKER, max_tickers: int = INTRADAY_MAX_TICKERS):
+        self.bar_seconds = bar_seconds or INTRADAY_BAR_SECONDS
+        self.capacity = max(2, max_bytes_per_ticker // (len(self.bar_seconds) * 5 * 8))
+        self.max_tickers = max_tickers
+        self.rings = OrderedDict()  # ticker -> {bar size: BarRing}, least recently quoted first
+        self.volumes = {}  # ticker -> cumulative day volume of its last quote
+        self.observed = {}  # ticker -> timestamp of the newest quote rolled in
+        self.lock = threading.Lock()
+        self.counters = {"quotes": 0, "repeats": 0, "evictions": 0}
+
+    def observe(self, ticker: str, price: float, volume: Optional[float] = None, timestamp: Optional[float] = None):
+        """Roll a quote into the ticker's bars; volume is the day's cumulative volume the quote reports
+
+        timestamp is when the price is from (now if not given). A quote no newer than one already
+        rolled in, such as the same cached quote served again, is ignored.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            if timestamp <= self.observed.get(ticker, float("-inf")):
+                self.counters["repeats"] += 1
+                return
+            self.observed[ticker] = timestamp
+            rings = self.rings.get(ticker)
+            if rings is None:
+                rings = self.rings[ticker] = {size: BarRing(seconds, self.capacity)
+                                              for size, seconds in self.bar_seconds.items()}
+                if len(self.rings) > self.max_tickers:
+                    evicted, _ = self.rings.popitem(last=False)
+                    self.volumes.pop(evicted, None)
+                    self.observed.pop(evicted, None)
+                    self.counters["evictions"] += 1
+            else:
+                self.rings.move_to_end(ticker)
+            traded = self._traded(ticker, volume)
+            for ring in rings.values():
+                ring.add(timestamp, price, traded)
+            self.counters["quotes"] += 1
+
+    def _traded(self, ticker: str, volume: Optional[float]) -> float:
+        """Shares traded since the ticker's previous quote"""
+        if volume is None:
+            return 0.0
+        previous = self.volumes.get(ticker)
+        self.volumes[ticker] = volume
+        if previous is None:
+            return 0.0  # No way to tell how much of the day's volume is new
+        return volume - previous if volume >= previous else volume  # A new trading day restarted the count
+
+    def latest(self, ticker: str, bar_size: str = "1min") -> Optional[Dict[str, Any]]:
+        """The ticker's newest bar of the given size"""
+        with self.lock:
+            ring = self.rings.get(ticker, {}).get(bar_size)
+            return ring.bar() if ring is not None else None
+
+    def change(self, ticker: str, timeframe: str) -> Dict[str, Any]:
+        """Price change over a sub-day timeframe up to the newest quote, with that window's bar and the latest bar"""
+        if timeframe not in INTRADAY_TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        bar_size, bars = INTRADAY_TIMEFRAMES[timeframe]
+        with self.lock:
+            ring = self.rings.get(ticker, {}).get(bar_size)
+            if ring is None:
+                raise Exception(f"No intraday quotes observed for {ticker}")
+            change = ring.change(bars)
+            change["window"] = ring.window(bars)
+            change["latest_bar"] = ring.bar()
+            return change
+
+    def clear(self):
+        with self.lock:
+            self.rings.clear()
+            self.volumes.clear()
+            self.observed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.counters,
+                "tickers": len(self.rings),
+                "max_tickers": self.max_tickers,
+                "bars_per_buffer": self.capacity,
+                "bytes": len(self.rings) * len(self.bar_seconds) * self.capacity * 5 * 8
+            }
+
+intraday_bars = IntradayBarStore()
+
+@dataclass(slots=True)
+class NewsArticle:
+    """One stored article and the tickers it mentions"""
+    id: str
+    title: str
+    summary: str
+    url: str
+    time_published: str
+    sentiment: str
+    sentiment_score: float
+    tickers: Dict[str, tuple]  # ticker -> (ticker_sentiment_score, relevance_score)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "summary": self.summary,
+            "url": self.url,
+            "time_published": self.time_published,
+            "sentiment": self.sentiment
+        }
+
+class NewsStore:
+    """Deduplicated in-memory news articles with ticker, time and keyword indexes
+
+    Each article is stored once however many tickers or fetches it appears in. Per-ticker
+    lists are kept sorted by publish time so time windows are a bisect, and title/summary
+    words map to article ids for keyword search.
+    """
+
+    def __init__(self, sentiment: Optional["SentimentAggregator"] = None, max_articles: int = NEWS_MAX_ARTICLES):
+        self.sentiment = sentiment
+        self.max_articles = max_articles
+        self.articles = {}  # id -> NewsArticle
+        self.content_ids = {}  # content hash -> id, catches syndicated copies under other URLs
+        self.by_ticker = {}  # ticker -> sorted [(time_published, id)]
+        self.by_token = {}  # word -> {id}
+        self.timeline = []  # sorted [(time_published, id)] across all tickers, for eviction
+        self.refreshed = {}  # ticker -> monotonic time of the last upstream fetch
+        self.fetched_through = {}  # ticker -> newest time_published returned by a fetch for that ticker
+        self.lock = threading.Lock()
+        self.counters = {"ingested": 0, "duplicates": 0, "evicted": 0}
+        self.logger = logging.getLogger("NewsStore")
+
+    def needs_refresh(self, ticker: str) -> bool:
+        return time.monotonic() - self.refreshed.get(ticker, float("-inf")) >= cache_ttl("NEWS_SENTIMENT")
+
+    def expires_in(self, ticker: str) -> Optional[float]:
+        """Seconds until ticker's news is due for a refresh, or None when it was never fetched"""
+        refreshed = self.refreshed.get(ticker)
+        return refreshed + cache_ttl("NEWS_SENTIMENT") - time.monotonic() if refreshed is not None else None
+
+    def time_from(self, ticker: str) -> Optional[str]:
+        """NEWS_SENTIMENT time_from covering only articles newer than the ticker's own fetches returned
+
+        Articles stored because another ticker's fetch linked this one don't count: the ticker's
+        older news may not have been fetched yet.
+        """
+        with self.lock:
+            newest = self.fetched_through.get(ticker)
+            return newest[:13] if newest else None  # YYYYMMDDTHHMM
+
+    def ingest(self, ticker: str, items: List[NewsItem]) -> int:
+        """Store new articles from a fetch for ticker; returns how many were new"""
+        added = 0
+        with self.lock:
+            for item in items:
+                if item.time_published > self.fetched_through.get(ticker, ""):
+                    self.fetched_through[ticker] = item.time_published
+                url_key = item.url or item.title
+                article_id = hashlib.sha1(url_key.strip().lower().encode()).hexdigest()[:16]
+                content = " ".join(_name_tokens(f"{item.title} {item.summary}"))
+                content_hash = hashlib.sha1(content.encode()).hexdigest()[:16]
+                existing = self.articles.get(article_id) or self.articles.get(self.content_ids.get(content_hash))
+                tickers = dict(item.tickers)
+                tickers.setdefault(ticker, (item.sentiment_score, 1.0))
+
+                if existing is not None:
+                    self.counters["duplicates"] += 1
+                    for linked, score in tickers.items():
+                        if linked not in existing.tickers:
+                            existing.tickers[linked] = score
+                            bisect.insort(self.by_ticker.setdefault(linked, []), (existing.time_published, existing.id))
+                            self._aggregate(linked, existing)
+                    continue
+
+                article = NewsArticle(
+                    id=article_id,
+                    title=item.title,
+                    summary=item.summary,
+                    url=item.url,
+                    time_published=item.time_published,
+                    sentiment=item.sentiment,
+                    sentiment_score=item.sentiment_score,
+                    tickers=tickers
+                )
+                self.articles[article_id] = article
+                self.content_ids[content_hash] = article_id
+                entry = (article.time_published, article_id)
+                bisect.insort(self.timeline, entry)
+                for linked in tickers:
+                    bisect.insort(self.by_ticker.setdefault(linked, []), entry)
+                    self._aggregate(linked, article)
+                for token in set(content.split()):
+                    self.by_token.setdefault(token, set()).add(article_id)
+                added += 1
+
+            self.counters["ingested"] += added
+            while len(self.articles) > self.max_articles:
+                self._evict_oldest()
+            self.refreshed[ticker] = time.monotonic()
+        if added:
+            self.logger.info(f"Stored {added} new articles for {ticker}")
+        return added
+
+    def query(self, ticker: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              keywords: Optional[str] = None, limit: int = NEWS_RESULTS) -> List[NewsArticle]:
+        """Newest stored articles matching every given filter"""
+        low = start.strftime(NEWS_TIME_FORMAT) if start else ""
+        high = end.strftime(NEWS_TIME_FORMAT) if end else "~"  # sorts after any timestamp
+        with self.lock:
+            entries = self.by_ticker.get(ticker, []) if ticker else self.timeline
+            entries = entries[bisect.bisect_left(entries, (low,)):bisect.bisect_right(entries, (high,))]
+
+            matching = None
+            for token in _name_tokens(keywords or ""):
+                ids = self.by_token.get(token, set())
+                matching = ids if matching is None else matching & ids
+                if not matching:
+                    return []
+
+            results = []
+            for _, article_id in reversed(entries):
+                if matching is None or article_id in matching:
+                    results.append(self.articles[article_id])
+                    if len(results) >= limit:
+                        break
+            return results
+
+    def _aggregate(self, ticker: str, article: NewsArticle):
+        if self.sentiment is None:
+            return
+        try:
+            published = datetime.strptime(article.time_published, NEWS_TIME_FORMAT).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return
+        score, relevance = article.tickers[ticker]
+        self.sentiment.add(ticker, published.timestamp(), score, relevance)
+
+    def _evict_oldest(self):
+        _, article_id = self.timeline.pop(0)
+        article = self.articles.pop(article_id)
+        entry = (article.time_published, article_id)
+        for linked in article.tickers:
+            entries = self.by_ticker.get(linked, [])
+            index = bisect.bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                entries.pop(index)
+        content = " ".join(_name_tokens(f"{article.title} {article.summary}"))
+        self.content_ids.pop(hashlib.sha1(content.encode()).hexdigest()[:16], None)
+        for token in set(content.split()):
+            ids = self.by_token.get(token)
+            if ids is not None:
+                ids.discard(article_id)
+                if not ids:
+                    del self.by_token[token]
+        self.counters["evicted"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.articles.clear()
+            self.content_ids.clear()
+            self.by_ticker.clear()
+            self.by_token.clear()
+            self.timeline.clear()
+            self.refreshed.clear()
+            self.fetched_through.clear()
+        if self.sentiment is not None:
+            self.sentiment.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "articles": len(self.articles),
+                "tickers": len(self.by_ticker),
+                "tokens": len(self.by_token),
+                **self.counters
+            }
+
+class SentimentAggregator:
+    """Rolling per-ticker sentiment counts and relevance-weighted scores over SENTIMENT_WINDOWS
+
+    Articles land in fixed-width time buckets. Each window keeps running totals and only
+    subtracts the buckets that have slid out since it was last read, so a snapshot costs
+    O(1) amortised however many articles a ticker has.
+    """
+
+    COUNT, BULLISH, BEARISH, WEIGHTED_SCORE, WEIGHT = range(5)
+
+    def __init__(self, windows: Dict[str, int] = SENTIMENT_WINDOWS, bucket_seconds: int = SENTIMENT_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.windows = {name: max(1, seconds // bucket_seconds) for name, seconds in windows.items()}
+        self.longest = max(self.windows, key=self.windows.get)
+        self.tickers = {}  # ticker -> {"buckets": {index: totals}, "totals": {window: totals}, "start": {window: index}}
+        self.lock = threading.Lock()
+
+    def add(self, ticker: str, published: float, score: float, relevance: float = 1.0):
+        """Count one article mentioning ticker"""
+        with self.lock:
+            state = self._advance(ticker, self._bucket(time.time()))
+            index = min(self._bucket(published), self._bucket(time.time()))  # Clamp future timestamps
+            if index < state["start"][self.longest]:
+                return  # Older than every window
+
+            delta = [1, score >= SENTIMENT_BULLISH_THRESHOLD, score <= -SENTIMENT_BULLISH_THRESHOLD,
+                     score * relevance, relevance]
+            bucket = state["buckets"].setdefault(index, [0, 0, 0, 0.0, 0.0])
+            for field, value in enumerate(delta):
+                bucket[field] += value
+            for window, start in state["start"].items():
+                if index >= start:
+                    totals = state["totals"][window]
+                    for field, value in enumerate(delta):
+                        totals[field] += value
+
+    def snapshot(self, ticker: str) -> Dict[str, Dict[str, Any]]:
+        """Per-window article, bullish and bearish counts with the relevance-weighted mean score"""
+        with self.lock:
+            state = self._advance(ticker, self._bucket(time.time()))
+            return {window: self._summary(totals) for window, totals in state["totals"].items()}
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _advance(self, ticker: str, now: int) -> Dict[str, Any]:
+        """Slide every window of ticker forward to end at bucket now"""
+        state = self.tickers.get(ticker)
+        if state is None:
+            state = self.tickers[ticker] = {
+                "buckets": {},
+                "totals": {window: [0, 0, 0, 0.0, 0.0] for window in self.windows},
+                "start": {window: now - size + 1 for window, size in self.windows.items()}
+            }
+            return state
+
+        buckets = state["buckets"]
+        expired = []
+        for window, size in self.windows.items():
+            start, new_start = state["start"][window], now - size + 1
+            if new_start <= start:
+                continue
+            totals = state["totals"][window]
+            for index in self._occupied(buckets, start, new_start):
+                for field, value in enumerate(buckets[index]):
+                    totals[field] -= value
+            state["start"][window] = new_start
+            if window == self.longest:
+                expired = self._occupied(buckets, start, new_start)
+
+        # Buckets behind the longest window are no longer counted anywhere
+        if expired:
+            for index in expired:
+                del buckets[index]
+        return state
+
+    def _occupied(self, buckets: Dict[int, List[float]], start: int, end: int) -> List[int]:
+        """Bucket indexes in [start, end) that hold articles, scanning whichever side is smaller"""
+        if end - start > len(buckets):
+            return [index for index in buckets if start <= index < end]
+        return [index for index in range(start, end) if index in buckets]
+
+    def _summary(self, totals: List[float]) -> Dict[str, Any]:
+        weight = totals[self.WEIGHT]
+        return {
+            "articles": totals[self.COUNT],
+            "bullish": totals[self.BULLISH],
+            "bearish": totals[self.BEARISH],
+            "score": round(totals[self.WEIGHTED_SCORE] / weight, 4) if weight > 1e-9 else None
+        }
+
+    def clear(self):
+        with self.lock:
+            self.tickers.clear()
+
+sentiment_aggregator = SentimentAggregator()
+news_store = NewsStore(sentiment_aggregator)
+
+SCREEN_OPERATORS = {
+    ">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+    "=": np.equal, "==": np.equal, "!=": np.not_equal
+}
+
+def parse_screen_filter(expression: str) -> tuple:
+    """Parse "column<op>value" (e.g. "change_1D<-2" or "bearish_24h>bullish_24h") into (column, op, operand)"""
+    match = re.fullmatch(r"\s*(\w+)\s*(>=|<=|!=|==|>|<|=)\s*([\w.+-]+)\s*", expression)
+    if not match:
+        raise ValueError(f"Invalid filter: {expression}")
+    column, op, operand = match.groups()
+    try:
+        return column, op, float(operand)
+    except ValueError:
+        return column, op, operand  # Another column
+
+class Screener:
+    """Latest metrics for every tracked ticker in one contiguous matrix, for vectorised filter, sort and top-K queries
+
+    Each ticker owns a row that agents update as quotes, daily bars and sentiment land. Sentiment
+    windows slide even when no news arrives, so rows whose sentiment is older than a bucket are
+    re-read from the aggregator before a query.
+    """
+
+    def __init__(self, sentiment: SentimentAggregator, capacity: int = SCREENER_INITIAL_CAPACITY):
+        self.sentiment = sentiment
+        names = ["price", "volatility"] + [f"change_{timeframe}" for timeframe in TIMEFRAMES]
+        for window in sentiment.windows:
+            names += [f"articles_{window}", f"bullish_{window}", f"bearish_{window}", f"sentiment_{window}"]
+        self.columns = {name: i for i, name in enumerate(names)}
+        self.values = np.full((capacity, len(names)), np.nan)
+        self.sentiment_at = np.full(capacity, -np.inf)  # When each row's sentiment columns were read
+        self.tickers = []  # row -> ticker
+        self.rows = {}  # ticker -> row
+        self.series = []  # row -> PriceSeries its change columns were computed from
+        self.lock = threading.Lock()
+
+    def _row(self, ticker: str) -> int:
+        row = self.rows.get(ticker)
+        if row is not None:
+            return row
+        row = self.rows[ticker] = len(self.tickers)
+        if row == len(self.values):
+            grown = np.full((2 * len(self.values), len(self.columns)), np.nan)
+            grown[:row] = self.values
+            self.values = grown
+            self.sentiment_at = np.concatenate([self.sentiment_at, np.full(row, -np.inf)])
+        self.tickers.append(ticker)
+        self.series.append(None)
+        return row
+
+    def update_quote(self, ticker: str, price: float):
+        with self.lock:
+            row = self._row(ticker)  # May grow self.values, so index it only afterwards
+            self.values[row, self.columns["price"]] = price
+
+    def update_history(self, ticker: str, series: PriceSeries):
+        """Recompute change per timeframe and volatility when the ticker's daily bars have changed"""
+        with self.lock:
+            row = self._row(ticker)
+            if self.series[row] is series:
+                return
+            self.series[row] = series
+            for timeframe in TIMEFRAMES:
+                self.values[row, self.columns[f"change_{timeframe}"]] = series.change(timeframe)["change_percent"]
+            volatility = series.volatility()
+            self.values[row, self.columns["volatility"]] = np.nan if volatility is None else volatility
+
+    def update_sentiment(self, ticker: str, snapshot: Dict[str, Dict[str, Any]]):
+        """Store a SentimentAggregator snapshot"""
+        with self.lock:
+            self._write_sentiment(self._row(ticker), snapshot)
+
+    def sentiment_changed(self, ticker: str):
+        """New articles were stored; re-read the ticker's sentiment before the next query"""
+        with self.lock:
+            row = self.rows.get(ticker)
+            if row is not None:
+                self.sentiment_at[row] = -np.inf
+
+    def _write_sentiment(self, row: int, snapshot: Dict[str, Dict[str, Any]]):
+        for window, summary in snapshot.items():
+            self.values[row, self.columns[f"articles_{window}"]] = summary["articles"]
+            self.values[row, self.columns[f"bullish_{window}"]] = summary["bullish"]
+            self.values[row, self.columns[f"bearish_{window}"]] = summary["bearish"]
+            score = summary["score"]
+            self.values[row, self.columns[f"sentiment_{window}"]] = np.nan if score is None else score
+        self.sentiment_at[row] = time.time()
+
+    def _refresh_sentiment(self):
+        stale = np.flatnonzero(self.sentiment_at[:len(self.tickers)] < time.time() - self.sentiment.bucket_seconds)
+        for row in stale:
+            self._write_sentiment(row, self.sentiment.snapshot(self.tickers[row]))
+
+    def _column(self, name: str) -> int:
+        if name not in self.columns:
+            raise ValueError(f"Unknown column: {name}")
+        return self.columns[name]
+
+    def screen(self, filters: List[tuple] = (), sort: Optional[str] = None, order: str = "desc",
+               limit: int = SCREENER_DEFAULT_LIMIT) -> Dict[str, Any]:
+        """Rows matching every (column, op, operand) filter, ranked by sort
+
+        order is "desc", "asc" or "abs" (largest magnitude first, e.g. top movers either way).
+        Rows missing a filtered or sorted value never match.
+        """
+        if order not in ("desc", "asc", "abs"):
+            raise ValueError(f"Unsupported order: {order}")
+        for column, op, operand in filters:
+            self._column(column)
+            if isinstance(operand, str):
+                self._column(operand)
+        sort_column = self._column(sort) if sort else None
+
+        with self.lock:
+            self._refresh_sentiment()
+            values = self.values[:len(self.tickers)]
+            mask = np.ones(len(values), dtype=bool)
+            for column, op, operand in filters:
+                left = values[:, self.columns[column]]
+                right = values[:, self.columns[operand]] if isinstance(operand, str) else operand
+                mask &= SCREEN_OPERATORS[op](left, right) & ~np.isnan(left) & ~np.isnan(right)
+
+            if sort_column is not None:
+                mask &= ~np.isnan(values[:, sort_column])
+
+            matches = np.flatnonzero(mask)
+            total = len(matches)
+            if sort_column is not None:
+                key = values[matches, sort_column]
+                if order != "asc":
+                    key = -np.abs(key) if order == "abs" else -key
+                if limit < len(matches):
+                    # Only the top limit rows need a full sort
+                    top = np.argpartition(key, limit)[:limit]
+                    matches, key = matches[top], key[top]
+                matches = matches[np.argsort(key, kind="stable")]
+            selected = values[matches[:limit]]
+            tickers = [self.tickers[row] for row in matches[:limit]]
+
+        return {
+            "matches": total,
+            "tracked": len(self.tickers),
+            "results": [
+                {"ticker": ticker, **{name: None if np.isnan(value) else round(float(value), 4)
+                                      for name, value in zip(self.columns, row)}}
+                for ticker, row in zip(tickers, selected)
+            ]
+        }
+
+    def clear(self):
+        with self.lock:
+            self.values[:] = np.nan
+            self.sentiment_at[:] = -np.inf
+            self.tickers.clear()
+            self.rows.clear()
+            self.series.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"tickers": len(self.tickers), "capacity": len(self.values)}
+
+screener = Screener(sentiment_aggregator)
+
+def _name_tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9&]+", text.lower())
+
+class SymbolResolver:
+    """Resolves company names and tickers in free text against a symbol universe
+
+    Names are held in a token trie so matching a query costs one walk per query word,
+    with a one-edit deletion index as the typo-tolerant fallback.
+    """
+
+    CURATED = 0
+    LISTED = 1
+
+    def __init__(self, aliases: Dict[str, str], universe_path: Optional[str] = SYMBOL_UNIVERSE_PATH,
+                 listing_csv: Optional[str] = None):
+        self.trie = {}
+        self.names = {}  # ticker -> display name
+        self.deletes = {}  # one-deletion variant -> alias phrases
+        self.phrases = {}  # alias phrase -> (ticker, priority)
+        self.listed = False
+
+        for alias, ticker in aliases.items():
+            self._add_alias(alias, ticker, self.CURATED)
+            self.names.setdefault(ticker, alias.title())
+        if listing_csv:
+            self._load_listings(io.StringIO(listing_csv))
+        elif universe_path and os.path.exists(universe_path):
+            with open(universe_path, newline="", encoding="utf-8") as f:
+                self._load_listings(f)
+        self.symbols = set(self.names)
+        self._build_fuzzy_index()
+        self.logger = logging.getLogger("SymbolResolver")
+        self.logger.info(f"Loaded {len(self.symbols)} symbols and {len(self.phrases)} name aliases")
+
+    def _load_listings(self, lines):
+        """Load active listings from an Alpha Vantage LISTING_STATUS CSV"""
+        for row in csv.DictReader(lines):
+            symbol = (row.get("symbol") or "").strip().upper()
+            name = (row.get("name") or "").strip()
+            if not symbol or row.get("status", "Active") != "Active":
+                continue
+            self.listed = True
+            self.names.setdefault(symbol, name or symbol)
+            tokens = _name_tokens(name)
+            while len(tokens) > 1 and tokens[-1] in COMPANY_NAME_SUFFIXES:
+                tokens.pop()
+            if tokens and not (len(tokens) == 1 and tokens[0].upper() in TICKER_STOPWORDS):
+                self._add_alias(" ".join(tokens), symbol, self.LISTED)
+
+    def _add_alias(self, alias: str, ticker: str, priority: int):
+        phrase = " ".join(_name_tokens(alias))
+        if not phrase or phrase in self.phrases:
+            return
+        self.phrases[phrase] = (ticker, priority)
+        node = self.trie
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node[None] = (ticker, priority)
+
+    def _build_fuzzy_index(self):
+        for phrase in self.phrases:
+            if len(phrase) >= FUZZY_MIN_LENGTH:
+                for variant in self._variants(phrase):
+                    self.deletes.setdefault(variant, []).append(phrase)
+
+    @staticmethod
+    def _variants(word: str) -> set:
+        """The word plus every string one deletion away"""
+        return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+    def is_symbol(self, candidate: str) -> bool:
+        """Whether a capitalised word should be read as a ticker"""
+        # Without a listing only the curated tickers are known; other capitalised words ("NASA") are not guessed at
+        return candidate in self.symbols and candidate not in TICKER_STOPWORDS
+
+    def company_name(self, ticker: str) -> str:
+        return self.names.get(ticker, ticker)
+
+    def resolve(self, query: str) -> Optional[Dict[str, Any]]:
+        """Find the ticker a query is about, or None"""
+        # Direct mentions: cashtags first, then capitalised words that are known symbols
+        for candidate in re.findall(r'\$([A-Za-z]{1,5})\b', query):
+            if candidate.upper() in self.symbols:
+                return self._result(candidate.upper(), 0.95)
+        for candidate in re.findall(r'\b[A-Z]{1,5}\b', query):
+            if self.is_symbol(candidate):
+                return self._result(candidate, 0.9)
+
+        tokens = _name_tokens(query)
+        match = self._match_names(tokens)
+        if match:
+            return match
+
+        # Lower-case tickers ("tsla stock")
+        for token in tokens:
+            symbol = token.upper()
+            if len(symbol) >= 2 and symbol in self.symbols and symbol not in TICKER_STOPWORDS:
+                return self._result(symbol, 0.8)
+
+        return self._match_fuzzy(tokens)
+
+    def _match_names(self, tokens: List[str]) -> Optional[Dict[str, Any]]:
+        """Longest alias match in the query; curated aliases beat listing names, then earliest wins"""
+        best = None
+        for start in range(len(tokens)):
+            node = self.trie
+            found = None
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node:
+                    found = (node[None], end)
+            if found:
+                (ticker, priority), end = found
+                rank = (priority, -(end - start))
+                if best is None or rank < best[0]:
+                    best = (rank, ticker, " ".join(tokens[start:end + 1]))
+        if best is None:
+            return None
+        _, ticker, phrase = best
+        name = phrase.title() if self.phrases[phrase][1] == self.CURATED else self.company_name(ticker)
+        return {"ticker": ticker, "company_name": name, "confidence": 0.9}
+
+    def _match_fuzzy(self, tokens: List[str]) -> Optional[Dict[str, Any]]:
+        """Closest alias within one edit of a query word or word pair"""
+        best = None
+        for size in (1, 2, 3):
+            for start in range(len(tokens) - size + 1):
+                gram = " ".join(tokens[start:start + size])
+                if len(gram) < FUZZY_MIN_LENGTH or gram.upper() in TICKER_STOPWORDS:
+                    continue
+                for variant in self._variants(gram):
+                    for phrase in self.deletes.get(variant, ()):
+                        score = difflib.SequenceMatcher(None, gram, phrase).ratio()
+                        ticker, priority = self.phrases[phrase]
+                        if score >= FUZZY_MIN_SIMILARITY and (best is None or (score, -priority) > best[:2]):
+                            best = (score, -priority, ticker, phrase)
+        if best is None:
+            return None
+        score, _, ticker, phrase = best
+        name = phrase.title() if self.phrases[phrase][1] == self.CURATED else self.company_name(ticker)
+        return {"ticker": ticker, "company_name": name, "confidence": round(0.6 * score, 2)}
+
+    def _result(self, ticker: str, confidence: float) -> Dict[str, Any]:
+        return {"ticker": ticker, "company_name": self.company_name(ticker), "confidence": confidence}
 
 class IdentifyTickerAgent(BaseAgent):
     """Agent to identify stock ticker from natural language query"""
     
+    blocking = False
+    
     def __init__(self):
         super().__init__("IdentifyTicker")
         # Common company name to ticker mappings
@@ -74,54 +3142,58 @@ class IdentifyTickerAgent(BaseAgent):
             "gm": "GM"
         }
     
+        # Built once; indexes ticker_map plus the listing file when present
+        self.resolver = SymbolResolver(self.ticker_map)
+        self.listing_thread = None
+    
+    def start(self):
+        """Download the symbol listing in the background when there is no listing file"""
+        if SYMBOL_UNIVERSE_FETCH and not self.resolver.listed and self.listing_thread is None:
+            self.listing_thread = threading.Thread(target=self.load_listings, name="listing-status", daemon=True)
+            self.listing_thread.start()
+    
     def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Extract ticker symbol from user query"""
-        query = context.get("user_query", "").lower()
-        
-        # First, look for direct ticker mentions (3-5 uppercase letters)
-        ticker_pattern = r'\b[A-Z]{1,5}\b'
-        direct_tickers = re.findall(ticker_pattern, context.get("user_query", ""))
+        query = context.get("user_query", "")
         
-        if direct_tickers:
-            ticker = direct_tickers[0]
-            company_name = self._get_company_name(ticker)
-        else:
-            # Look for company names in the query
-            ticker = None
-            company_name = None
-            
-            for company, tick in self.ticker_map.items():
-                if company in query:
-                    ticker = tick
-                    company_name = company.title()
-                    break
-        
-        if not ticker:
-            for tick in set(self.ticker_map.values()):
-                if tick.lower() in query:
-                    ticker = tick
-                    company_name = self._get_company_name(tick)
-                    break
-        
-        result = {
-            "ticker": ticker,
-            "company_name": company_name,
-            "confidence": 0.9 if ticker else 0.0
+        result = self.resolver.resolve(query) or {
+            "ticker": None,
+            "company_name": None,
+            "confidence": 0.0
         }
+        if result["ticker"]:
+            ticker_demand.record(result["ticker"])
         
         self.log_execution(query, result)
         return result
     
     def _get_company_name(self, ticker: str) -> str:
         """Get company name from ticker (reverse lookup)"""
-        reverse_map = {v: k.title() for k, v in self.ticker_map.items()}
-        return reverse_map.get(ticker, ticker)
+        return self.resolver.company_name(ticker)
+    
+    def load_listings(self):
+        """Fetch LISTING_STATUS (through the disk cache) and swap in a resolver covering every listed symbol"""
+        params = {"function": "LISTING_STATUS", "apikey": ALPHA_VANTAGE_API_KEY}
+        try:
+            response = alpha_vantage_get(params, PRIORITY_BACKGROUND)
+        except Exception as e:
+            self.logger.warning(f"Could not fetch the symbol listing: {e}")
+            return
+        if response.status_code != 200 or not response.text.startswith("symbol,"):
+            self.logger.warning(f"Symbol listing unavailable: {response.text[:200]}")
+            return
+        self.resolver = SymbolResolver(self.ticker_map, universe_path=None, listing_csv=response.text)
 
 class TickerPriceAgent(BaseAgent):
     """Agent to fetch current stock price"""
 
     def __init__(self):
         super().__init__("TickerPrice")
+        self.providers = market_data
+        self.screener = screener
+        self.intraday = intraday_bars
+        self.bulk_quotes_enabled = BULK_QUOTES_ENABLED
+        self.bulk_retry_at = 0.0
 
     def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Fetch current price for the given ticker"""
@@ -134,84 +3206,144 @@ class TickerPriceAgent(BaseAgent):
         try:
             self.logger.info(f"Fetching price data for ticker: {ticker}")
             price_data = self._fetch_price_data(ticker)
-            
-            result = {
-                "current_price": price_data.get("price", 0.0),
-                "currency": "USD",
-                "last_updated": price_data.get("last_updated", ""),
-                "market_status": price_data.get("market_status", "CLOSED")
-            }
+            return self._price_result(ticker, price_data)
+
+        except Exception as e:
+            return self._fallback_result(ticker, e)
+
+    async def execute_async(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch current price without blocking the event loop"""
+        ticker = context.get("ticker")
+
+        if not ticker:
+            self.logger.error("No ticker provided in context")
+            return {"error": "No ticker provided"}
+
+        try:
+            self.logger.info(f"Fetching price data for ticker: {ticker}")
+            price_data = await self._fetch_price_data_async(ticker)
+            return self._price_result(ticker, price_data)
+
+        except Exception as e:
+            return self._fallback_result(ticker, e)
+
+    def _price_result(self, ticker: str, price_data: Quote) -> Dict[str, Any]:
+        result = {
+            "current_price": price_data.price,
+            "currency": "USD",
+            "last_updated": price_data.last_updated,
+            "market_status": price_data.market_status,
+            "provider": price_data.provider
+        }
+        self.screener.update_quote(ticker, price_data.price)
+        self.intraday.observe(ticker, price_data.price, price_data.volume, price_data.timestamp)
+
+        self.log_execution(ticker, result)
+        return result
 
-            self.log_execution(ticker, result)
-            return result
+    def _fallback_result(self, ticker: str, e: Exception) -> Dict[str, Any]:
+        self.logger.error(f"Error fetching price for {ticker}: {e}")
+        record_fallback(self.name)
+        # Return fallback data instead of raising exception
+        fallback_price = 150.00 + demo_number(ticker, 100)
+        return {
+            "current_price": fallback_price,
+            "currency": "USD",
+            "last_updated": datetime.now().isoformat(),
+            "market_status": "CLOSED",
+            "error": str(e)
+        }
 
-        except Exception as e:
-            self.logger.error(f"Error fetching price for {ticker}: {e}")
-            # Return fallback data instead of raising exception
-            fallback_price = 150.00 + (hash(ticker) % 100)
-            return {
-                "current_price": fallback_price,
-                "currency": "USD",
-                "last_updated": datetime.now().isoformat(),
-                "market_status": "CLOSED",
-                "error": str(e)
+    def prefetch_quotes(self, tickers: List[str]) -> int:
+        """Warm the quote cache for many tickers with bulk requests; returns how many were cached"""
+        cached = 0
+        for i in range(0, len(tickers), BULK_QUOTES_CHUNK):
+            if not self.bulk_quotes_enabled or time.monotonic() < self.bulk_retry_at:
+                break
+            chunk = tickers[i:i + BULK_QUOTES_CHUNK]
+            params = {
+                "function": "REALTIME_BULK_QUOTES",
+                "symbol": ",".join(chunk),
+                "apikey": ALPHA_VANTAGE_API_KEY
             }
+            try:
+                response = alpha_vantage_get(params, PRIORITY_INTERACTIVE)
+                data = response.json() if response.status_code == 200 else {}
+            except Exception as e:
+                self._defer_bulk(f"request failed: {e}")
+                break
 
-    def _fetch_price_data(self, ticker: str) -> Dict:
-        """Fetch price data from Alpha Vantage with better error handling"""
-        url = "https://www.alphavantage.co/query"
-        params = {
-            "function": "GLOBAL_QUOTE",
-            "symbol": ticker,
-            "apikey": ALPHA_VANTAGE_API_KEY
-        }
+            if premium_notice(data):
+                # The key isn't entitled to the endpoint; fall back to per-ticker quotes from now on
+                self.logger.warning(f"Bulk quotes unavailable, disabling: {data['Information']}")
+                self.bulk_quotes_enabled = False
+                break
+            if "Note" in data or "Information" in data:
+                alpha_vantage_limiter.report_throttled()
+                self._defer_bulk(data.get("Note") or data["Information"])
+                break
+            if "data" not in data:
+                self._defer_bulk(f"HTTP {response.status_code}: {str(data)[:200]}")
+                break
 
-        self.logger.info(f"Making API request to: {url} with params: {params}")
-        
+            for quote in data["data"]:
+                symbol = quote.get("symbol")
+                price = quote.get("close")
+                if symbol and price:
+                    response_cache.put(("GLOBAL_QUOTE", symbol), Quote(
+                        price=float(price),
+                        last_updated=str(quote.get("timestamp", ""))[:10],
+                        market_status="CLOSED",
+                        provider="alpha_vantage",
+                        volume=float(quote["volume"]) if quote.get("volume") else None,
+                        timestamp=self._bulk_timestamp(quote.get("timestamp"))
+                    ), cache_ttl("GLOBAL_QUOTE"))
+                    cached += 1
+        return cached
+
+    @staticmethod
+    def _bulk_timestamp(value: Any) -> float:
+        """Unix time of a bulk quote's "YYYY-MM-DD HH:MM:SS" market-time timestamp, or now if unreadable"""
         try:
-            response = requests.get(url, params=params, timeout=10)
-            self.logger.info(f"API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                self.logger.info(f"API response data keys: {list(data.keys())}")
-                
-                # Check for API limit exceeded
-                if "Note" in data:
-                    raise Exception(f"API limit exceeded: {data['Note']}")
-                
-                # Check for invalid API key
-                if "Error Message" in data:
-                    raise Exception(f"API error: {data['Error Message']}")
-                
-                if "Global Quote" in data and data["Global Quote"]:
-                    quote = data["Global Quote"]
-                    self.logger.info(f"Quote data: {quote}")
-                    
-                    price = quote.get("05. price", "0")
-                    if price and price != "0":
-                        return {
-                            "price": float(price),
-                            "last_updated": quote.get("07. latest trading day", ""),
-                            "market_status": "CLOSED"  # Simplified
-                        }
-                    else:
-                        raise Exception("No price data available in response")
-                else:
-                    raise Exception("No Global Quote data in response")
-            else:
-                raise Exception(f"HTTP error: {response.status_code}")
-                
-        except requests.RequestException as e:
-            raise Exception(f"Network error: {str(e)}")
-        except ValueError as e:
-            raise Exception(f"JSON parsing error: {str(e)}")
+            return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=MARKET_TIMEZONE).timestamp()
+        except ValueError:
+            return time.time()
+
+    def _defer_bulk(self, reason: str):
+        """Use per-ticker quotes for a while after a transient bulk failure, then try bulk again"""
+        self.logger.warning(f"Bulk quotes failed ({reason}); retrying in {BULK_QUOTES_RETRY_AFTER}s")
+        self.bulk_retry_at = time.monotonic() + BULK_QUOTES_RETRY_AFTER
+
+    def refresh_due(self, ticker: str, lead: float) -> bool:
+        expires_in = response_cache.expires_in(self._fetch_price_data.cache_key(ticker))
+        return expires_in is None or expires_in <= lead
+
+    def warm(self, ticker: str):
+        """Refresh the cached quote ahead of expiry"""
+        price_data = self._fetch_price_data.refresh(self, ticker)
+        if price_data:
+            self.screener.update_quote(ticker, price_data.price)
+            self.intraday.observe(ticker, price_data.price, price_data.volume, price_data.timestamp)
+
+    @cached_response("GLOBAL_QUOTE")
+    def _fetch_price_data(self, ticker: str) -> Quote:
+        """Fetch the latest quote from the first provider that answers"""
+        return self.providers.call("quote", ticker)
+
+    @cached_response("GLOBAL_QUOTE")
+    async def _fetch_price_data_async(self, ticker: str) -> Quote:
+        """Non-blocking _fetch_price_data; shares its cache entries"""
+        return await self.providers.call_async("quote", ticker)
 
 class TickerPriceChangeAgent(BaseAgent):
     """Agent to calculate price changes over time"""
     
     def __init__(self):
         super().__init__("TickerPriceChange")
+        self.history = price_history
+        self.intraday = intraday_bars
+        self.providers = market_data
+        self.screener = screener
     
     def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate price change for the given timeframe"""
@@ -222,16 +3354,20 @@ class TickerPriceChangeAgent(BaseAgent):
             return {"error": "No ticker provided"}
         
         try:
-            # Add delay to avoid API rate limits
-            time.sleep(1)
             change_data = self._calculate_price_change(ticker, timeframe)
             result = {
                 "price_change": change_data.get("change", 0.0),
                 "price_change_percent": change_data.get("change_percent", 0.0),
                 "timeframe": timeframe,
                 "start_price": change_data.get("start_price", 0.0),
-                "end_price": change_data.get("end_price", 0.0)
+                "end_price": change_data.get("end_price", 0.0),
+                "volatility": change_data.get("volatility"),
+                "moving_averages": change_data.get("moving_averages", {})
             }
+            for key in ("since", "window", "latest_bar"):
+                # Sub-day timeframes also report what their bars cover
+                if key in change_data:
+                    result[key] = change_data[key]
             
             self.log_execution(f"{ticker} - {timeframe}", result)
             return result
@@ -239,7 +3375,8 @@ class TickerPriceChangeAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Error calculating price change: {e}")
             # Return mock data for demo
-            mock_change = (hash(ticker) % 20) - 10  # Random change between -10 and +10
+            record_fallback(self.name)
+            mock_change = demo_number(ticker, 20) - 10  # Change between -10 and +10
             return {
                 "price_change": mock_change,
                 "price_change_percent": mock_change / 100 * 5,  # Mock percentage
@@ -249,102 +3386,125 @@ class TickerPriceChangeAgent(BaseAgent):
     
     def _calculate_price_change(self, ticker: str, timeframe: str) -> Dict:
         """Calculate actual price change using historical data"""
-        url = "https://www.alphavantage.co/query"
-        params = {
-            "function": "TIME_SERIES_DAILY",
-            "symbol": ticker,
-            "apikey": ALPHA_VANTAGE_API_KEY
+        if timeframe in INTRADAY_TIMEFRAMES:
+            return self._calculate_intraday_change(ticker, timeframe)
+        series = self.history.get(ticker, self._fetch_daily_series)
+        self.screener.update_history(ticker, series)
+        change = series.change(timeframe)
+        change["volatility"] = series.volatility()
+        change["moving_averages"] = {
+            f"sma_{window}": series.moving_average(window) for window in MOVING_AVERAGE_WINDOWS
         }
-        
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Check for API errors
-            if "Note" in data:
-                raise Exception(f"API limit exceeded: {data['Note']}")
-            if "Error Message" in data:
-                raise Exception(f"API error: {data['Error Message']}")
-                
-            if "Time Series (Daily)" in data:
-                time_series = data["Time Series (Daily)"]
-                dates = sorted(time_series.keys(), reverse=True)
-                
-                if len(dates) >= 2:
-                    latest_price = float(time_series[dates[0]]["4. close"])
-                    previous_price = float(time_series[dates[1]]["4. close"])
-                    
-                    change = latest_price - previous_price
-                    change_percent = (change / previous_price) * 100
-                    
-                    return {
-                        "change": change,
-                        "change_percent": change_percent,
-                        "start_price": previous_price,
-                        "end_price": latest_price
-                    }
-        
-        raise Exception("Unable to calculate price change")
+        return change
+    
+    def _calculate_intraday_change(self, ticker: str, timeframe: str) -> Dict:
+        """Change over a sub-day timeframe from the intraday bars, once the current quote is rolled in"""
+        quote = self._fetch_quote(ticker)
+        self.intraday.observe(ticker, quote.price, quote.volume, quote.timestamp)
+        return self.intraday.change(ticker, timeframe)
+    
+    def refresh_due(self, ticker: str, lead: float) -> bool:
+        # A new bar can't exist before the close, so there is nothing to fetch early
+        expires_in = self.history.expires_in(ticker)
+        return expires_in is None or expires_in <= 0
+    
+    def warm(self, ticker: str):
+        """Load the daily bars published since the last fetch"""
+        self.screener.update_history(ticker, self.history.get(ticker, self._fetch_daily_series))
+    
+    def _fetch_daily_series(self, ticker: str, outputsize: str) -> DailyBars:
+        """Fetch daily bars from the first provider that answers"""
+        return self.providers.call("daily_bars", ticker, outputsize)
+    
+    @cached_response("GLOBAL_QUOTE")
+    def _fetch_quote(self, ticker: str) -> Quote:
+        """The quote TickerPriceAgent fetches; sharing its cache entry means one upstream call for both"""
+        return self.providers.call("quote", ticker)
 
 class TickerNewsAgent(BaseAgent):
     """Agent to fetch recent news about a stock"""
     
     def __init__(self):
         super().__init__("TickerNews")
+        self.store = news_store
+        self.providers = market_data
+        self.screener = screener
     
     def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Fetch recent news for the given ticker"""
         ticker = context.get("ticker")
-        company_name = context.get("company_name", ticker)
         
         if not ticker:
             return {"news": [], "error": "No ticker provided"}
         
         try:
-            # Add delay to avoid API rate limits
-            time.sleep(1)
-            # Use Alpha Vantage News API
-            news = self._fetch_alpha_vantage_news(ticker, company_name)
-            if not news:
-                # Fallback to mock news for demo
-                news = self._get_mock_news(ticker)
+            # Only articles newer than the stored ones are requested from Alpha Vantage
+            if self.store.needs_refresh(ticker):
+                items = self._fetch_news(ticker, self.store.time_from(ticker))
+                if self.store.ingest(ticker, items):
+                    self.screener.sentiment_changed(ticker)
+            return self._news_result(ticker)
             
-            result = {"news": news[:5]}  # Limit to top 5 news items
-            self.log_execution(ticker, f"Found {len(news)} news items")
-            return result
+        except Exception as e:
+            self.logger.error(f"Error fetching news: {e}")
+            return self._stored_or_mock_news(ticker, e)
+    
+    async def execute_async(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch recent news without blocking the event loop"""
+        ticker = context.get("ticker")
+        
+        if not ticker:
+            return {"news": [], "error": "No ticker provided"}
+        
+        try:
+            if self.store.needs_refresh(ticker):
+                items = await self._fetch_news_async(ticker, self.store.time_from(ticker))
+                if self.store.ingest(ticker, items):
+                    self.screener.sentiment_changed(ticker)
+            return self._news_result(ticker)
             
         except Exception as e:
             self.logger.error(f"Error fetching news: {e}")
-            return {"news": self._get_mock_news(ticker), "error": str(e)}
+            return self._stored_or_mock_news(ticker, e)
     
-    def _fetch_alpha_vantage_news(self, ticker: str, company_name: str) -> List[Dict]:
-        """Fetch news from Alpha Vantage API"""
-        url = "https://www.alphavantage.co/query"
-        params = {
-            "function": "NEWS_SENTIMENT",
-            "tickers": ticker,
-            "apikey": ALPHA_VANTAGE_API_KEY,
-            "limit": 10
-        }
+    def _news_result(self, ticker: str) -> Dict[str, Any]:
+        news = [article.to_dict() for article in self.store.query(ticker=ticker, limit=NEWS_RESULTS)]
+        if not news:
+            # Fallback to mock news for demo
+            news = self._get_mock_news(ticker)
         
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if "feed" in data:
-                return [
-                    {
-                        "title": item.get("title", ""),
-                        "summary": item.get("summary", ""),
-                        "url": item.get("url", ""),
-                        "time_published": item.get("time_published", ""),
-                        "sentiment": item.get("overall_sentiment_label", "Neutral")
-                    }
-                    for item in data["feed"]
-                ]
-        return []
+        result = {"news": news}
+        self.log_execution(ticker, f"Found {len(news)} news items")
+        return result
+    
+    def refresh_due(self, ticker: str, lead: float) -> bool:
+        expires_in = self.store.expires_in(ticker)
+        return expires_in is None or expires_in <= lead
+    
+    def warm(self, ticker: str):
+        """Pull new articles ahead of the refresh interval"""
+        items = self._fetch_news.refresh(self, ticker, self.store.time_from(ticker))
+        if self.store.ingest(ticker, items):
+            self.screener.sentiment_changed(ticker)
+    
+    def _stored_or_mock_news(self, ticker: str, error: Exception) -> Dict[str, Any]:
+        """Serve previously stored articles when a refresh fails"""
+        news = [article.to_dict() for article in self.store.query(ticker=ticker, limit=NEWS_RESULTS)]
+        return {"news": news or self._get_mock_news(ticker), "error": str(error)}
+    
+    @cached_response("NEWS_SENTIMENT")
+    def _fetch_news(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        """Fetch articles newer than time_from from the first provider that answers"""
+        return self.providers.call("news", ticker, time_from)
+    
+    @cached_response("NEWS_SENTIMENT")
+    async def _fetch_news_async(self, ticker: str, time_from: Optional[str]) -> List[NewsItem]:
+        """Non-blocking _fetch_news; shares its cache entries"""
+        return await self.providers.call_async("news", ticker, time_from)
     
     def _get_mock_news(self, ticker: str) -> List[Dict]:
         """Generate mock news for demo purposes"""
+        record_fallback(self.name)
         return [
             {
                 "title": f"{ticker} Reports Strong Quarterly Earnings",
@@ -365,8 +3525,12 @@ class TickerNewsAgent(BaseAgent):
 class TickerAnalysisAgent(BaseAgent):
     """Agent to provide analysis of stock movements"""
     
+    blocking = False
+    
     def __init__(self):
         super().__init__("TickerAnalysis")
+        self.sentiment = sentiment_aggregator
+        self.screener = screener
     
     def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze stock movement based on news and price data"""
@@ -379,10 +3543,13 @@ class TickerAnalysisAgent(BaseAgent):
             return {"error": "No ticker provided"}
         
         try:
-            analysis = self._generate_analysis(ticker, news, price_change, price_change_percent)
+            trend = self.sentiment.snapshot(ticker)
+            self.screener.update_sentiment(ticker, trend)
+            analysis = self._generate_analysis(ticker, news, price_change, price_change_percent, trend)
             result = {
                 "analysis": analysis,
                 "sentiment": self._determine_sentiment(news, price_change_percent),
+                "sentiment_trend": trend,
                 "key_factors": self._extract_key_factors(news, price_change_percent)
             }
             
@@ -393,7 +3560,8 @@ class TickerAnalysisAgent(BaseAgent):
             self.logger.error(f"Error generating analysis: {e}")
             return {"error": str(e)}
     
-    def _generate_analysis(self, ticker: str, news: List[Dict], price_change: float, price_change_percent: float) -> str:
+    def _generate_analysis(self, ticker: str, news: List[Dict], price_change: float, price_change_percent: float,
+                           trend: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
         """Generate comprehensive analysis"""
         # Determine direction
         if price_change_percent > 2:
@@ -407,16 +3575,26 @@ class TickerAnalysisAgent(BaseAgent):
         else:
             direction = "relatively stable movement"
         
-        # Analyze news sentiment
-        bullish_news = sum(1 for n in news if n.get("sentiment", "").lower() in ["bullish", "positive"])
-        bearish_news = sum(1 for n in news if n.get("sentiment", "").lower() in ["bearish", "negative"])
+        # Analyze news sentiment from the rolling aggregates; demo news isn't aggregated, so count it directly
+        week = (trend or {}).get("7d")
+        if week and week["articles"]:
+            article_count, bullish_news, bearish_news = week["articles"], week["bullish"], week["bearish"]
+        else:
+            article_count = len(news)
+            bullish_news = sum(1 for n in news if n.get("sentiment", "").lower() in ["bullish", "positive"])
+            bearish_news = sum(1 for n in news if n.get("sentiment", "").lower() in ["bearish", "negative"])
+        scores = ", ".join(
+            f"{window} {summary['score']:+.2f} ({summary['articles']} articles)"
+            for window, summary in (trend or {}).items() if summary["score"] is not None
+        )
+        score_line = f"\n- Average sentiment score: {scores}" if scores else ""
         
         analysis = f"""Based on recent data, {ticker} has experienced a {direction} of {price_change_percent:.2f}% (${price_change:.2f}) in the analyzed timeframe.
 
 News Analysis:
-- {len(news)} recent news articles found
+- {article_count} recent news articles found
 - {bullish_news} articles with positive sentiment
-- {bearish_news} articles with negative sentiment
+- {bearish_news} articles with negative sentiment{score_line}
 
 The price movement appears to be {"consistent" if (price_change_percent > 0 and bullish_news > bearish_news) or (price_change_percent < 0 and bearish_news > bullish_news) else "inconsistent"} with the overall news sentiment.
 
@@ -455,10 +3633,542 @@ Key recent developments include market reactions to earnings reports, industry t
         
         return factors[:5]  # Limit to top 5 factors
 
+@dataclass
+class AgentStep:
+    """A pipeline step, declared by the context keys it reads and writes"""
+    name: str
+    agent: BaseAgent
+    inputs: List[str]
+    outputs: List[str]
+    result_key: str
+    timeout: Optional[float] = PIPELINE_STEP_TIMEOUT
+    required: bool = False
+
+class PipelineError(Exception):
+    """Raised when a pipeline step fails and the run cannot continue"""
+
+    def __init__(self, step: str, reason: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(f"Step '{step}' failed: {reason}")
+        self.step = step
+        self.reason = reason
+        self.result = result
+
+class AnalysisError(Exception):
+    """A query could not be analyzed; the message is safe to show the user"""
+
+class AgentPipeline:
+    """Runs agent steps as a dependency graph, executing independent steps concurrently"""
+
+    def __init__(self, steps: List[AgentStep], parallel: bool = PIPELINE_PARALLEL,
+                 max_workers: int = PIPELINE_MAX_WORKERS, partial_results: bool = PIPELINE_PARTIAL_RESULTS,
+                 thread_name_prefix: str = "agent"):
+        self.steps = {step.name: step for step in steps}
+        self.parallel = parallel
+        self.partial_results = partial_results
+        self.dependencies = self._resolve_dependencies(steps)
+        self.order = self._topological_order()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix) if parallel else None
+        self.logger = logging.getLogger("Pipeline")
+
+    def _resolve_dependencies(self, steps: List[AgentStep]) -> Dict[str, set]:
+        """Map each step to the steps producing its inputs"""
+        producers = {}
+        for step in steps:
+            for key in step.outputs:
+                if key in producers:
+                    raise ValueError(f"Output '{key}' is produced by both '{producers[key]}' and '{step.name}'")
+                producers[key] = step.name
+
+        # Inputs nobody produces are expected in the initial context
+        return {
+            step.name: {producers[key] for key in step.inputs if key in producers and producers[key] != step.name}
+            for step in steps
+        }
+
+    def _topological_order(self) -> List[str]:
+        """Order steps so that every step follows its dependencies"""
+        order = []
+        done = set()
+        remaining = list(self.steps)
+        while remaining:
+            ready = [name for name in remaining if self.dependencies[name] <= done]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps: {remaining}")
+            for name in ready:
+                order.append(name)
+                done.add(name)
+                remaining.remove(name)
+        return order
+
+    def run(self, context: Dict[str, Any], skip: Optional[set] = None, on_step=None) -> Dict[str, Any]:
+        """Run all steps, updating context in place and returning results keyed by step result_key
+
+        Steps named in skip are treated as already done; their outputs must be in the context.
+        on_step(step, result) is called as each step completes.
+        """
+        skip = skip or set()
+        results = {}
+        if not self.parallel:
+            for name in self.order:
+                if name in skip:
+                    continue
+                step = self.steps[name]
+                timeout = self._step_timeout(step, context)
+                if timeout is not None and timeout <= 0:
+                    result, error = None, "Skipped: request deadline passed"
+                else:
+                    try:
+                        result, error = step.agent.execute(dict(context)), None
+                    except Exception as e:
+                        result, error = None, str(e)
+                self._complete(step, result, error, context, results, on_step)
+            return results
+
+        pending = [name for name in self.order if name not in skip]
+        running = {}
+        started = {}  # step name -> monotonic time a worker picked it up
+        done = set(skip)
+        try:
+            while pending or running:
+                for name in [n for n in pending if self.dependencies[n] <= done]:
+                    pending.remove(name)
+                    step = self.steps[name]
+                    timeout = self._step_timeout(step, context)
+                    if timeout is not None and timeout <= 0:
+                        self._complete(step, None, "Skipped: request deadline passed", context, results, on_step)
+                        done.add(name)
+                        continue
+                    running[self.executor.submit(self._run_step, step, dict(context), started)] = name
+
+                if not running:
+                    continue
+                # A step's own timeout only starts once it runs, so poll while any is still queued
+                deadlines = [self._step_deadline(self.steps[name], context, started.get(name))
+                             for name in running.values()]
+                if any(name not in started for name in running.values()):
+                    deadlines.append(time.monotonic() + PIPELINE_START_POLL)
+                deadlines = [deadline for deadline in deadlines if deadline is not None]
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                finished, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for future, name in list(running.items()):
+                    deadline = self._step_deadline(self.steps[name], context, started.get(name))
+                    if future in finished:
+                        try:
+                            result, error = future.result(), None
+                        except Exception as e:
+                            result, error = None, str(e)
+                    elif deadline is not None and now >= deadline:
+                        if future.cancel():
+                            result, error = None, "Skipped: request deadline passed while queued"
+                        else:
+                            # The worker thread cannot be interrupted; stop waiting for it
+                            result, error = None, f"Timed out after {now - started[name]:.1f}s"
+                    else:
+                        continue
+                    del running[future]
+                    self._complete(self.steps[name], result, error, context, results, on_step)
+                    done.add(name)
+        except PipelineError:
+            for future in running:
+                future.cancel()
+            raise
+
+        return results
+
+    async def run_async(self, context: Dict[str, Any], skip: Optional[set] = None, on_step=None) -> Dict[str, Any]:
+        """Coroutine version of run; steps are awaited via BaseAgent.execute_async"""
+        skip = skip or set()
+        results = {}
+        pending = [name for name in self.order if name not in skip]
+        running = {}
+        done = set(skip)
+        try:
+            while pending or running:
+                for name in [n for n in pending if self.dependencies[n] <= done]:
+                    pending.remove(name)
+                    step = self.steps[name]
+                    timeout = self._step_timeout(step, context)
+                    if timeout is not None and timeout <= 0:
+                        self._complete(step, None, "Skipped: request deadline passed", context, results, on_step)
+                        done.add(name)
+                        continue
+                    task = asyncio.ensure_future(self._run_step_async(step, dict(context), timeout))
+                    running[task] = name
+
+                if not running:
+                    continue
+                finished, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    name = running.pop(task)
+                    result, error = task.result()
+                    self._complete(self.steps[name], result, error, context, results, on_step)
+                    done.add(name)
+        except BaseException:
+            for task in running:
+                task.cancel()
+            raise
+
+        return results
+
+    @staticmethod
+    def _run_step(step: AgentStep, context: Dict[str, Any], started: Dict[str, float]) -> Dict[str, Any]:
+        started[step.name] = time.monotonic()
+        return step.agent.execute(context)
+
+    def _step_deadline(self, step: AgentStep, context: Dict[str, Any], started: Optional[float]) -> Optional[float]:
+        """When a running step is given up on: its own timeout from when it started, or the request's deadline"""
+        limits = [context.get("deadline")]
+        if started is not None and step.timeout is not None:
+            limits.append(started + step.timeout)
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
+
+    async def _run_step_async(self, step: AgentStep, context: Dict[str, Any], timeout: Optional[float]) -> tuple:
+        if type(step.agent).execute_async is BaseAgent.execute_async and step.agent.blocking:
+            return await self._run_blocking_step_async(step, context)
+        try:
+            return await asyncio.wait_for(step.agent.execute_async(context), timeout), None
+        except asyncio.TimeoutError:
+            return None, f"Timed out after {timeout:.1f}s"
+        except Exception as e:
+            return None, str(e)
+
+    async def _run_blocking_step_async(self, step: AgentStep, context: Dict[str, Any]) -> tuple:
+        """Run a blocking step in the default executor, timing it from when a thread picks it up"""
+        loop = asyncio.get_running_loop()
+        started = {}
+        running = asyncio.Event()
+
+        def run():
+            started[step.name] = time.monotonic()
+            loop.call_soon_threadsafe(running.set)
+            return step.agent.execute(context)
+
+        future = loop.run_in_executor(None, contextvars.copy_context().run, run)
+        try:
+            deadline = context.get("deadline")
+            queued_for = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(asyncio.shield(running.wait()), queued_for)
+            except asyncio.TimeoutError:
+                if future.cancel():
+                    return None, "Skipped: request deadline passed while queued"
+            await running.wait()
+            deadline = self._step_deadline(step, context, started[step.name])
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout), None
+            except asyncio.TimeoutError:
+                return None, f"Timed out after {time.monotonic() - started[step.name]:.1f}s"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            return None, str(e)
+
+    def _step_timeout(self, step: AgentStep, context: Dict[str, Any]) -> Optional[float]:
+        """Seconds a step may run: its own timeout, cut short by the request's deadline"""
+        deadline = context.get("deadline")
+        if deadline is None:
+            return step.timeout
+        left = deadline - time.monotonic()
+        return left if step.timeout is None else min(step.timeout, left)
+
+    def _complete(self, step: AgentStep, result: Optional[Dict[str, Any]], error: Optional[str],
+                  context: Dict[str, Any], results: Dict[str, Any], on_step=None):
+        """Merge a finished step into the context, or fail the run"""
+        if error is not None:
+            self.logger.error(f"Step {step.name} failed: {error}")
+            if step.required or not self.partial_results:
+                raise PipelineError(step.name, error)
+            result = {"error": error}
+        elif step.required and any(result.get(key) is None for key in step.outputs):
+            raise PipelineError(step.name, "Missing required outputs", result)
+
+        context.update(result)
+        results[step.result_key] = result
+        if on_step is not None:
+            on_step(step, result)
+
+class QuoteSubscription:
+    """One client's view of the quote hub: the tickers it watches and its pending updates"""
+
+    def __init__(self, tickers: List[str]):
+        self.tickers = tickers
+        self.updates = queue.Queue(maxsize=QUOTE_SUBSCRIBER_QUEUE)
+
+    def push(self, quote: Dict[str, Any]):
+        """Queue an update, dropping the oldest if the client is falling behind"""
+        while True:
+            try:
+                self.updates.put_nowait(quote)
+                return
+            except queue.Full:
+                try:
+                    self.updates.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self.updates.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class QuoteHub:
+    """Polls each watched ticker once and fans updates out to all its subscribers
+
+    Upstream cost grows with the number of distinct tickers, not the number of viewers.
+    """
+
+    def __init__(self, price_agent: "TickerPriceAgent", interval: float = QUOTE_POLL_INTERVAL,
+                 idle_timeout: float = QUOTE_IDLE_TIMEOUT):
+        self.price_agent = price_agent
+        self.base_interval = interval
+        self.idle_timeout = idle_timeout
+        self.subscribers = {}  # ticker -> set of QuoteSubscription
+        self.pollers = {}  # ticker -> stop Event
+        self.idle_since = {}
+        self.snapshot = {}  # ticker -> last published quote
+        self.lock = threading.Lock()
+        self.counters = {"polls": 0, "updates": 0, "failed_polls": 0}
+        self.logger = logging.getLogger("QuoteHub")
+
+    def subscribe(self, tickers: List[str]) -> QuoteSubscription:
+        """Watch tickers; the subscription starts with the current snapshot of each"""
+        subscription = QuoteSubscription(tickers)
+        with self.lock:
+            for ticker in tickers:
+                self.subscribers.setdefault(ticker, set()).add(subscription)
+                self.idle_since.pop(ticker, None)
+                if ticker in self.snapshot:
+                    subscription.push(self.snapshot[ticker])
+                if ticker not in self.pollers:
+                    stop = self.pollers[ticker] = threading.Event()
+                    threading.Thread(target=self._poll, args=(ticker, stop), name=f"quote-{ticker}", daemon=True).start()
+        return subscription
+
+    def unsubscribe(self, subscription: QuoteSubscription):
+        with self.lock:
+            for ticker in subscription.tickers:
+                watchers = self.subscribers.get(ticker)
+                if watchers is None:
+                    continue
+                watchers.discard(subscription)
+                if not watchers:
+                    del self.subscribers[ticker]
+                    self.idle_since[ticker] = time.monotonic()
+
+    def interval(self) -> float:
+        """Poll cadence, stretched so all pollers together stay within their share of the rate budget"""
+        with self.lock:
+            return self._interval_for(len(self.pollers))
+
+    def _interval_for(self, watched: int) -> float:
+        budget = alpha_vantage_limiter.per_minute * QUOTE_POLL_BUDGET_SHARE
+        return max(self.base_interval, watched * 60 / budget) if budget else self.base_interval
+
+    def _poll(self, ticker: str, stop: threading.Event):
+        while not stop.is_set():
+            with self.lock:
+                idle_since = self.idle_since.get(ticker)
+                if idle_since is not None and time.monotonic() - idle_since >= self.idle_timeout:
+                    # Nobody has watched this ticker for a while; stop paying for it
+                    del self.pollers[ticker]
+                    del self.idle_since[ticker]
+                    self.snapshot.pop(ticker, None)
+                    self.logger.info(f"Stopped polling idle ticker {ticker}")
+                    return
+
+            result = self.price_agent.execute({"ticker": ticker})
+            with self.lock:
+                self.counters["polls"] += 1
+                if "error" in result:
+                    # Never publish demo fallback prices to live viewers
+                    self.counters["failed_polls"] += 1
+            if "error" not in result:
+                self._publish(ticker, result)
+            stop.wait(self.interval())
+
+    def _publish(self, ticker: str, result: Dict[str, Any]):
+        quote = {
+            "ticker": ticker,
+            "current_price": result["current_price"],
+            "last_updated": result.get("last_updated", ""),
+            "observed_at": datetime.now().isoformat()
+        }
+        with self.lock:
+            previous = self.snapshot.get(ticker)
+            self.snapshot[ticker] = quote
+            if previous is not None and previous["current_price"] == quote["current_price"] \
+                    and previous["last_updated"] == quote["last_updated"]:
+                return
+            watchers = list(self.subscribers.get(ticker, ()))
+            self.counters["updates"] += 1
+        for subscription in watchers:
+            subscription.push(quote)
+
+    def get_snapshot(self, tickers: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Last known quote per watched ticker"""
+        with self.lock:
+            if tickers is None:
+                return dict(self.snapshot)
+            return {ticker: self.snapshot[ticker] for ticker in tickers if ticker in self.snapshot}
+
+    def stop(self):
+        with self.lock:
+            for stop in self.pollers.values():
+                stop.set()
+            self.pollers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.counters,
+                "watched_tickers": len(self.pollers),
+                "subscriptions": len({s for watchers in self.subscribers.values() for s in watchers}),
+                "poll_interval_seconds": self._interval_for(len(self.pollers))
+            }
+
+class TickerDemand:
+    """Exponentially decayed request counts per identified ticker"""
+
+    def __init__(self, half_life: float = WARM_HALF_LIFE):
+        self.decay = math.log(2) / half_life
+        self.scores = {}  # ticker -> (score, monotonic time it was last updated)
+        self.lock = threading.Lock()
+
+    def record(self, ticker: str):
+        now = time.monotonic()
+        with self.lock:
+            score, updated = self.scores.get(ticker, (0.0, now))
+            self.scores[ticker] = (score * math.exp(-self.decay * (now - updated)) + 1, now)
+
+    def top(self, n: int) -> List[str]:
+        """The n most requested tickers, forgetting ones that have decayed to nothing"""
+        now = time.monotonic()
+        with self.lock:
+            current = {
+                ticker: score * math.exp(-self.decay * (now - updated))
+                for ticker, (score, updated) in self.scores.items()
+            }
+            for ticker, score in current.items():
+                if score < 0.01:
+                    del self.scores[ticker]
+        return heapq.nlargest(n, (ticker for ticker, score in current.items() if score >= 0.01), key=current.get)
+
+ticker_demand = TickerDemand()
+
+class CacheWarmer:
+    """Refreshes the watchlist and the most requested tickers shortly before their cached data expires
+
+    Each pass asks every warmable agent (refresh_due/warm) about every target ticker. Readers keep
+    the current entry while it reloads. Warming stops for the pass once it has used its share of
+    the per-minute quota or the limiter has no spare token, so it never queues ahead of users.
+    """
+
+    def __init__(self, agents: List["BaseAgent"], demand: TickerDemand, watchlist: Optional[List[str]] = None,
+                 top_n: int = WARM_TOP_N, interval: float = WARM_INTERVAL, lead: float = WARM_LEAD,
+                 budget_share: float = WARM_BUDGET_SHARE, backend=None):
+        self.agents = agents
+        self.backend = backend  # With a shared backend, one worker at a time runs a pass
+        self.demand = demand
+        self.watchlist = [ticker.upper() for ticker in (WARM_WATCHLIST if watchlist is None else watchlist)]
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.budget_share = budget_share
+        self.recent = deque()  # monotonic times of warming calls in the last minute
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.counters = {"passes": 0, "refreshes": 0, "failures": 0, "deferred": 0, "skipped_passes": 0}
+        self.logger = logging.getLogger("CacheWarmer")
+
+    def start(self):
+        """Preload the watchlist, then keep warming in the background"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def targets(self) -> List[str]:
+        return list(dict.fromkeys(self.watchlist + self.demand.top(self.top_n)))
+
+    def warm_once(self) -> int:
+        """One pass over the targets; returns how many entries were refreshed"""
+        lease = None
+        if self.backend is not None:
+            try:
+                lease = self.backend.acquire("lock:cache-warmer", max(60.0, self.interval * 2))
+            except Exception as e:
+                self.logger.warning(f"Shared backend unavailable, warming without a lease: {e}")
+                lease = False
+            if lease is None:
+                # Another worker is warming the shared cache
+                self.counters["skipped_passes"] += 1
+                return 0
+        try:
+            return self._warm_targets()
+        finally:
+            if lease:
+                try:
+                    self.backend.release("lock:cache-warmer", lease)
+                except Exception:
+                    pass
+
+    def _warm_targets(self) -> int:
+        refreshed = 0
+        for ticker in self.targets():
+            for agent in self.agents:
+                if self.stop_event.is_set() or not agent.refresh_due(ticker, self.lead):
+                    continue
+                if not self._take_budget():
+                    self.counters["deferred"] += 1
+                    return refreshed
+                try:
+                    agent.warm(ticker)
+                    refreshed += 1
+                    self.counters["refreshes"] += 1
+                except Exception as e:
+                    self.counters["failures"] += 1
+                    self.logger.warning(f"Warming {agent.name} for {ticker} failed: {e}")
+        self.counters["passes"] += 1
+        return refreshed
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.warm_once()
+            self.stop_event.wait(self.interval)
+
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] >= 60:
+            self.recent.popleft()
+        allowed = max(1, int(alpha_vantage_limiter.per_minute * self.budget_share))
+        if len(self.recent) >= allowed or alpha_vantage_limiter.available() < 1:
+            return False
+        self.recent.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "targets": len(self.targets()),
+            "calls_last_minute": len(self.recent),
+            "running": self.thread is not None and self.thread.is_alive() and not self.stop_event.is_set()
+        }
+
 class StockAnalysisOrchestrator:
     """Main orchestrator that coordinates all agents"""
     
-    def __init__(self):
+    def __init__(self, parallel: bool = PIPELINE_PARALLEL, step_timeouts: Optional[Dict[str, float]] = None,
+                 partial_results: bool = PIPELINE_PARTIAL_RESULTS):
         self.agents = {
             "identify_ticker": IdentifyTickerAgent(),
             "ticker_price": TickerPriceAgent(),
@@ -467,74 +4177,326 @@ class StockAnalysisOrchestrator:
             "ticker_analysis": TickerAnalysisAgent()
         }
         self.logger = logging.getLogger("Orchestrator")
+        steps = self._build_steps(step_timeouts or {})
+        self.pipeline = AgentPipeline(steps, parallel=parallel, partial_results=partial_results)
+        # Batches get their own threads so a large batch can't delay interactive queries
+        self.batch_pipeline = AgentPipeline(steps, parallel=parallel, partial_results=partial_results,
+                                            max_workers=BATCH_MAX_CONCURRENCY * PIPELINE_CONCURRENT_STEPS,
+                                            thread_name_prefix="batch-agent")
+
+    def _build_steps(self, step_timeouts: Dict[str, float]) -> List[AgentStep]:
+        """Declare the agent pipeline; steps without a path between them run concurrently"""
+        steps = [
+            AgentStep("identify_ticker", self.agents["identify_ticker"],
+                      inputs=["user_query"], outputs=["ticker", "company_name"],
+                      result_key="ticker_info", required=True),
+            AgentStep("ticker_price", self.agents["ticker_price"],
+                      inputs=["ticker"], outputs=["current_price"],
+                      result_key="price_info"),
+            AgentStep("ticker_price_change", self.agents["ticker_price_change"],
+                      inputs=["ticker", "timeframe"], outputs=["price_change", "price_change_percent"],
+                      result_key="price_change_info"),
+            AgentStep("ticker_news", self.agents["ticker_news"],
+                      inputs=["ticker", "company_name"], outputs=["news"],
+                      result_key="news_info"),
+            AgentStep("ticker_analysis", self.agents["ticker_analysis"],
+                      inputs=["ticker", "news", "price_change", "price_change_percent"], outputs=["analysis"],
+                      result_key="analysis_info"),
+        ]
+        for step in steps:
+            if step.name in step_timeouts:
+                step.timeout = step_timeouts[step.name]
+        return steps
     
-    def process_query(self, user_query: str) -> Dict[str, Any]:
+    def process_query(self, user_query: str, timeframe: str = "1D", on_step=None,
+                      deadline: Optional[float] = None) -> Dict[str, Any]:
         """Process a user query through the agent pipeline"""
+        try:
+            return self.analyze(user_query, timeframe, on_step, deadline).to_dict()
+        except AnalysisError as e:
+            return {"error": str(e), "success": False}
+    
+    def analyze(self, user_query: str, timeframe: str = "1D", on_step=None,
+                deadline: Optional[float] = None) -> StockData:
+        """Run the agent pipeline for a user query; raises AnalysisError when it can't be answered
+
+        deadline is a time.monotonic() value, REQUEST_DEADLINE from now by default. Every step and
+        upstream call is bounded by it; steps that can't start in time are skipped.
+        """
         self.logger.info(f"Processing query: {user_query}")
         
-        context = {"user_query": user_query}
-        results = {}
+        context = {"user_query": user_query, "timeframe": timeframe,
+                   "deadline": deadline or time.monotonic() + REQUEST_DEADLINE}
         
         try:
-            # Step 1: Identify ticker
-            ticker_result = self.agents["identify_ticker"].execute(context)
-            if not ticker_result.get("ticker"):
-                return {"error": "Could not identify stock ticker from query", "success": False}
-            
-            context.update(ticker_result)
-            results["ticker_info"] = ticker_result
-            
-            # Step 2: Get current price
-            price_result = self.agents["ticker_price"].execute(context)
-            context.update(price_result)
-            results["price_info"] = price_result
-            
-            # Step 3: Calculate price change
-            price_change_result = self.agents["ticker_price_change"].execute(context)
-            context.update(price_change_result)
-            results["price_change_info"] = price_change_result
-            
-            # Step 4: Fetch news
-            news_result = self.agents["ticker_news"].execute(context)
-            context.update(news_result)
-            results["news_info"] = news_result
-            
-            # Step 5: Generate analysis
-            analysis_result = self.agents["ticker_analysis"].execute(context)
-            results["analysis_info"] = analysis_result
-            
-            # Compile final response
-            final_response = self._compile_response(context, results)
-            return final_response
-            
+            results = self.pipeline.run(context, on_step=on_step)
+        except Exception as e:
+            raise self._analysis_error(e) from e
+        return self._compile_response(context, results)
+    
+    def stream_query(self, user_query: str, timeframe: str = "1D",
+                     deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Process a user query, yielding each step's result as it completes and the full response last"""
+        events = queue.Queue()
+        
+        def on_step(step: AgentStep, result: Dict[str, Any]):
+            events.put({"stage": step.name, "result": result})
+        
+        def run():
+            response = self.process_query(user_query, timeframe, on_step=on_step, deadline=deadline)
+            events.put({"stage": "complete", "result": response})
+        
+        threading.Thread(target=run, name="stream-query", daemon=True).start()
+        while True:
+            event = events.get()
+            yield event
+            if event["stage"] == "complete":
+                return
+    
+    async def process_query_async(self, user_query: str, timeframe: str = "1D",
+                                  deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Process a user query through the agent pipeline without blocking the event loop"""
+        try:
+            return (await self.analyze_async(user_query, timeframe, deadline)).to_dict()
+        except AnalysisError as e:
+            return {"error": str(e), "success": False}
+    
+    async def analyze_async(self, user_query: str, timeframe: str = "1D", deadline: Optional[float] = None) -> StockData:
+        """Coroutine version of analyze"""
+        self.logger.info(f"Processing query: {user_query}")
+        
+        context = {"user_query": user_query, "timeframe": timeframe,
+                   "deadline": deadline or time.monotonic() + REQUEST_DEADLINE}
+        
+        try:
+            results = await self.pipeline.run_async(context)
+        except Exception as e:
+            raise self._analysis_error(e) from e
+        return self._compile_response(context, results)
+    
+    def _analysis_error(self, e: Exception) -> AnalysisError:
+        # Identification ran but found nothing to analyze
+        if isinstance(e, PipelineError) and e.step == "identify_ticker" and e.result is not None:
+            return AnalysisError("Could not identify stock ticker from query")
+        self.logger.error(f"Error processing query: {e}")
+        return AnalysisError(f"Failed to process query: {str(e)}")
+    
+    def process_ticker(self, ticker: str) -> Dict[str, Any]:
+        """Run the pipeline for a known ticker, skipping identification"""
+        company_name = self.agents["identify_ticker"]._get_company_name(ticker)
+        context = {"user_query": ticker, "ticker": ticker, "company_name": company_name,
+                   "deadline": time.monotonic() + REQUEST_DEADLINE}
+        
+        try:
+            results = self.batch_pipeline.run(context, skip={"identify_ticker"})
         except Exception as e:
-            self.logger.error(f"Error processing query: {e}")
-            return {"error": f"Failed to process query: {str(e)}", "success": False}
+            self.logger.error(f"Error processing {ticker}: {e}")
+            return {"ticker": ticker, "error": f"Failed to process ticker: {str(e)}", "success": False}
+        
+        # A batch reports the ticker as failed rather than filling in demo prices
+        errors = {step: results[key]["error"] for step, key in BATCH_REQUIRED_RESULTS.items()
+                  if "error" in results.get(key, {"error": "Step did not run"})}
+        if errors:
+            return {"ticker": ticker, "error": "; ".join(f"{step}: {error}" for step, error in errors.items()),
+                    "errors": errors, "success": False}
+        results["ticker_info"] = {"ticker": ticker, "company_name": company_name, "confidence": 1.0}
+        return self._compile_response(context, results).to_dict()
+    
+    def process_batch(self, tickers: List[str]) -> Iterator[Dict[str, Any]]:
+        """Analyze many tickers, yielding each result as soon as it is ready"""
+        symbols = list(dict.fromkeys(t.strip().upper() for t in tickers if isinstance(t, str) and t.strip()))
+        valid = []
+        for symbol in symbols:
+            if TICKER_SYMBOL_PATTERN.match(symbol):
+                valid.append(symbol)
+            else:
+                yield {"ticker": symbol, "error": "Invalid ticker symbol", "success": False}
+        
+        if not valid:
+            return
+        self.logger.info(f"Processing batch of {len(valid)} tickers")
+        self.agents["ticker_price"].prefetch_quotes(valid)
+        
+        executor = ThreadPoolExecutor(max_workers=min(BATCH_MAX_CONCURRENCY, len(valid)), thread_name_prefix="batch")
+        try:
+            futures = [executor.submit(self.process_ticker, symbol) for symbol in valid]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Stop queued tickers if the consumer goes away mid-batch
+            executor.shutdown(wait=False, cancel_futures=True)
     
-    def _compile_response(self, context: Dict, results: Dict) -> Dict[str, Any]:
+    def _compile_response(self, context: Dict, results: Dict) -> StockData:
         """Compile final response for the user"""
         ticker = context.get("ticker", "Unknown")
-        company_name = context.get("company_name", ticker)
-        current_price = context.get("current_price", 0)
-        price_change = context.get("price_change", 0)
-        price_change_percent = context.get("price_change_percent", 0)
-        news = context.get("news", [])
-        analysis = results.get("analysis_info", {}).get("analysis", "No analysis available")
-        sentiment = results.get("analysis_info", {}).get("sentiment", "Neutral")
+        analysis_info = results.get("analysis_info", {})
         
-        return {
-            "ticker": ticker,
-            "company_name": company_name,
-            "current_price": current_price,
-            "price_change": price_change,
-            "price_change_percent": price_change_percent,
-            "sentiment": sentiment,
-            "news_count": len(news),
-            "recent_news": news[:3],  # Top 3 news items
-            "analysis": analysis,
-            "timestamp": datetime.now().isoformat(),
-            "success": True
-        }
+        return StockData(
+            ticker=ticker,
+            company_name=context.get("company_name", ticker),
+            current_price=context.get("current_price", 0),
+            change=PriceChange(
+                timeframe=context.get("timeframe", "1D"),
+                change=context.get("price_change", 0),
+                change_percent=context.get("price_change_percent", 0)
+            ),
+            news=[NewsItem.from_dict(item) for item in context.get("news", [])],
+            analysis=AnalysisSummary(
+                text=analysis_info.get("analysis", "No analysis available"),
+                sentiment=analysis_info.get("sentiment", "Neutral"),
+                trend=analysis_info.get("sentiment_trend")
+            ),
+            timestamp=datetime.now().isoformat()
+        )
+
+class ResponseVersions:
+    """When each (ticker, timeframe) response's current ETag was first served, for Last-Modified"""
+
+    def __init__(self, max_entries: int = RESPONSE_VERSIONS_MAX):
+        self.max_entries = max_entries
+        self.seen = OrderedDict()  # key -> (etag, first served as a Unix time)
+        self.lock = threading.Lock()
+
+    def last_modified(self, key: tuple, etag: str) -> float:
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is None or entry[0] != etag:
+                entry = self.seen[key] = (etag, time.time())
+            self.seen.move_to_end(key)
+            while len(self.seen) > self.max_entries:
+                self.seen.popitem(last=False)
+            return entry[1]
+
+response_versions = ResponseVersions()
+
+def not_modified(headers, etag: str, last_modified: float) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when there is none, against the current version"""
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or f'"{etag}"' in tags
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def conditional_response(record: StockData, headers, method: str) -> tuple:
+    """Status, headers and body for an analysis; GET and HEAD get an empty 304 when the client is current
+
+    The ETag is weak because the body's timestamp differs on every request.
+    """
+    etag = record.etag()
+    last_modified = response_versions.last_modified((record.ticker, record.change.timeframe), etag)
+    response_headers = {
+        "ETag": f'W/"{etag}"',
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache"  # Browsers revalidate on every poll instead of serving a stale copy
+    }
+    if method in ("GET", "HEAD") and not_modified(headers, etag, last_modified):
+        return 304, response_headers, b""
+    return 200, response_headers, record.to_json()
+
+class AdmissionController:
+    """Caps requests in flight; the next few wait briefly for a slot and the rest are shed at once
+
+    Shedding early keeps latency bounded for the requests that are accepted, instead of letting
+    every request queue behind slow upstream calls until the server stalls.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+        self.counters = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0}
+
+    def _try_enter(self) -> bool:
+        """Take a slot if one is free; call with the condition held"""
+        if self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return True
+        return False
+
+    def _start_waiting(self) -> bool:
+        """Join the wait queue, or shed when it is full; call with the condition held"""
+        if self.waiting >= self.max_queue:
+            self.counters["shed"] += 1
+            return False
+        self.waiting += 1
+        self.counters["queued"] += 1
+        return True
+
+    def _wait_budget(self, deadline: Optional[float]) -> float:
+        budget = self.queue_timeout
+        return budget if deadline is None else min(budget, deadline - time.monotonic())
+
+    def admit(self, deadline: Optional[float] = None) -> bool:
+        """Wait up to queue_timeout (or the request's deadline) for a slot; False means shed the request"""
+        with self.condition:
+            if self._try_enter():
+                return True
+            if not self._start_waiting():
+                return False
+            try:
+                if self.condition.wait_for(lambda: self.in_flight < self.max_in_flight, self._wait_budget(deadline)):
+                    return self._try_enter()
+                self.counters["timed_out"] += 1
+                return False
+            finally:
+                self.waiting -= 1
+
+    async def admit_async(self, deadline: Optional[float] = None) -> bool:
+        """Like admit, but waits without blocking the event loop"""
+        with self.condition:
+            if self._try_enter():
+                return True
+            if not self._start_waiting():
+                return False
+        give_up = time.monotonic() + self._wait_budget(deadline)
+        try:
+            while time.monotonic() < give_up:
+                # Threading notifications can't wake a coroutine, so poll
+                await asyncio.sleep(ADMISSION_ASYNC_POLL)
+                with self.condition:
+                    if self._try_enter():
+                        return True
+            with self.condition:
+                self.counters["timed_out"] += 1
+            return False
+        finally:
+            with self.condition:
+                self.waiting -= 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                **self.counters,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue
+            }
+
+admission = AdmissionController()
+async_admission = AdmissionController(ADMISSION_ASYNC_MAX_IN_FLIGHT, ADMISSION_ASYNC_MAX_QUEUE)
+
+# Cheap or long-lived endpoints that don't take an admission slot
+ADMISSION_EXEMPT = {"index", "static", "health_check", "metrics_endpoint", "quotes_stream", "quotes_snapshot"}
+
+def shed_body() -> Dict[str, Any]:
+    return {"error": "Server is busy, please retry shortly", "success": False}
 
 # Flask App
 app = Flask(__name__)
@@ -542,34 +4504,337 @@ app = Flask(__name__)
 # Initialize the orchestrator
 orchestrator = StockAnalysisOrchestrator()
 
+# Live quotes share the orchestrator's price agent and its cache
+quote_hub = QuoteHub(orchestrator.agents["ticker_price"])
+
+# Keeps popular tickers' quotes, daily bars and news in memory ahead of requests
+cache_warmer = CacheWarmer(
+    [orchestrator.agents[name] for name in ("ticker_price", "ticker_price_change", "ticker_news")], ticker_demand,
+    backend=shared_backend
+)
+def start_services():
+    """Start background work for a serving process; entry points call this, importing the module doesn't"""
+    global disk_cache
+    if DISK_CACHE_ENABLED and disk_cache is None:
+        disk_cache = DiskCache()
+    orchestrator.agents["identify_ticker"].start()
+    if WARM_ENABLED:
+        cache_warmer.start()
+
+@app.before_request
+def admit_request():
+    """Start the request's deadline and take an admission slot, or shed with 503"""
+    g.deadline = time.monotonic() + REQUEST_DEADLINE
+    if request.endpoint in ADMISSION_EXEMPT:
+        return None
+    if not admission.admit(g.deadline):
+        return jsonify(shed_body()), 503, {"Retry-After": str(ADMISSION_RETRY_AFTER)}
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def release_request(error=None):
+    if g.pop("admitted", False):
+        admission.release()
+
 @app.route('/')
 def index():
     """Render the main page"""
     return render_template('stock.html')
 
-@app.route('/analyze', methods=['POST'])
+def parse_analyze_request(data: Dict[str, Any]) -> tuple:
+    """Validate an /analyze request body; returns (query, timeframe, error)"""
+    query = data.get('query', '').strip()
+    timeframe = data.get('timeframe', '1D')
+    
+    if not query:
+        return query, timeframe, "No query provided"
+    if timeframe not in TIMEFRAMES and timeframe not in INTRADAY_TIMEFRAMES:
+        return query, timeframe, f"Unsupported timeframe: {timeframe}"
+    return query, timeframe, None
+
+@app.route('/analyze', methods=['GET', 'POST'])
 def analyze_stock():
-    """API endpoint to analyze stock based on user query"""
+    """API endpoint to analyze stock based on user query
+
+    GET takes the query string and answers conditional requests, so polling clients get a 304 when
+    nothing has changed.
+    """
     try:
-        data = request.get_json()
-        query = data.get('query', '').strip()
-        
-        if not query:
-            return jsonify({"error": "No query provided", "success": False}), 400
+        data = request.get_json() if request.method == 'POST' else request.args
+        query, timeframe, error = parse_analyze_request(data)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
         
         # Process the query using the orchestrator
-        result = orchestrator.process_query(query)
+        try:
+            record = orchestrator.analyze(query, timeframe, deadline=g.deadline)
+        except AnalysisError as e:
+            return jsonify({"error": str(e), "success": False})
         
-        return jsonify(result)
+        status, headers, body = conditional_response(record, request.headers, request.method)
+        return Response(body, status=status, headers=headers, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error in analyze_stock: {e}")
         return jsonify({"error": str(e), "success": False}), 500
 
+@app.route('/analyze/stream')
+def analyze_stream():
+    """Server-sent events endpoint emitting each pipeline stage as soon as it completes"""
+    query, timeframe, error = parse_analyze_request(request.args)
+    if error:
+        return jsonify({"error": error, "success": False}), 400
+    
+    deadline = g.deadline
+    
+    def generate():
+        for event in orchestrator.stream_query(query, timeframe, deadline):
+            yield f"event: {event['stage']}\ndata: {dumps_json(event['result']).decode()}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """API endpoint streaming NDJSON analyses for a list of tickers, one line per ticker"""
+    data = request.get_json(silent=True) or {}
+    tickers = data.get('tickers')
+    
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({"error": "No tickers provided", "success": False}), 400
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({"error": f"At most {BATCH_MAX_TICKERS} tickers per batch", "success": False}), 400
+    
+    def generate():
+        for result in orchestrator.process_batch(tickers):
+            yield dumps_json(result) + b"\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def parse_ticker_list(raw: Optional[str]) -> tuple:
+    """Split a comma-separated ticker list; returns (tickers, error)"""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in (raw or "").split(",") if t.strip()))
+    if not tickers:
+        return tickers, "No tickers provided"
+    if len(tickers) > QUOTE_MAX_TICKERS:
+        return tickers, f"At most {QUOTE_MAX_TICKERS} tickers per subscription"
+    invalid = [t for t in tickers if not TICKER_SYMBOL_PATTERN.match(t)]
+    if invalid:
+        return tickers, f"Invalid ticker symbols: {', '.join(invalid)}"
+    return tickers, None
+
+@app.route('/quotes/stream')
+def quotes_stream():
+    """Server-sent events with live quote updates for ?tickers=TSLA,AAPL"""
+    tickers, error = parse_ticker_list(request.args.get('tickers'))
+    if error:
+        return jsonify({"error": error, "success": False}), 400
+    
+    subscription = quote_hub.subscribe(tickers)
+    
+    def generate():
+        try:
+            while True:
+                quote = subscription.next(QUOTE_KEEPALIVE)
+                if quote is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: quote\ndata: {dumps_json(quote).decode()}\n\n"
+        finally:
+            # Runs when the client disconnects
+            quote_hub.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/quotes')
+def quotes_snapshot():
+    """Last known quotes for watched tickers (all, or ?tickers=TSLA,AAPL)"""
+    raw = request.args.get('tickers')
+    tickers = None
+    if raw:
+        tickers, error = parse_ticker_list(raw)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+    return jsonify({"quotes": quote_hub.get_snapshot(tickers), "success": True})
+
+@app.route('/news')
+def news_search():
+    """Search stored articles by ?ticker=, ?q= keywords and ?since=/?until= ISO times"""
+    try:
+        ticker = (request.args.get('ticker') or '').strip().upper() or None
+        since = request.args.get('since')
+        until = request.args.get('until')
+        limit = min(int(request.args.get('limit', 20)), 100)
+        articles = news_store.query(
+            ticker=ticker,
+            start=datetime.fromisoformat(since) if since else None,
+            end=datetime.fromisoformat(until) if until else None,
+            keywords=request.args.get('q'),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    return jsonify({"news": [article.to_dict() for article in articles], "success": True})
+
+@app.route('/screen')
+def screen_tickers():
+    """Filter and rank tracked tickers by their latest metrics, e.g.
+    /screen?filter=bearish_24h>bullish_24h&sort=change_1D&order=abs&limit=20
+    """
+    try:
+        filters = [parse_screen_filter(expression) for expression in request.args.getlist('filter')]
+        limit = max(1, min(int(request.args.get('limit', SCREENER_DEFAULT_LIMIT)), SCREENER_MAX_LIMIT))
+        result = screener.screen(filters, sort=request.args.get('sort'), order=request.args.get('order', 'desc'),
+                                 limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    return jsonify({**result, "success": True})
+
+def collect_gauges() -> Dict[str, float]:
+    """Point-in-time cache, rate limiter and upstream pool stats as flat gauges"""
+    sources = {
+        "cache": response_cache.stats(),
+        "rate_limiter": alpha_vantage_limiter.stats(),
+        "upstream": upstream_client.stats(),
+        "quote_hub": quote_hub.stats(),
+        "news_store": news_store.stats(),
+        "cache_warmer": cache_warmer.stats(),
+        "providers": market_data.stats(),
+        "screener": screener.stats(),
+        "intraday_bars": intraday_bars.stats(),
+        "admission": admission.stats(),
+        "async_admission": async_admission.stats()
+    }
+    if disk_cache is not None:
+        sources["disk_cache"] = disk_cache.stats()
+    if async_upstream_client is not None:
+        sources["async_upstream"] = async_upstream_client.stats()
+    return {
+        f"{source}_{key}": value
+        for source, stats in sources.items()
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.render(collect_gauges()), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "cache": response_cache.stats(),
+        "rate_limiter": alpha_vantage_limiter.stats(),
+        "upstream": upstream_client.stats(),
+        "async_upstream": async_upstream_client.stats() if async_upstream_client else None,
+        "quote_hub": quote_hub.stats(),
+        "news_store": news_store.stats(),
+        "cache_warmer": cache_warmer.stats(),
+        "providers": market_data.stats(),
+        "screener": screener.stats(),
+        "intraday_bars": intraday_bars.stats(),
+        "admission": admission.stats(),
+        "async_admission": async_admission.stats(),
+        "shared_backend": SHARED_BACKEND_ADDRESS,
+        "pid": os.getpid(),
+        "disk_cache": disk_cache.stats() if disk_cache is not None else None
+    })
+
+def create_asgi_app():
+    """ASGI entry point with a non-blocking /analyze; other routes are served by the Flask app
+
+    Run with: uvicorn agent:create_asgi_app --factory --host 0.0.0.0 --port 5000
+    """
+    from contextlib import asynccontextmanager
+    from starlette.applications import Starlette
+    from starlette.middleware.wsgi import WSGIMiddleware
+    from starlette.responses import JSONResponse, Response as StarletteResponse
+    from starlette.routing import Mount, Route
+
+    async def analyze_stock_async(request):
+        """Async variant of analyze_stock"""
+        deadline = time.monotonic() + REQUEST_DEADLINE
+        if not await async_admission.admit_async(deadline):
+            return JSONResponse(shed_body(), status_code=503, headers={"Retry-After": str(ADMISSION_RETRY_AFTER)})
+        try:
+            data = await request.json() if request.method == "POST" else request.query_params
+            query, timeframe, error = parse_analyze_request(data)
+            if error:
+                return JSONResponse({"error": error, "success": False}, status_code=400)
+            
+            try:
+                record = await orchestrator.analyze_async(query, timeframe, deadline)
+            except AnalysisError as e:
+                return JSONResponse({"error": str(e), "success": False})
+            
+            status, headers, body = conditional_response(record, request.headers, request.method)
+            return StarletteResponse(body, status_code=status, headers=headers, media_type="application/json")
+            
+        except Exception as e:
+            logger.error(f"Error in analyze_stock_async: {e}")
+            return JSONResponse({"error": str(e), "success": False}, status_code=500)
+        finally:
+            async_admission.release()
+
+    start_services()
+
+    @asynccontextmanager
+    async def lifespan(asgi_app):
+        # Bounded pool for agents that only have a blocking execute
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=ASYNC_THREAD_POOL_SIZE, thread_name_prefix="async-agent")
+        )
+        yield
+        global async_upstream_client
+        if async_upstream_client is not None:
+            await async_upstream_client.aclose()
+            async_upstream_client = None
+
+    return Starlette(
+        routes=[
+            Route('/analyze', analyze_stock_async, methods=['GET', 'POST']),
+            Mount('/', app=WSGIMiddleware(app))
+        ],
+        lifespan=lifespan
+    )
+
+def run_workers(workers: int = WORKER_COUNT, host: str = "0.0.0.0", port: int = 5000,
+                backend_address: Optional[str] = None):
+    """Serve the ASGI app from several processes that share one cache and one API quota
+
+    Starts a backend server in this process unless backend_address points at one already
+    running (e.g. on another host), then runs uvicorn workers connected to it.
+    """
+    import uvicorn
+
+    if backend_address is None:
+        server = serve_backend("127.0.0.1:0")
+        backend_address = "%s:%d" % server.server_address
+    # Worker processes import this module afresh and pick the address up from the environment
+    os.environ["STOCK_ANALYSIS_BACKEND"] = backend_address
+    logger.info(f"Starting {workers} workers sharing backend {backend_address}")
+    uvicorn.run("agent:create_asgi_app", factory=True, host=host, port=port, workers=workers)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Stock analysis server")
+    parser.add_argument("--workers", type=int, default=1, help="Run this many processes with a shared backend")
+    parser.add_argument("--backend", help="host:port of a running shared backend (default: start one here)")
+    parser.add_argument("--serve-backend", metavar="HOST:PORT", help="Only run a shared backend server")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.serve_backend:
+        serve_backend(args.serve_backend)
+        threading.Event().wait()
+    elif args.workers > 1:
+        run_workers(args.workers, port=args.port, backend_address=args.backend)
+    else:
+        start_services()
+        app.run(debug=True, host='0.0.0.0', port=args.port)
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""Load-testing benchmark for the stock analysis pipeline
+
+Record real Alpha Vantage responses once, then replay them deterministically
+(with optional injected latency and failures) while driving the orchestrator
+or the /analyze endpoint at fixed concurrency levels.
+
+    python benchmark.py record --fixtures fixtures "How is Tesla doing?" "AAPL stock performance"
+    python benchmark.py run --fixtures fixtures --concurrency 1 8 32 --requests 200 --save-baseline baseline.json
+    python benchmark.py run --fixtures fixtures --concurrency 1 8 32 --requests 200 --baseline baseline.json
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+import agent
+
+DEFAULT_QUERIES = [
+    "Why did Tesla stock drop today?",
+    "AAPL stock performance",
+    "How is Nvidia doing?",
+    "Microsoft earnings impact",
+    "What's happening with Meta stock?"
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def make_target(name: str, url: Optional[str]) -> Callable[[str], bool]:
+    """A callable that runs one query and reports whether it succeeded"""
+    if url:
+        session = requests.Session()
+        def call_url(query: str) -> bool:
+            response = session.post(f"{url.rstrip('/')}/analyze", json={"query": query}, timeout=60)
+            return response.status_code == 200 and response.json().get("success", False)
+        return call_url
+
+    if name == "app":
+        local = threading.local()
+        def call_app(query: str) -> bool:
+            if not hasattr(local, "client"):
+                local.client = agent.app.test_client()
+            response = local.client.post("/analyze", json={"query": query})
+            return response.status_code == 200 and response.get_json().get("success", False)
+        return call_app
+
+    def call_orchestrator(query: str) -> bool:
+        return agent.orchestrator.process_query(query).get("success", False)
+    return call_orchestrator
+
+def reset_caches():
+    """Start a level cold so results don't depend on what ran before"""
+    agent.response_cache.invalidate()
+    agent.price_history.clear()
+    agent.news_store.clear()
+    agent.screener.clear()
+    agent.intraday_bars.clear()
+
+def run_level(target: Callable[[str], bool], queries: List[str], concurrency: int, total: int) -> Dict[str, Any]:
+    """Run total queries with the given number of concurrent callers"""
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    upstream_before = dict(agent.upstream_client.counters)
+
+    def one(i: int):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            ok = target(queries[i % len(queries)])
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    wall = time.perf_counter() - started
+    upstream = {key: value - upstream_before.get(key, 0) for key, value in agent.upstream_client.counters.items()}
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "requests_per_sec": round(total / wall, 2) if wall else 0.0,
+        "upstream_calls_per_request": round(upstream["requests"] / total, 3),
+        "upstream_errors": upstream.get("errors", 0),
+        "missing_fixtures": upstream.get("missing", 0)
+    }
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Regressions against a saved baseline, matched by concurrency level"""
+    by_level = {level["concurrency"]: level for level in baseline}
+    regressions = []
+    for level in results:
+        base = by_level.get(level["concurrency"])
+        if base is None:
+            continue
+        if level["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"c={level['concurrency']}: p95 {level['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if level["requests_per_sec"] < base["requests_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: {level['requests_per_sec']} req/s vs baseline {base['requests_per_sec']} req/s"
+            )
+        if level["upstream_calls_per_request"] > base["upstream_calls_per_request"] * (1 + tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: {level['upstream_calls_per_request']} upstream calls/request "
+                f"vs baseline {base['upstream_calls_per_request']}"
+            )
+    return regressions
+
+def print_table(results: List[Dict[str, Any]]):
+    columns = ["concurrency", "requests", "failures", "p50_ms", "p95_ms", "p99_ms", "requests_per_sec",
+               "upstream_calls_per_request", "upstream_errors"]
+    print("  ".join(f"{c:>12}" for c in columns))
+    for level in results:
+        print("  ".join(f"{level[c]:>12}" for c in columns))
+
+def record(args):
+    """Run each query once against the live API, saving every upstream response"""
+    agent.use_upstream_client(agent.RecordingUpstreamClient(fixture_dir=args.fixtures))
+    for query in args.queries or DEFAULT_QUERIES:
+        result = agent.orchestrator.process_query(query)
+        print(f"{query!r}: {'ok' if result.get('success') else result.get('error')}")
+    print(f"Fixtures written to {args.fixtures}")
+
+def run(args) -> int:
+    if not args.url:
+        agent.use_upstream_client(agent.ReplayUpstreamClient(
+            fixture_dir=args.fixtures, latency=args.latency, jitter=args.jitter,
+            error_rate=args.error_rate, seed=args.seed
+        ))
+    if not args.rate_limit:
+        # Measure the pipeline, not the free-tier quota
+        agent.alpha_vantage_limiter = agent.RateLimiter(per_minute=10 ** 9, per_day=10 ** 12, max_queue=10 ** 6)
+
+    target = make_target(args.target, args.url)
+    queries = args.queries or DEFAULT_QUERIES
+    results = []
+    for concurrency in args.concurrency:
+        if not args.url:
+            reset_caches()
+        results.append(run_level(target, queries, concurrency, args.requests))
+    print_table(results)
+    missing = sum(level["missing_fixtures"] for level in results)
+    if missing:
+        print(f"Warning: {missing} upstream requests had no recorded fixture; re-run record for these queries")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Record live upstream responses as fixtures")
+    record_parser.add_argument("--fixtures", default=agent.FIXTURE_DIR)
+    record_parser.add_argument("queries", nargs="*")
+
+    run_parser = commands.add_parser("run", help="Benchmark against replayed fixtures")
+    run_parser.add_argument("--fixtures", default=agent.FIXTURE_DIR)
+    run_parser.add_argument("--target", choices=["orchestrator", "app"], default="orchestrator",
+                            help="Call process_query directly or POST /analyze through the Flask app")
+    run_parser.add_argument("--url", help="Benchmark a running server instead (no replay)")
+    run_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    run_parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    run_parser.add_argument("--latency", type=float, default=0.0, help="Injected upstream latency in seconds")
+    run_parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds")
+    run_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls that fail")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--rate-limit", action="store_true", help="Keep the configured API rate limiter")
+    run_parser.add_argument("--baseline", help="Compare against a saved baseline and exit 1 on regression")
+    run_parser.add_argument("--save-baseline", help="Write this run's results as a baseline")
+    run_parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression fraction")
+    run_parser.add_argument("queries", nargs="*")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        logging.getLogger().setLevel(logging.WARNING)
+        record(args)
+        return 0
+    # Agents log every injected failure; keep the report readable
+    logging.disable(logging.ERROR)
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
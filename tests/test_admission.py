@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import agent
+
+def test_sheds_when_the_queue_is_full():
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1.0)
+    assert controller.admit()
+    started = time.monotonic()
+    assert not controller.admit()
+    assert time.monotonic() - started < 0.1  # Shed at once, not after the queue timeout
+    assert controller.stats()["shed"] == 1
+
+def test_queued_request_times_out():
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    assert controller.admit()
+    started = time.monotonic()
+    assert not controller.admit()
+    assert time.monotonic() - started >= 0.05
+    stats = controller.stats()
+    assert (stats["queued"], stats["timed_out"], stats["waiting"]) == (1, 1, 0)
+
+def test_deadline_shortens_the_wait():
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5.0)
+    assert controller.admit()
+    started = time.monotonic()
+    assert not controller.admit(deadline=time.monotonic() + 0.05)
+    assert time.monotonic() - started < 1.0
+
+def test_queued_request_takes_a_released_slot():
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=2.0)
+    assert controller.admit()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.admit()))
+    waiter.start()
+    while controller.stats()["waiting"] == 0:
+        time.sleep(0.001)
+    controller.release()
+    waiter.join()
+    assert admitted == [True]
+    assert controller.stats()["in_flight"] == 1
+
+def test_async_admission():
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+
+    async def main():
+        assert await controller.admit_async()
+        assert not await controller.admit_async()  # Times out in the queue
+        waiter = asyncio.create_task(controller.admit_async())
+        await asyncio.sleep(0)
+        assert not await controller.admit_async()  # Queue is full: shed
+        controller.release()
+        assert await waiter
+
+    asyncio.run(main())
+    assert {key: controller.stats()[key] for key in ("admitted", "shed", "timed_out")} == \
+        {"admitted": 2, "shed": 1, "timed_out": 1}
+
+def test_async_controller_is_separate():
+    assert agent.async_admission is not agent.admission
+    assert agent.async_admission.max_in_flight == agent.ADMISSION_ASYNC_MAX_IN_FLIGHT
+
+@pytest.fixture
+def full_admission(monkeypatch):
+    controller = agent.AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=0.01)
+    monkeypatch.setattr(agent, "admission", controller)
+    assert controller.admit()
+    return controller
+
+def test_full_server_sheds_with_503(full_admission):
+    response = agent.app.test_client().get("/analyze?query=AAPL")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(agent.ADMISSION_RETRY_AFTER)
+    assert response.get_json() == agent.shed_body()
+    # A full sync server doesn't hold up the async workers' controller
+    assert asyncio.run(agent.async_admission.admit_async())
+    agent.async_admission.release()
+
+def test_exempt_endpoints_are_not_shed(full_admission):
+    assert agent.app.test_client().get("/health").status_code == 200
+    assert full_admission.stats()["shed"] == 0
@@ -0,0 +1,62 @@
+import pytest
+
+import agent
+
+PREMIUM = ("Thank you for using Alpha Vantage! This is a premium endpoint. You may subscribe to "
+           "any of the premium plans at https://www.alphavantage.co/premium/ to instantly unlock all premium endpoints")
+DAILY_LIMIT = ("Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day. "
+               "Please subscribe to any of the premium plans at https://www.alphavantage.co/premium/")
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+@pytest.fixture
+def throttled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(agent.alpha_vantage_limiter, "report_throttled", lambda: calls.append(True))
+    return calls
+
+@pytest.mark.parametrize("key", ["Note", "Information"])
+def test_quota_notices_report_throttling(throttled, key):
+    with pytest.raises(agent.ProviderError, match="API limit exceeded"):
+        agent.AlphaVantageProvider()._json(FakeResponse({key: DAILY_LIMIT}))
+    assert throttled == [True]
+
+def test_premium_notice_is_not_throttling(throttled):
+    with pytest.raises(agent.ProviderError, match="API notice"):
+        agent.AlphaVantageProvider()._json(FakeResponse({"Information": PREMIUM}))
+    assert throttled == []
+    assert agent.premium_notice({"Information": PREMIUM})
+    assert not agent.premium_notice({"Information": DAILY_LIMIT})
+
+def bulk_agent(monkeypatch, response):
+    monkeypatch.setattr(agent, "alpha_vantage_get", lambda params, priority: response)
+    return agent.TickerPriceAgent()
+
+def test_bulk_disabled_only_when_not_entitled(monkeypatch, throttled):
+    price_agent = bulk_agent(monkeypatch, FakeResponse({"Information": PREMIUM}))
+    assert price_agent.prefetch_quotes(["AAPL"]) == 0
+    assert not price_agent.bulk_quotes_enabled
+    assert throttled == []
+
+@pytest.mark.parametrize("status_code, data", [(503, {}), (200, {"Information": DAILY_LIMIT}), (200, {"Note": DAILY_LIMIT})])
+def test_bulk_retried_after_transient_failure(monkeypatch, throttled, status_code, data):
+    response = FakeResponse(data)
+    response.status_code = status_code
+    price_agent = bulk_agent(monkeypatch, response)
+    assert price_agent.prefetch_quotes(["AAPL"]) == 0
+    assert price_agent.bulk_quotes_enabled
+    assert price_agent.bulk_retry_at > agent.time.monotonic()
+
+    response.status_code = 200
+    response.data = {"data": [{"symbol": "BULKTEST", "close": "12.5", "timestamp": "2026-10-16 16:00:00"}]}
+    assert price_agent.prefetch_quotes(["BULKTEST"]) == 0  # Still backing off
+    price_agent.bulk_retry_at = 0.0
+    assert price_agent.prefetch_quotes(["BULKTEST"]) == 1
+    assert agent.response_cache.get_or_load(("GLOBAL_QUOTE", "BULKTEST"), None, 60).price == 12.5
@@ -0,0 +1,97 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import agent
+
+PRICES = {"AAPL": 190.0, "MSFT": 410.0}
+
+class FakeProviders:
+    """Answers for the tickers in PRICES and raises SymbolNotFound for any other"""
+
+    def __init__(self):
+        self.calls = []
+
+    def call(self, operation, ticker, *args):
+        self.calls.append((operation, ticker))
+        if ticker not in PRICES:
+            raise agent.SymbolNotFound(f"Unknown symbol {ticker}")
+        price = PRICES[ticker]
+        if operation == "quote":
+            return agent.Quote(price=price, last_updated="2026-10-16", market_status="CLOSED",
+                               provider="fake", volume=None, timestamp=1760644800.0)
+        if operation == "daily_bars":
+            today = date.today()
+            return {(today - timedelta(days=days)).isoformat(): [price - days, price - days, price - days, price - days, 1000.0]
+                    for days in range(1, 40)}
+        return []
+
+class BulkResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+@pytest.fixture
+def providers(monkeypatch):
+    fake = FakeProviders()
+    for name in ("ticker_price", "ticker_price_change", "ticker_news"):
+        monkeypatch.setattr(agent.orchestrator.agents[name], "providers", fake)
+    price_agent = agent.orchestrator.agents["ticker_price"]
+    monkeypatch.setattr(price_agent, "bulk_quotes_enabled", True)
+    monkeypatch.setattr(price_agent, "bulk_retry_at", 0.0)
+    clear()
+    yield fake
+    clear()
+
+def clear():
+    agent.response_cache.invalidate()
+    agent.price_history.clear()
+    agent.news_store.clear()
+    agent.screener.clear()
+    agent.intraday_bars.clear()
+
+def bulk_reply(monkeypatch, data):
+    monkeypatch.setattr(agent, "alpha_vantage_get", lambda params, priority: BulkResponse(data))
+
+def test_batch_dedupes_and_reports_invalid_and_unknown_symbols(monkeypatch, providers):
+    bulk_reply(monkeypatch, {"Information": "This is a premium endpoint."})
+    results = {r["ticker"]: r for r in agent.orchestrator.process_batch(["aapl", "AAPL ", "$$$", "ZZZZ", "MSFT"])}
+
+    assert sorted(results) == ["$$$", "AAPL", "MSFT", "ZZZZ"]
+    assert results["$$$"] == {"ticker": "$$$", "error": "Invalid ticker symbol", "success": False}
+    assert results["ZZZZ"]["success"] is False
+    assert set(results["ZZZZ"]["errors"]) == {"ticker_price", "ticker_price_change"}
+    assert "current_price" not in results["ZZZZ"]
+    assert results["AAPL"]["success"] and results["AAPL"]["current_price"] == 190.0
+    assert results["AAPL"]["price_change"] == pytest.approx(1.0)
+    # Bulk quotes were refused, so each ticker fetched its own quote, once
+    assert providers.calls.count(("quote", "AAPL")) == 1
+
+def test_batch_uses_bulk_quotes(monkeypatch, providers):
+    bulk_reply(monkeypatch, {"data": [{"symbol": "AAPL", "close": "191.5", "timestamp": "2026-10-16 16:00:00"}]})
+    [result] = agent.orchestrator.process_batch(["AAPL"])
+    assert result["current_price"] == 191.5
+    assert ("quote", "AAPL") not in providers.calls
+
+def test_analyze_batch_streams_one_line_per_ticker(monkeypatch, providers):
+    bulk_reply(monkeypatch, {"Information": "This is a premium endpoint."})
+    response = agent.app.test_client().post("/analyze/batch", json={"tickers": ["MSFT", "ZZZZ", "MSFT"]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 2
+    results = {line["ticker"]: line for line in lines}
+    assert results["MSFT"]["success"] and results["MSFT"]["current_price"] == 410.0
+    assert results["ZZZZ"]["success"] is False
+
+@pytest.mark.parametrize("body", [{}, {"tickers": []}, {"tickers": "AAPL"}])
+def test_analyze_batch_rejects_missing_tickers(body):
+    response = agent.app.test_client().post("/analyze/batch", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,88 @@
+import pytest
+
+import agent
+
+class WarmableAgent:
+    """Always due for a refresh; records the tickers it warms"""
+
+    name = "fake"
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.warmed = []
+
+    def refresh_due(self, ticker, lead):
+        return True
+
+    def warm(self, ticker):
+        if ticker in self.fail:
+            raise agent.ProviderError(f"{ticker} unavailable")
+        self.warmed.append(ticker)
+
+class Limiter:
+    def __init__(self, per_minute=10, spare=100):
+        self.per_minute = per_minute
+        self.spare = spare
+
+    def available(self):
+        return self.spare
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = Limiter()
+    monkeypatch.setattr(agent, "alpha_vantage_limiter", limiter)
+    return limiter
+
+def warmer(watchlist, **kwargs):
+    fake = WarmableAgent(kwargs.pop("fail", ()))
+    return agent.CacheWarmer([fake], agent.TickerDemand(), watchlist=watchlist, **kwargs), fake
+
+def test_targets_watchlist_then_demand(limiter):
+    cache_warmer, fake = warmer(["tsla"], top_n=2, budget_share=1.0)
+    for ticker in ["AAPL", "AAPL", "AAPL", "MSFT", "MSFT", "NVDA", "TSLA"]:
+        cache_warmer.demand.record(ticker)
+    assert cache_warmer.targets() == ["TSLA", "AAPL", "MSFT"]
+    assert cache_warmer.warm_once() == 3
+    assert fake.warmed == ["TSLA", "AAPL", "MSFT"]
+
+def test_stays_within_budget_share(limiter):
+    cache_warmer, fake = warmer(["A", "B", "C", "D"], budget_share=0.2)  # 2 of 10 calls a minute
+    assert cache_warmer.warm_once() == 2
+    assert fake.warmed == ["A", "B"]
+    assert cache_warmer.warm_once() == 0  # The minute's share is spent
+    assert cache_warmer.counters["deferred"] == 2
+    cache_warmer.recent.clear()  # A minute later
+    assert cache_warmer.warm_once() == 2
+
+def test_backs_off_when_the_limiter_has_no_spare_token(limiter):
+    cache_warmer, fake = warmer(["A", "B"])
+    limiter.spare = 0.5
+    assert cache_warmer.warm_once() == 0
+    assert fake.warmed == []
+    assert (cache_warmer.counters["deferred"], cache_warmer.counters["passes"]) == (1, 0)
+    limiter.spare = 5
+    assert cache_warmer.warm_once() == 2
+
+def test_failures_are_counted_and_skipped(limiter):
+    cache_warmer, fake = warmer(["A", "B"], fail=["A"])
+    assert cache_warmer.warm_once() == 1
+    assert fake.warmed == ["B"]
+    assert cache_warmer.counters["failures"] == 1
+
+def test_one_worker_warms_at_a_time(limiter):
+    backend = agent.LocalBackend()
+    cache_warmer, fake = warmer(["A"], backend=backend)
+    token = backend.acquire("lock:cache-warmer", 60)  # Another worker's pass
+    assert cache_warmer.warm_once() == 0
+    assert cache_warmer.counters["skipped_passes"] == 1
+    backend.release("lock:cache-warmer", token)
+    assert cache_warmer.warm_once() == 1
+    assert backend.acquire("lock:cache-warmer", 60)  # Released after the pass
+
+def test_warms_without_a_lease_when_the_backend_is_down(limiter):
+    class DownBackend:
+        def acquire(self, name, ttl):
+            raise ConnectionError("refused")
+
+    cache_warmer, fake = warmer(["A"], backend=DownBackend())
+    assert cache_warmer.warm_once() == 1
@@ -0,0 +1,76 @@
+from email.utils import formatdate, parsedate_to_datetime
+
+import pytest
+
+import agent
+
+def stock_data(price=190.0, timestamp="2026-10-16T16:00:00"):
+    return agent.StockData(
+        ticker="AAPL",
+        company_name="Apple Inc.",
+        current_price=price,
+        change=agent.PriceChange(timeframe="1D", change=1.5, change_percent=0.8),
+        news=[agent.NewsItem(title="Apple ships", summary="", url="https://example.com/1",
+                             time_published="20261016T120000", sentiment="Positive")],
+        analysis=agent.AnalysisSummary(text="Looks steady", sentiment="Positive", trend=None),
+        timestamp=timestamp
+    )
+
+@pytest.fixture
+def client(monkeypatch):
+    """A test client whose analyses return stock_data(**current)"""
+    current = {}
+    monkeypatch.setattr(agent.orchestrator, "analyze", lambda query, timeframe, deadline=None: stock_data(**current))
+    monkeypatch.setattr(agent, "response_versions", agent.ResponseVersions())
+    client = agent.app.test_client()
+    client.current = current
+    return client
+
+def test_etag_ignores_the_timestamp():
+    first = stock_data(timestamp="2026-10-16T16:00:00")
+    second = stock_data(timestamp="2026-10-16T16:05:00")
+    assert first.to_dict()["timestamp"] != second.to_dict()["timestamp"]
+    assert first.etag() == second.etag()
+    assert stock_data(price=191.0).etag() != first.etag()
+
+def test_etag_is_stable_across_polls(client):
+    first = client.get("/analyze?query=AAPL")
+    client.current["timestamp"] = "2026-10-16T16:05:00"
+    second = client.get("/analyze?query=AAPL")
+    assert first.status_code == second.status_code == 200
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["ETag"].startswith('W/"')
+    assert first.get_json()["timestamp"] != second.get_json()["timestamp"]
+
+def test_if_none_match_returns_empty_304(client):
+    etag = client.get("/analyze?query=AAPL").headers["ETag"]
+    response = client.get("/analyze?query=AAPL", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+def test_if_none_match_with_a_stale_tag_returns_200(client):
+    etag = client.get("/analyze?query=AAPL").headers["ETag"]
+    client.current["price"] = 191.0
+    response = client.get("/analyze?query=AAPL", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["current_price"] == 191.0
+
+def test_if_modified_since(client):
+    last_modified = client.get("/analyze?query=AAPL").headers["Last-Modified"]
+    assert client.get("/analyze?query=AAPL", headers={"If-Modified-Since": last_modified}).status_code == 304
+    earlier = formatdate(parsedate_to_datetime(last_modified).timestamp() - 60, usegmt=True)
+    assert client.get("/analyze?query=AAPL", headers={"If-Modified-Since": earlier}).status_code == 200
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    last_modified = client.get("/analyze?query=AAPL").headers["Last-Modified"]
+    response = client.get("/analyze?query=AAPL",
+                          headers={"If-None-Match": 'W/"stale"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+def test_post_is_never_conditional(client):
+    etag = client.get("/analyze?query=AAPL").headers["ETag"]
+    response = client.post("/analyze", json={"query": "AAPL"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["success"] is True
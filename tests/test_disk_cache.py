@@ -0,0 +1,96 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+import agent
+
+def test_opened_by_start_services_not_import(monkeypatch, tmp_path):
+    assert agent.disk_cache is None
+    path = str(tmp_path / "cache.sqlite3")
+    real = agent.DiskCache
+    monkeypatch.setattr(agent, "DiskCache", lambda: real(path=path, compact_interval=0))
+    monkeypatch.setattr(agent, "WARM_ENABLED", False)
+    monkeypatch.setattr(agent, "SYMBOL_UNIVERSE_FETCH", False)
+    monkeypatch.setattr(agent, "disk_cache", None)
+
+    agent.start_services()
+    opened = agent.disk_cache
+    assert opened.path == path
+    agent.start_services()
+    assert agent.disk_cache is opened
+
+QUOTE = {"function": "GLOBAL_QUOTE", "symbol": "AAPL"}
+DAILY = {"function": "TIME_SERIES_DAILY", "symbol": "AAPL", "outputsize": "compact"}
+
+class Response:
+    def __init__(self, data, status_code=200):
+        self.text = data if isinstance(data, str) else json.dumps(data)
+        self.status_code = status_code
+
+@pytest.fixture
+def cache(tmp_path):
+    return agent.DiskCache(path=str(tmp_path / "cache.sqlite3"), max_age=3600, compact_interval=0)
+
+def fetched(cache, params, at):
+    """Backdate a stored response to a wall-clock fetch time"""
+    cache._connection().execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (at, cache.key(params)))
+
+def test_round_trip_ignores_the_api_key(cache):
+    cache.put({**QUOTE, "apikey": "one"}, '{"Global Quote": {}}')
+    stored = cache.get({**QUOTE, "apikey": "two"})
+    assert stored.text == '{"Global Quote": {}}' and stored.status_code == 200
+    assert cache.get({**QUOTE, "symbol": "MSFT"}) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_survives_a_restart(cache):
+    cache.put(QUOTE, '{"Global Quote": {}}')
+    reopened = agent.DiskCache(path=cache.path, compact_interval=0)
+    assert reopened.get(QUOTE).text == '{"Global Quote": {}}'
+
+def test_quotes_expire_after_their_ttl(cache):
+    cache.put(QUOTE, '{"Global Quote": {}}')
+    fetched(cache, QUOTE, time.time() - agent.CACHE_TTLS["GLOBAL_QUOTE"] + 5)
+    assert cache.get(QUOTE) is not None
+    fetched(cache, QUOTE, time.time() - agent.CACHE_TTLS["GLOBAL_QUOTE"] - 1)
+    assert cache.get(QUOTE) is None
+    assert cache.stats()["stale"] == 1
+
+def test_daily_series_stay_fresh_until_the_next_close(cache):
+    cache.put(DAILY, '{"Time Series (Daily)": {}}')
+    close = agent.last_market_close().timestamp()
+    fetched(cache, DAILY, close + 1)  # However long ago, the bar set is complete until the next close
+    assert cache.get(DAILY) is not None
+    fetched(cache, DAILY, close - 1)  # Fetched before the last close: missing that day's bar
+    assert cache.get(DAILY) is None
+
+def test_market_close_boundaries():
+    friday_evening = datetime(2026, 10, 16, 17, 0, tzinfo=agent.MARKET_TIMEZONE)
+    assert agent.last_market_close(friday_evening) == friday_evening.replace(hour=16)
+    assert agent.seconds_until_market_close(friday_evening) == (3 * 24 - 1) * 3600  # Monday's close
+    saturday = datetime(2026, 10, 17, 12, 0, tzinfo=agent.MARKET_TIMEZONE)
+    assert agent.last_market_close(saturday) == friday_evening.replace(hour=16)
+    monday_morning = datetime(2026, 10, 19, 9, 30, tzinfo=agent.MARKET_TIMEZONE)
+    assert agent.last_market_close(monday_morning) == friday_evening.replace(hour=16)
+
+def test_only_usable_responses_are_stored(cache):
+    cache.store_response(QUOTE, Response({"Note": "Thank you for using Alpha Vantage!"}))
+    cache.store_response(QUOTE, Response({"Error Message": "Invalid API call"}))
+    cache.store_response(QUOTE, Response({"Global Quote": {}}, status_code=500))
+    cache.store_response(QUOTE, Response("not json"))
+    assert cache.get(QUOTE) is None
+    cache.store_response(QUOTE, Response({"Global Quote": {"05. price": "1.0"}}))
+    assert cache.get(QUOTE) is not None
+
+def test_compaction_removes_entries_past_max_age(cache):
+    old, recent = {**QUOTE, "symbol": "OLD"}, {**QUOTE, "symbol": "NEW"}
+    cache.put(old, "{}")
+    cache.put(recent, "{}")
+    fetched(cache, old, time.time() - cache.max_age - 1)
+    fetched(cache, recent, time.time() - cache.max_age + 60)
+    cache.compact()
+    stats = cache.stats()
+    assert (stats["entries"], stats["expired"]) == (1, 1)
+    fetched(cache, recent, time.time())
+    assert cache.get(recent) is not None
@@ -0,0 +1,100 @@
+import pytest
+
+import agent
+
+def test_quotes_in_one_bar_roll_up():
+    ring = agent.BarRing(60, 4)
+    ring.add(0, 10.0, 1)
+    ring.add(30, 12.0, 2)
+    ring.add(59, 9.0, 0)
+    assert ring.bar() == {"start": "1970-01-01T00:00:00+00:00", "open": 10.0, "high": 12.0,
+                          "low": 9.0, "close": 9.0, "volume": 3.0}
+    assert ring.bar(1) is None
+
+def test_gaps_filled_flat_at_previous_close():
+    ring = agent.BarRing(60, 4)
+    ring.add(0, 10.0, 5)
+    ring.add(180, 11.0, 1)
+    assert ring.count == 4
+    for back in (1, 2):
+        gap = ring.bar(back)
+        assert (gap["open"], gap["high"], gap["low"], gap["close"], gap["volume"]) == (10.0, 10.0, 10.0, 10.0, 0.0)
+    assert ring.bar(3)["volume"] == 5.0
+
+def test_capacity_wraps_and_drops_oldest():
+    ring = agent.BarRing(60, 4)
+    for minute in range(6):
+        ring.add(minute * 60, 100.0 + minute, 1)
+    assert ring.count == 4
+    assert [ring.bar(back)["close"] for back in range(4)] == [105.0, 104.0, 103.0, 102.0]
+    assert ring.bar(4) is None
+
+    ring.add(60, 1.0, 1)  # Its bar has been overwritten; ignored
+    assert ring.bar(3)["close"] == 102.0
+
+def test_long_gap_refills_every_slot():
+    ring = agent.BarRing(60, 4)
+    ring.add(0, 10.0, 1)
+    ring.add(60 * 100, 20.0, 1)
+    assert ring.count == 4
+    assert [ring.bar(back)["close"] for back in range(4)] == [20.0, 10.0, 10.0, 10.0]
+
+def test_change_and_window():
+    ring = agent.BarRing(60, 10)
+    for minute, price in enumerate([100.0, 102.0, 101.0, 105.0]):
+        ring.add(minute * 60, price, 10)
+
+    change = ring.change(2)
+    assert (change["start_price"], change["end_price"]) == (102.0, 105.0)
+    assert change["change_percent"] == pytest.approx(3 / 102 * 100)
+    assert change["since"] == "1970-01-01T00:02:00+00:00"
+
+    # Fewer bars held than asked for: measure from the oldest open
+    assert ring.change(30)["start_price"] == 100.0
+
+    assert ring.window(3) == {"bars": 3, "open": 102.0, "high": 105.0, "low": 101.0, "close": 105.0, "volume": 30.0}
+
+def test_store_tracks_volume_deltas_and_evicts_least_recent():
+    store = agent.IntradayBarStore(bar_seconds={"1min": 60}, max_bytes_per_ticker=4 * 5 * 8, max_tickers=2)
+    store.observe("AAA", 10.0, volume=1000, timestamp=0)
+    store.observe("AAA", 11.0, volume=1500, timestamp=70)
+    store.observe("AAA", 11.5, volume=200, timestamp=80)  # Day volume restarted
+    assert store.latest("AAA")["volume"] == 700.0
+
+    store.observe("BBB", 5.0, timestamp=0)
+    store.observe("AAA", 12.0, timestamp=90)
+    store.observe("CCC", 7.0, timestamp=0)
+    assert store.latest("BBB") is None
+    assert store.latest("AAA")["close"] == 12.0
+    assert store.stats()["evictions"] == 1
+
+def test_store_ignores_quotes_already_rolled_in():
+    store = agent.IntradayBarStore(bar_seconds={"1min": 60}, max_bytes_per_ticker=4 * 5 * 8)
+    store.observe("AAA", 10.0, volume=100, timestamp=30)
+    store.observe("AAA", 10.0, volume=100, timestamp=30)  # The same quote again
+    store.observe("AAA", 9.0, volume=150, timestamp=20)  # Older than one already seen
+    assert store.counters == {"quotes": 1, "repeats": 2, "evictions": 0}
+    assert store.latest("AAA")["low"] == 10.0
+
+class QuoteProviders:
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+    def call(self, operation, ticker):
+        return agent.Quote(price=50.0, last_updated="2026-10-16", market_status="OPEN", provider="fake",
+                           volume=1000.0, timestamp=self.timestamp)
+
+def test_cached_quote_rolled_in_once_at_its_own_time(monkeypatch):
+    price_agent = agent.TickerPriceAgent()
+    store = agent.IntradayBarStore(bar_seconds={"1min": 60}, max_bytes_per_ticker=4 * 5 * 8)
+    monkeypatch.setattr(price_agent, "intraday", store)
+    monkeypatch.setattr(price_agent, "providers", QuoteProviders(timestamp=1760630400.0))
+    agent.response_cache.invalidate()
+    try:
+        for _ in range(3):
+            assert price_agent.execute({"ticker": "INTRA"})["current_price"] == 50.0
+    finally:
+        agent.response_cache.invalidate()
+
+    assert store.counters["quotes"] == 1 and store.counters["repeats"] == 2
+    assert store.latest("INTRA")["start"] == "2025-10-16T16:00:00+00:00"  # The quote's time, not now
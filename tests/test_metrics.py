@@ -0,0 +1,68 @@
+import re
+
+import pytest
+
+import agent
+
+class EchoAgent(agent.BaseAgent):
+    def __init__(self):
+        super().__init__("echo")
+
+    def execute(self, context):
+        if context.get("fail"):
+            return {"error": "failed"}
+        return {"echo": context["value"]}
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    registry = agent.Metrics(buckets=(0.1, 1.0))
+    monkeypatch.setattr(agent, "metrics", registry)
+    return registry
+
+def samples(text):
+    """{metric name with labels: value} for every sample line"""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+def types(text):
+    return dict(re.findall(r"^# TYPE (\S+) (\w+)$", text, re.MULTILINE))
+
+def test_agent_executions_are_timed_and_counted(fresh_metrics):
+    echo = EchoAgent()
+    echo.execute({"value": 1})
+    echo.execute({"value": 2})
+    echo.execute({"fail": True})
+    text = fresh_metrics.render()
+    assert types(text) == {"stock_analysis_agent_executions_total": "counter",
+                           "stock_analysis_agent_execute_seconds": "histogram"}
+    found = samples(text)
+    assert found['stock_analysis_agent_executions_total{agent="echo",status="ok"}'] == 2
+    assert found['stock_analysis_agent_executions_total{agent="echo",status="error"}'] == 1
+    assert found['stock_analysis_agent_execute_seconds_bucket{agent="echo",le="0.1"}'] == 3
+    assert found['stock_analysis_agent_execute_seconds_bucket{agent="echo",le="+Inf"}'] == 3
+    assert found['stock_analysis_agent_execute_seconds_count{agent="echo"}'] == 3
+    assert 0 <= found['stock_analysis_agent_execute_seconds_sum{agent="echo"}'] < 0.1
+
+def test_histogram_buckets_are_cumulative(fresh_metrics):
+    for seconds in (0.05, 0.5, 5.0):
+        fresh_metrics.observe("upstream_request_seconds", seconds, {"function": "GLOBAL_QUOTE"})
+    found = samples(fresh_metrics.render())
+    buckets = [found[f'stock_analysis_upstream_request_seconds_bucket{{function="GLOBAL_QUOTE",le="{le}"}}']
+               for le in ("0.1", "1.0", "+Inf")]
+    assert buckets == [1, 2, 3]
+    assert found['stock_analysis_upstream_request_seconds_sum{function="GLOBAL_QUOTE"}'] == 5.55
+
+def test_metrics_endpoint(fresh_metrics):
+    EchoAgent().execute({"value": 1})
+    response = agent.app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    declared = types(text)
+    assert declared["stock_analysis_agent_execute_seconds"] == "histogram"
+    assert declared["stock_analysis_agent_executions_total"] == "counter"
+    for gauge in ("cache_hits", "rate_limiter_minute_tokens", "admission_in_flight", "async_admission_in_flight",
+                  "news_store_articles", "intraday_bars_tickers"):
+        assert declared.get(f"stock_analysis_{gauge}") == "gauge", gauge
+    # Every sample name is a valid Prometheus metric name
+    assert all(re.fullmatch(r"[a-zA-Z_:][a-zA-Z0-9_:]*(\{.*\})?", name) for name in samples(text))
@@ -0,0 +1,27 @@
+import agent
+
+def article(url, published, tickers=None):
+    return agent.NewsItem(title=f"Story {url}", summary="", url=url, time_published=published,
+                          sentiment="Neutral", sentiment_score=0.0, tickers=tickers or {})
+
+def test_time_from_tracks_newest_fetched_article():
+    store = agent.NewsStore()
+    assert store.time_from("AAPL") is None
+    store.ingest("AAPL", [article("a", "20261015T093000"), article("b", "20261016T141500")])
+    assert store.time_from("AAPL") == "20261016T1415"
+
+def test_linked_articles_do_not_advance_time_from():
+    store = agent.NewsStore()
+    store.ingest("AAPL", [article("a", "20261016T141500", {"MSFT": (0.2, 0.5)})])
+    assert [found.url for found in store.query("MSFT")] == ["a"]
+    assert store.time_from("MSFT") is None  # MSFT's own older news hasn't been fetched yet
+
+    store.ingest("MSFT", [article("m", "20261014T080000")])
+    assert store.time_from("MSFT") == "20261014T0800"
+
+def test_duplicate_in_own_fetch_advances_time_from():
+    store = agent.NewsStore()
+    store.ingest("AAPL", [article("a", "20261016T141500", {"MSFT": (0.2, 0.5)})])
+    store.ingest("MSFT", [article("a", "20261016T141500")])
+    assert store.counters["duplicates"] == 1
+    assert store.time_from("MSFT") == "20261016T1415"
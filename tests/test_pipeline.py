@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import agent
+
+class SleepAgent(agent.BaseAgent):
+    """Sleeps, then writes value under key"""
+
+    def __init__(self, name, key, value=1, delay=0.0, log=None):
+        super().__init__(name)
+        self.key = key
+        self.value = value
+        self.delay = delay
+        self.log = log if log is not None else []
+
+    def execute(self, context):
+        self.log.append(self.name)
+        time.sleep(self.delay)
+        return {self.key: self.value}
+
+def step(name, inputs, outputs, **kwargs):
+    agent_kwargs = {k: kwargs.pop(k) for k in ("delay", "log", "value") if k in kwargs}
+    return agent.AgentStep(name, SleepAgent(name, outputs[0], **agent_kwargs), inputs=inputs, outputs=outputs,
+                           result_key=f"{name}_info", **kwargs)
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_dependency_order(parallel):
+    log = []
+    steps = [
+        step("c", ["a_out", "b_out"], ["c_out"], log=log),
+        step("a", ["query"], ["a_out"], log=log, delay=0.05),
+        step("b", ["query"], ["b_out"], log=log),
+    ]
+    pipeline = agent.AgentPipeline(steps, parallel=parallel)
+    context = {"query": "x"}
+    results = pipeline.run(context)
+
+    assert log[-1] == "c"
+    assert set(results) == {"a_info", "b_info", "c_info"}
+    assert context["c_out"] == 1
+
+def test_dependency_cycle_rejected():
+    with pytest.raises(ValueError):
+        agent.AgentPipeline([step("a", ["b_out"], ["a_out"]), step("b", ["a_out"], ["b_out"])])
+
+def test_timeout_counts_from_step_start():
+    # One worker: the second step queues behind the first for longer than its own timeout
+    steps = [step(name, ["query"], [f"{name}_out"], delay=0.3, timeout=0.5) for name in ("a", "b")]
+    pipeline = agent.AgentPipeline(steps, max_workers=1)
+    results = pipeline.run({"query": "x"})
+    assert results == {"a_info": {"a_out": 1}, "b_info": {"b_out": 1}}
+
+def test_timeout_gives_partial_result():
+    steps = [step("slow", ["query"], ["slow_out"], delay=1.0, timeout=0.1), step("fast", ["query"], ["fast_out"])]
+    started = time.monotonic()
+    results = agent.AgentPipeline(steps).run({"query": "x"})
+    assert time.monotonic() - started < 0.8
+    assert results["slow_info"]["error"].startswith("Timed out")
+    assert results["fast_info"] == {"fast_out": 1}
+
+def test_required_step_failure_raises():
+    steps = [step("slow", ["query"], ["slow_out"], delay=0.5, timeout=0.05, required=True)]
+    with pytest.raises(agent.PipelineError):
+        agent.AgentPipeline(steps).run({"query": "x"})
+
+def test_partial_results_disabled_raises():
+    steps = [step("slow", ["query"], ["slow_out"], delay=0.5, timeout=0.05)]
+    with pytest.raises(agent.PipelineError):
+        agent.AgentPipeline(steps, partial_results=False).run({"query": "x"})
+
+def test_steps_skipped_after_deadline():
+    log = []
+    steps = [step("a", ["query"], ["a_out"], log=log)]
+    results = agent.AgentPipeline(steps).run({"query": "x", "deadline": time.monotonic() - 1})
+    assert results["a_info"] == {"error": "Skipped: request deadline passed"}
+    assert log == []
+
+def test_deadline_while_queued():
+    release = threading.Event()
+
+    class Blocker(agent.BaseAgent):
+        def execute(self, context):
+            release.wait(2)
+            return {"a_out": 1}
+
+    steps = [agent.AgentStep("a", Blocker("a"), ["query"], ["a_out"], "a_info", timeout=None),
+             step("b", ["query"], ["b_out"], timeout=None)]
+    pipeline = agent.AgentPipeline(steps, max_workers=1)
+    results = pipeline.run({"query": "x", "deadline": time.monotonic() + 0.2})
+    release.set()
+    assert results["b_info"] == {"error": "Skipped: request deadline passed while queued"}
+
+def test_async_blocking_step_timed_from_start():
+    steps = [step(name, ["query"], [f"{name}_out"], delay=0.3, timeout=0.5) for name in ("a", "b")]
+    pipeline = agent.AgentPipeline(steps, parallel=True)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(agent.ThreadPoolExecutor(max_workers=1))
+        return await pipeline.run_async({"query": "x"})
+
+    assert asyncio.run(main()) == {"a_info": {"a_out": 1}, "b_info": {"b_out": 1}}
+
+class DeadlineAgent(agent.BaseAgent):
+    """Reports the request deadline in force while it runs"""
+
+    blocking = False
+
+    def __init__(self):
+        super().__init__("deadline")
+
+    def execute(self, context):
+        return {"deadline": agent.request_deadline.get()}
+
+    async def execute_async(self, context):
+        return {"deadline": agent.request_deadline.get()}
+
+def test_agent_keeps_an_inherited_deadline():
+    deadline_agent = DeadlineAgent()
+    inherited = time.monotonic() + 5
+    token = agent.request_deadline.set(inherited)
+    try:
+        assert deadline_agent.execute({"ticker": "AAPL"})["deadline"] == inherited
+        assert asyncio.run(deadline_agent.execute_async({"ticker": "AAPL"}))["deadline"] == inherited
+        assert deadline_agent.execute({"deadline": inherited - 1})["deadline"] == inherited - 1
+        assert agent.request_deadline.get() == inherited
+    finally:
+        agent.request_deadline.reset(token)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import agent
+
+def bars(*rows):
+    """DailyBars from (date, close) pairs"""
+    return {date: [close, close, close, close, 1000.0] for date, close in rows}
+
+@pytest.fixture
+def store():
+    return agent.PriceHistoryStore()
+
+def test_merge_appends_newer_bars(store):
+    series = store._merge(None, bars(("2026-10-13", 100.0), ("2026-10-12", 99.0)))
+    series = store._merge(series, bars(("2026-10-13", 100.0), ("2026-10-14", 101.0), ("2026-10-12", 50.0)))
+    assert [str(d) for d in series.dates] == ["2026-10-12", "2026-10-13", "2026-10-14"]
+    assert series.close.tolist() == [99.0, 100.0, 101.0]
+
+def test_merge_replaces_partial_last_bar(store):
+    series = store._merge(None, bars(("2026-10-15", 100.0), ("2026-10-16", 105.0)))
+    series = store._merge(series, bars(("2026-10-15", 100.0), ("2026-10-16", 110.0)))
+    assert len(series) == 2
+    assert series.close[-1] == 110.0
+    assert series.change("1D")["end_price"] == 110.0
+
+def test_merge_keeps_series_when_nothing_changed(store):
+    series = store._merge(None, bars(("2026-10-15", 100.0), ("2026-10-16", 105.0)))
+    assert store._merge(series, bars(("2026-10-16", 105.0))) is series
+
+def test_get_refetches_after_expiry(store):
+    responses = iter([bars(("2026-10-15", 100.0), ("2026-10-16", 105.0)), bars(("2026-10-16", 110.0))])
+    series = store.get("TSLA", lambda ticker, outputsize: next(responses))
+    assert series.close[-1] == 105.0
+    store.expires["TSLA"] = 0
+    assert store.get("TSLA", lambda ticker, outputsize: next(responses)).close[-1] == 110.0
+    assert np.array_equal(store.peek("TSLA").close, [100.0, 110.0])
@@ -0,0 +1,186 @@
+import json
+import os
+import time
+
+import pytest
+
+import agent
+
+def record_fixture(fixture_dir, params, body, status_code=200):
+    path = agent.fixture_path(str(fixture_dir), params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "status_code": status_code, "body": json.dumps(body)}, f)
+
+@pytest.fixture
+def replay(tmp_path):
+    previous = agent.upstream_client
+    agent.upstream_client = None  # Replaced below; use_upstream_client would close the shared client
+
+    def install(**kwargs):
+        agent.upstream_client = agent.ReplayUpstreamClient(fixture_dir=str(tmp_path), **kwargs)
+        return agent.upstream_client
+
+    yield tmp_path, install
+    agent.upstream_client = previous
+
+def test_yahoo_requests_go_through_the_shared_upstream_client(replay):
+    fixture_dir, install = replay
+    url = agent.YAHOO_CHART_URL.format(ticker="MSFT")
+    record_fixture(fixture_dir, agent.fixture_params({"range": "1d", "interval": "1d"}, url), {
+        "chart": {"result": [{"meta": {"regularMarketPrice": 410.5, "regularMarketTime": 1760644800,
+                                       "exchangeTimezoneName": "America/New_York", "regularMarketVolume": 1200}}]}
+    })
+    client = install()
+
+    quote = agent.YahooFinanceProvider().quote("MSFT")
+    assert (quote.price, quote.provider, quote.volume, quote.timestamp) == (410.5, "yahoo", 1200.0, 1760644800.0)
+    assert client.counters == {"requests": 1, "errors": 0, "retries": 0, "missing": 0}
+    assert 'function="yahoo_global_quote",status="200"' in agent.metrics.render()
+
+    # Another ticker's chart is a different fixture, not a replay of this one
+    with pytest.raises(agent.SymbolNotFound):
+        agent.YahooFinanceProvider().quote("AAPL")
+    assert client.counters["missing"] == 1
+
+class RawResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.text)
+
+@pytest.mark.parametrize("body, message", [("<html>Too many requests</html>", "JSON parsing error"),
+                                           ("[]", "Unexpected response format")])
+def test_yahoo_undecodable_body_is_a_provider_error(monkeypatch, body, message):
+    monkeypatch.setattr(agent, "yahoo_get", lambda function, url, params: RawResponse(body))
+    provider = agent.YahooFinanceProvider()
+    for call in (lambda: provider.quote("MSFT"), lambda: provider.news("MSFT", None)):
+        with pytest.raises(agent.ProviderError, match=message) as raised:
+            call()
+        assert not isinstance(raised.value, agent.SymbolNotFound)
+
+class FakeProvider(agent.MarketDataProvider):
+    def __init__(self, name, answer=None, error=None, delay=0.0, limiter=None):
+        self.name = name
+        self.answer = answer
+        self.error = error
+        self.delay = delay
+        self.limiter = limiter
+        self.calls = 0
+
+    def quote(self, ticker):
+        self.calls += 1
+        if self.limiter is not None:
+            self.limiter.acquire()
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+def test_call_queued_on_rate_limiter_is_not_hedged():
+    limiter = agent.RateLimiter(per_minute=120, per_day=10 ** 6)
+    for _ in range(120):
+        limiter.acquire()  # Drain the minute bucket so the next call waits about half a second
+    primary = FakeProvider("primary", answer="limited", limiter=limiter)
+    backup = FakeProvider("backup", answer="backup")
+    router = agent.ProviderRouter([primary, backup], hedge_after={"quote": 0.1})
+
+    assert router.call("quote", "AAPL") == "limited"
+    assert backup.calls == 0
+    assert router.counters["hedges_skipped"] == 1
+    assert router.counters["hedged"] == 0
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = agent.CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # One trial at a time
+    breaker.record(False)  # A failed trial restarts the cool-down
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_abandoned_trial_frees_the_half_open_slot():
+    breaker = agent.CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+def test_failover_in_provider_order():
+    first = FakeProvider("first", error=agent.ProviderError("down"))
+    second = FakeProvider("second", error=agent.ProviderError("down too"))
+    third = FakeProvider("third", answer="third")
+    router = agent.ProviderRouter([first, second, third], hedge_after={})
+
+    assert router.call("quote", "AAPL") == "third"
+    assert (first.calls, second.calls, third.calls) == (1, 1, 1)
+    assert router.counters["failovers"] == 1
+    assert router.stats()["providers"]["first"]["failures"] == 1
+
+def test_open_circuit_is_skipped_and_all_failures_reported():
+    first = FakeProvider("first", error=agent.ProviderError("down"))
+    second = FakeProvider("second", error=agent.ProviderError("also down"))
+    router = agent.ProviderRouter([first, second], hedge_after={})
+    router.breakers["first"] = agent.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    with pytest.raises(agent.ProviderError, match="first: down; second: also down"):
+        router.call("quote", "AAPL")
+    assert router.breakers["first"].state == "open"
+    with pytest.raises(agent.ProviderError):
+        router.call("quote", "AAPL")
+    assert first.calls == 1
+    assert router.counters["short_circuited"] == 1
+
+def test_slow_call_is_hedged_and_first_answer_wins():
+    slow = FakeProvider("slow", answer="slow", delay=0.5)
+    fast = FakeProvider("fast", answer="fast")
+    router = agent.ProviderRouter([slow, fast], hedge_after={"quote": 0.05})
+
+    start = time.monotonic()
+    assert router.call("quote", "AAPL") == "fast"
+    assert time.monotonic() - start < 0.4
+    assert router.counters["hedged"] == 1 and router.counters["hedge_wins"] == 1
+
+def test_quick_call_is_not_hedged():
+    primary = FakeProvider("primary", answer="primary", delay=0.01)
+    backup = FakeProvider("backup", answer="backup")
+    router = agent.ProviderRouter([primary, backup], hedge_after={"quote": 0.5})
+    assert router.call("quote", "AAPL") == "primary"
+    assert backup.calls == 0 and router.counters["hedged"] == 0
+
+@pytest.mark.parametrize("error", [agent.DeadlineExceeded("late"), agent.SymbolNotFound("no such symbol")])
+def test_deadline_and_unknown_symbol_do_not_count_against_breaker(error):
+    primary = FakeProvider("primary", error=error)
+    router = agent.ProviderRouter([primary], hedge_after={})
+    router.breakers["primary"] = agent.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    for _ in range(3):
+        with pytest.raises(agent.ProviderError):
+            router.call("quote", "AAPL")
+    assert router.breakers["primary"].state == "closed"
+    assert primary.calls == 3
+
+def test_call_past_request_deadline_does_not_count_against_breaker():
+    primary = FakeProvider("primary", error=agent.ProviderError("timed out"))
+    router = agent.ProviderRouter([primary], hedge_after={})
+    router.breakers["primary"] = agent.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    token = agent.request_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(agent.ProviderError):
+            router.call("quote", "AAPL")
+    finally:
+        agent.request_deadline.reset(token)
+    assert router.breakers["primary"].state == "closed"
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+import agent
+
+class PriceAgent:
+    """Serves the current price per ticker; None makes the poll fail"""
+
+    def __init__(self, prices):
+        self.prices = dict(prices)
+        self.polls = {}
+        self.lock = threading.Lock()
+
+    def execute(self, context):
+        ticker = context["ticker"]
+        with self.lock:
+            self.polls[ticker] = self.polls.get(ticker, 0) + 1
+            price = self.prices.get(ticker)
+        if price is None:
+            return {"ticker": ticker, "current_price": 1.0, "error": "unavailable"}
+        return {"ticker": ticker, "current_price": price, "last_updated": "2026-10-16"}
+
+class Limiter:
+    per_minute = 1000000
+
+def wait_until(condition, timeout=2.0):
+    give_up = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < give_up, "timed out"
+        time.sleep(0.005)
+
+@pytest.fixture
+def hub(monkeypatch):
+    monkeypatch.setattr(agent, "alpha_vantage_limiter", Limiter())
+    prices = PriceAgent({"AAPL": 190.0, "MSFT": 410.0})
+    hub = agent.QuoteHub(prices, interval=0.01, idle_timeout=0.1)
+    yield hub
+    hub.stop()
+
+def test_one_poller_fans_out_to_every_subscriber(hub):
+    first, second = hub.subscribe(["AAPL"]), hub.subscribe(["AAPL", "MSFT"])
+    assert hub.stats()["watched_tickers"] == 2
+    assert first.next(2.0)["current_price"] == 190.0
+    assert {second.next(2.0)["ticker"], second.next(2.0)["ticker"]} == {"AAPL", "MSFT"}
+
+    hub.price_agent.prices["AAPL"] = 191.0
+    assert first.next(2.0)["current_price"] == 191.0
+    assert second.next(2.0)["current_price"] == 191.0
+    assert first.next(0.05) is None  # Unchanged prices aren't sent again
+    assert hub.stats()["subscriptions"] == 2
+
+def test_new_subscriber_starts_with_the_snapshot(hub):
+    hub.subscribe(["AAPL"])
+    wait_until(lambda: "AAPL" in hub.get_snapshot())
+    late = hub.subscribe(["AAPL"])
+    assert late.updates.get_nowait()["current_price"] == 190.0
+    assert hub.stats()["watched_tickers"] == 1
+
+def test_failed_polls_are_not_published(hub):
+    hub.price_agent.prices["AAPL"] = None
+    subscription = hub.subscribe(["AAPL"])
+    wait_until(lambda: hub.counters["failed_polls"] >= 2)
+    assert subscription.next(0.05) is None
+    assert hub.get_snapshot() == {}
+
+def test_idle_poller_stops(hub):
+    subscription = hub.subscribe(["AAPL"])
+    wait_until(lambda: "AAPL" in hub.get_snapshot())
+    hub.unsubscribe(subscription)
+    wait_until(lambda: hub.stats()["watched_tickers"] == 0)
+    polls = hub.price_agent.polls["AAPL"]
+    time.sleep(0.1)
+    assert hub.price_agent.polls["AAPL"] == polls
+    assert hub.get_snapshot() == {}
+
+def test_resubscribing_keeps_the_poller(hub):
+    subscription = hub.subscribe(["AAPL"])
+    hub.unsubscribe(subscription)
+    hub.subscribe(["AAPL"])
+    time.sleep(0.2)  # Longer than idle_timeout
+    assert hub.stats()["watched_tickers"] == 1
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+import agent
+
+class GatedBackend(agent.LocalBackend):
+    """Hands out only the tokens a test releases"""
+
+    def __init__(self):
+        super().__init__()
+        self.tokens = 0
+
+    def take_tokens(self, name, limits, amount=1.0):
+        with self.lock:
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            return 0.01
+
+    def bucket_levels(self, name, limits):
+        with self.lock:
+            return [float(self.tokens)] * len(limits)
+
+def wait_queued(limiter, depth):
+    for _ in range(200):
+        with limiter.condition:
+            if len(limiter.queue) == depth:
+                return
+        time.sleep(0.005)
+    raise AssertionError(f"Queue never reached {depth}")
+
+def test_waiters_admitted_in_priority_order():
+    backend = GatedBackend()
+    limiter = agent.RateLimiter(per_minute=600, per_day=10000, backend=backend)
+    admitted = []
+    threads = []
+    for depth, priority in enumerate([agent.PRIORITY_BACKGROUND, agent.PRIORITY_NORMAL,
+                                      agent.PRIORITY_INTERACTIVE, agent.PRIORITY_NORMAL], start=1):
+        thread = threading.Thread(target=lambda p=priority: (limiter.acquire(p), admitted.append(p)))
+        thread.start()
+        threads.append(thread)
+        wait_queued(limiter, depth)
+
+    with backend.lock:
+        backend.tokens = 4
+    for thread in threads:
+        thread.join(5)
+    assert admitted == [agent.PRIORITY_INTERACTIVE, agent.PRIORITY_NORMAL,
+                        agent.PRIORITY_NORMAL, agent.PRIORITY_BACKGROUND]
+    assert limiter.counters["acquired"] == 4
+
+def test_fails_fast_when_estimated_wait_exceeds_deadline():
+    limiter = agent.RateLimiter(per_minute=1, per_day=100)
+    assert limiter.acquire(deadline=time.monotonic() + 1) == pytest.approx(0, abs=0.05)
+
+    start = time.monotonic()
+    with pytest.raises(agent.RateLimitExceeded, match="exceeds deadline"):
+        limiter.acquire(deadline=time.monotonic() + 1)
+    assert time.monotonic() - start < 0.5  # Rejected up front, not after waiting out the deadline
+    assert limiter.counters["rejected"] == 1
+    assert limiter.queue == []
+
+def test_full_queue_rejects_new_callers():
+    backend = GatedBackend()
+    limiter = agent.RateLimiter(per_minute=600, per_day=10000, max_queue=1, backend=backend)
+    waiter = threading.Thread(target=limiter.acquire)
+    waiter.start()
+    wait_queued(limiter, 1)
+
+    with pytest.raises(agent.RateLimitExceeded, match="queue is full"):
+        limiter.acquire()
+    with backend.lock:
+        backend.tokens = 1
+    waiter.join(5)
+    assert limiter.counters == {"acquired": 1, "rejected": 1, "throttled": 0}
+
+def test_report_throttled_empties_minute_bucket():
+    limiter = agent.RateLimiter(per_minute=5, per_day=100)
+    limiter.report_throttled()
+    assert limiter.available() <= 0
+    with pytest.raises(agent.RateLimitExceeded):
+        limiter.acquire(deadline=time.monotonic() + 5)
+    assert limiter.counters["throttled"] == 1
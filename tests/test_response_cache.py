@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import agent
+
+def with_deadline(seconds, function, *args):
+    token = agent.request_deadline.set(time.monotonic() + seconds)
+    try:
+        return function(*args)
+    finally:
+        agent.request_deadline.reset(token)
+
+def test_shared_lock_wait_bounded_by_request_deadline():
+    backend = agent.LocalBackend()
+    cache = agent.ResponseCache(backend=backend)
+    key = ("GLOBAL_QUOTE", "TSLA")
+    # Another worker holds the load for this key
+    backend.acquire("lock:" + cache._shared_key(key), agent.SHARED_LOCK_TIMEOUT)
+
+    started = time.monotonic()
+    with pytest.raises(agent.DeadlineExceeded):
+        with_deadline(0.2, cache.get_or_load, key, lambda: {"price": 1.0}, 60)
+    assert time.monotonic() - started < 1.0
+
+def test_ttl_expiry():
+    cache = agent.ResponseCache()
+    calls = []
+    loader = lambda: calls.append(1) or {"price": len(calls)}
+    assert cache.get_or_load(("K",), loader, 0.05) == {"price": 1}
+    assert cache.get_or_load(("K",), loader, 0.05) == {"price": 1}
+    time.sleep(0.06)
+    assert cache.get_or_load(("K",), loader, 0.05) == {"price": 2}
+    assert cache.stats()["hits"] == 1
+
+def test_single_flight_threads():
+    cache = agent.ResponseCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"price": 1.0}
+
+    with agent.ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(lambda _: cache.get_or_load(("K",), loader, 60), range(20)))
+    assert len(calls) == 1
+    assert all(result == {"price": 1.0} for result in results)
+
+def test_single_flight_shared_by_threads_and_coroutines():
+    cache = agent.ResponseCache()
+    calls = []
+
+    def loader():
+        calls.append("sync")
+        time.sleep(0.2)
+        return {"price": 1.0}
+
+    async def async_loader():
+        calls.append("async")
+        await asyncio.sleep(0.2)
+        return {"price": 2.0}
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        thread_result = loop.run_in_executor(None, cache.get_or_load, ("K",), loader, 60)
+        await asyncio.sleep(0.05)  # The thread leads the load
+        results = await asyncio.gather(*[cache.get_or_load_async(("K",), async_loader, 60) for _ in range(10)])
+        return [await thread_result] + results
+
+    results = asyncio.run(main())
+    assert calls == ["sync"]
+    assert results == [{"price": 1.0}] * 11
+
+def test_async_leader_shared_with_threads():
+    cache = agent.ResponseCache()
+    calls = []
+
+    async def async_loader():
+        calls.append("async")
+        await asyncio.sleep(0.2)
+        return {"price": 2.0}
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_load_async(("K",), async_loader, 60))
+        await asyncio.sleep(0.05)
+        follower = asyncio.get_running_loop().run_in_executor(
+            None, cache.get_or_load, ("K",), lambda: calls.append("sync") or {"price": 1.0}, 60
+        )
+        return await leader, await follower
+
+    assert asyncio.run(main()) == ({"price": 2.0}, {"price": 2.0})
+    assert calls == ["async"]
+
+def test_errors_reach_followers_and_are_not_cached():
+    cache = agent.ResponseCache()
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    with agent.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(cache.get_or_load, ("K",), failing, 60) for _ in range(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert cache.get_or_load(("K",), lambda: {"price": 3.0}, 60) == {"price": 3.0}
+
+def test_stale_value_served_when_reload_fails():
+    cache = agent.ResponseCache()
+    cache.get_or_load(("K",), lambda: {"price": 1.0}, 0.01)
+    time.sleep(0.02)
+
+    def failing():
+        raise RuntimeError("upstream down")
+
+    assert cache.get_or_load(("K",), failing, 60) == {"price": 1.0}
+    assert asyncio.run(cache.get_or_load_async(("K",), failing_async, 60)) == {"price": 1.0}
+    assert cache.stats()["stale_served"] == 2
+
+async def failing_async():
+    raise RuntimeError("upstream down")
+
+def test_follower_of_cancelled_async_leader_loads_itself():
+    cache = agent.ResponseCache()
+
+    async def slow():
+        await asyncio.sleep(1)
+        return {"price": 1.0}
+
+    async def fast():
+        return {"price": 2.0}
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_load_async(("K",), slow, 60))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.get_or_load_async(("K",), fast, 60))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == {"price": 2.0}
+
+def test_size_estimate_close_to_serialized_size():
+    bars = {f"2026-01-{i:04d}": [100.0 + i, 101.0, 99.0, 100.5, 1e6] for i in range(2000)}
+    actual = len(json.dumps(bars))
+    assert abs(agent.ResponseCache._size(bars) - actual) < actual * 0.1
+
+def test_waiting_thread_bounded_by_request_deadline():
+    cache = agent.ResponseCache()
+    key = ("GLOBAL_QUOTE", "TSLA")
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get_or_load, args=(key, lambda: release.wait() and {"price": 1.0}, 60))
+    leader.start()
+    while key not in cache.flights:
+        time.sleep(0.001)
+    try:
+        started = time.monotonic()
+        with pytest.raises(agent.DeadlineExceeded):
+            with_deadline(0.1, cache.get_or_load, key, lambda: {"price": 2.0}, 60)
+        assert time.monotonic() - started < 1.0
+        assert cache.stats()["wait_timeouts"] == 1
+    finally:
+        release.set()
+        leader.join()
+
+def test_waiting_thread_serves_stale_at_its_deadline():
+    cache = agent.ResponseCache()
+    key = ("GLOBAL_QUOTE", "TSLA")
+    cache.put(key, {"price": 0.5}, 0.01)
+    time.sleep(0.02)  # Expired, but within CACHE_STALE_GRACE
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get_or_load, args=(key, lambda: release.wait() and {"price": 1.0}, 60))
+    leader.start()
+    while key not in cache.flights:
+        time.sleep(0.001)
+    try:
+        assert with_deadline(0.1, cache.get_or_load, key, lambda: {"price": 2.0}, 60) == {"price": 0.5}
+        assert cache.stats()["stale_served"] == 1
+    finally:
+        release.set()
+        leader.join()
+    assert cache.get_or_load(key, lambda: {"price": 3.0}, 60) == {"price": 1.0}
@@ -0,0 +1,32 @@
+import numpy as np
+
+import agent
+
+def test_grows_past_initial_capacity(sentiment):
+    screener = agent.Screener(sentiment, capacity=4)
+    tickers = [f"T{i}" for i in range(10)]
+    for i, ticker in enumerate(tickers):
+        screener.update_quote(ticker, 100.0 + i)
+
+    assert screener.stats() == {"tickers": 10, "capacity": 16}
+    result = screener.screen(sort="price", order="asc", limit=len(tickers))
+    assert [row["ticker"] for row in result["results"]] == tickers
+    assert [row["price"] for row in result["results"]] == [100.0 + i for i in range(10)]
+
+def test_default_capacity_overflow(sentiment):
+    screener = agent.Screener(sentiment)
+    count = agent.SCREENER_INITIAL_CAPACITY + 1
+    for i in range(count):
+        screener.update_quote(f"T{i}", float(i))
+    assert screener.values[screener.rows[f"T{count - 1}"], screener.columns["price"]] == count - 1
+
+def test_filter_and_top_k(sentiment):
+    screener = agent.Screener(sentiment)
+    prices = np.random.default_rng(0).uniform(1, 500, 200)
+    for i, price in enumerate(prices):
+        screener.update_quote(f"T{i}", float(price))
+
+    result = screener.screen([("price", ">", 250.0)], sort="price", limit=5)
+    assert result["matches"] == int((prices > 250).sum())
+    expected = sorted(prices[prices > 250], reverse=True)[:5]
+    assert [row["price"] for row in result["results"]] == [round(float(p), 4) for p in expected]
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import agent
+
+NOW = 1760630400.0  # 2025-10-16T16:00:00Z, on a bucket boundary
+
+class Clock:
+    """Stands in for the time module inside agent, with a settable wall clock"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(NOW)
+    monkeypatch.setattr(agent, "time", clock)
+    return clock
+
+def published(seconds_ago):
+    return datetime.fromtimestamp(NOW - seconds_ago, timezone.utc).strftime(agent.NEWS_TIME_FORMAT)
+
+def test_window_sums(clock, sentiment):
+    sentiment.add("AAPL", NOW - 600, 0.5, relevance=1.0)  # Bullish, inside every window
+    sentiment.add("AAPL", NOW - 2 * 3600, -0.4, relevance=0.5)  # Bearish, past the hour
+    sentiment.add("AAPL", NOW - 3 * 24 * 3600, 0.05, relevance=1.0)  # Neutral, only in the week
+    sentiment.add("MSFT", NOW - 600, -0.9)
+    trend = sentiment.snapshot("AAPL")
+    assert trend["1h"] == {"articles": 1, "bullish": 1, "bearish": 0, "score": 0.5}
+    assert trend["24h"] == {"articles": 2, "bullish": 1, "bearish": 1, "score": round((0.5 - 0.2) / 1.5, 4)}
+    assert trend["7d"]["articles"] == 3
+    assert trend["7d"]["score"] == round((0.5 - 0.2 + 0.05) / 2.5, 4)
+    assert sentiment.snapshot("NVDA")["7d"] == {"articles": 0, "bullish": 0, "bearish": 0, "score": None}
+
+def test_old_and_future_articles(clock, sentiment):
+    sentiment.add("AAPL", NOW - 8 * 24 * 3600, 0.5)  # Older than every window: ignored
+    sentiment.add("AAPL", NOW + 3600, 0.5)  # Future timestamps count as now
+    trend = sentiment.snapshot("AAPL")
+    assert (trend["1h"]["articles"], trend["7d"]["articles"]) == (1, 1)
+
+def test_windows_slide_without_new_news(clock, sentiment):
+    sentiment.add("AAPL", NOW - 600, 0.5)
+    sentiment.add("AAPL", NOW - 20 * 3600, -0.5)
+    clock.now += 3600
+    trend = sentiment.snapshot("AAPL")
+    assert (trend["1h"]["articles"], trend["24h"]["articles"], trend["7d"]["articles"]) == (0, 2, 2)
+    clock.now += 5 * 3600
+    trend = sentiment.snapshot("AAPL")
+    assert (trend["24h"]["articles"], trend["24h"]["bearish"], trend["7d"]["articles"]) == (1, 0, 2)
+    clock.now += 7 * 24 * 3600
+    assert sentiment.snapshot("AAPL")["7d"]["articles"] == 0
+    assert sentiment.tickers["AAPL"]["buckets"] == {}  # Expired buckets are dropped
+
+def test_duplicate_article_counted_once(clock, sentiment):
+    store = agent.NewsStore(sentiment)
+    item = agent.NewsItem(title="Apple ships", summary="New phones", url="https://example.com/apple",
+                          time_published=published(600), sentiment="Bullish", sentiment_score=0.4)
+    syndicated = agent.NewsItem(title="Apple ships", summary="New phones", url="https://mirror.example.com/apple",
+                                time_published=published(600), sentiment="Bullish", sentiment_score=0.4)
+    assert store.ingest("AAPL", [item]) == 1
+    assert store.ingest("AAPL", [item, syndicated]) == 0
+    assert sentiment.snapshot("AAPL")["1h"]["articles"] == 1
+
+def test_article_linking_another_ticker_counts_for_both(clock, sentiment):
+    store = agent.NewsStore(sentiment)
+    item = agent.NewsItem(title="Chip deal", summary="", url="https://example.com/deal", time_published=published(600),
+                          sentiment="Bullish", sentiment_score=0.3, tickers={"NVDA": (-0.3, 0.8)})
+    store.ingest("AAPL", [item])
+    store.ingest("NVDA", [item])  # Same article from NVDA's own fetch: already counted
+    assert sentiment.snapshot("AAPL")["1h"]["bullish"] == 1
+    assert sentiment.snapshot("NVDA")["1h"] == {"articles": 1, "bullish": 0, "bearish": 1, "score": -0.3}
@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import agent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def serve():
+    """serve_backend that shuts its servers down after the test"""
+    servers = []
+
+    def start(address="127.0.0.1:0", secret=None):
+        server = agent.serve_backend(address, secret=secret)
+        servers.append(server)
+        return "%s:%d" % server.server_address[:2]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_values_round_trip(serve):
+    client = agent.SocketBackend(serve(), secret=None)
+    quote = agent.Quote(price=190.0, last_updated="2026-10-16", market_status="CLOSED", provider="alpha_vantage",
+                        volume=1000.0, timestamp=1760644800.0)
+    client.set("cache:quote", quote, 60)
+    client.set("cache:series", {"2026-10-16": [1.0, 2.0, 0.5, 1.5, 100.0]}, 60)
+    value, remaining = client.get("cache:quote")
+    assert value == quote and isinstance(value, agent.Quote)
+    assert 0 < remaining <= 60
+    assert client.get("cache:series")[0] == {"2026-10-16": [1.0, 2.0, 0.5, 1.5, 100.0]}
+    client.delete("cache:quote")
+    assert client.get("cache:quote") is None
+
+def test_locks_need_their_token(serve):
+    address = serve()
+    first, second = agent.SocketBackend(address, secret=None), agent.SocketBackend(address, secret=None)
+    token = first.acquire("lock:AAPL", 30)
+    assert token
+    assert second.acquire("lock:AAPL", 30) is None
+    second.release("lock:AAPL", "not-the-token")
+    assert second.acquire("lock:AAPL", 30) is None
+    first.release("lock:AAPL", token)
+    assert second.acquire("lock:AAPL", 30)
+
+def test_token_buckets_are_shared(serve):
+    address = serve()
+    limits = [[2, 60]]
+    first, second = agent.SocketBackend(address, secret=None), agent.SocketBackend(address, secret=None)
+    assert first.take_tokens("alpha_vantage", limits) == 0
+    assert second.take_tokens("alpha_vantage", limits) == 0
+    assert first.take_tokens("alpha_vantage", limits) > 0
+
+def test_unknown_operations_are_rejected(serve):
+    client = agent.SocketBackend(serve(), secret=None)
+    with pytest.raises(Exception, match="Unknown operation"):
+        client._call("values")
+
+def test_secret_is_required_when_set(serve):
+    address = serve(secret="s3cret")
+    with pytest.raises(Exception, match="Unauthorized"):
+        agent.SocketBackend(address, secret=None).get("cache:key")
+    with pytest.raises(Exception, match="Unauthorized"):
+        agent.SocketBackend(address, secret="wrong").get("cache:key")
+    client = agent.SocketBackend(address, secret="s3cret")
+    client.set("cache:key", 1, 60)
+    assert client.get("cache:key")[0] == 1
+
+def test_refuses_non_loopback_without_secret(serve):
+    with pytest.raises(ValueError, match="without a secret"):
+        agent.serve_backend("0.0.0.0:0", secret=None)
+    with pytest.raises(ValueError, match="without a secret"):
+        agent.serve_backend(":0", secret=None)
+    assert serve("0.0.0.0:0", secret="s3cret")
+    assert serve("localhost:0")
+
+LOADER = """
+import json, os, sys, time
+import agent
+cache = agent.ResponseCache(backend=agent.SocketBackend(sys.argv[1], secret=None))
+def load():
+    with open(sys.argv[2], "a") as loads:
+        loads.write(f"{os.getpid()}\\n")
+    time.sleep(0.5)
+    return {"price": 42.0, "loaded_by": os.getpid()}
+print(json.dumps(cache.get_or_load(("GLOBAL_QUOTE", "XPROC"), load, 60)))
+"""
+
+def test_single_flight_across_processes(serve, tmp_path):
+    address = serve()
+    loads = tmp_path / "loads"
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    env.pop("STOCK_ANALYSIS_BACKEND", None)
+    workers = [subprocess.Popen([sys.executable, "-c", LOADER, address, str(loads)], cwd=ROOT, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+               for _ in range(3)]
+    results = [json.loads(worker.communicate(timeout=30)[0]) for worker in workers]
+    assert all(worker.returncode == 0 for worker in workers)
+    assert len(loads.read_text().split()) == 1
+    assert len({result["loaded_by"] for result in results}) == 1
@@ -0,0 +1,48 @@
+import agent
+
+ALIASES = {"tesla": "TSLA", "apple": "AAPL", "ford": "F"}
+
+LISTING = """symbol,name,exchange,assetType,ipoDate,delistingDate,status
+TSLA,Tesla Inc,NASDAQ,Stock,2010-06-29,null,Active
+AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active
+AMD,Advanced Micro Devices Inc,NASDAQ,Stock,1972-09-27,null,Active
+"""
+
+def resolve(resolver, query):
+    result = resolver.resolve(query)
+    return result["ticker"] if result else None
+
+def test_unknown_capitalised_words_rejected_without_listing():
+    resolver = agent.SymbolResolver(ALIASES, universe_path=None)
+    assert not resolver.listed
+    assert resolve(resolver, "NASA news") is None
+    assert resolve(resolver, "Tell me about FORD") == "F"  # By name, not as a symbol
+    assert resolve(resolver, "$XYZQ to the moon") is None
+    assert resolve(resolver, "How is TSLA doing?") == "TSLA"
+
+def test_listing_extends_known_symbols():
+    resolver = agent.SymbolResolver(ALIASES, universe_path=None, listing_csv=LISTING)
+    assert resolver.listed
+    assert resolve(resolver, "Is AMD a buy?") == "AMD"
+    assert resolve(resolver, "advanced micro devices earnings") == "AMD"
+    assert resolve(resolver, "NASA news") is None
+
+def test_listing_csv_stored_in_disk_cache(tmp_path):
+    cache = agent.DiskCache(path=str(tmp_path / "cache.sqlite3"), compact_interval=0)
+    params = {"function": "LISTING_STATUS", "apikey": "key"}
+    cache.store_response(params, agent.StoredResponse(LISTING))
+    assert cache.get(params).text == LISTING
+    cache.store_response({"function": "LISTING_STATUS", "state": "x"}, agent.StoredResponse('{"Information": "limit"}'))
+    assert cache.get({"function": "LISTING_STATUS", "state": "x"}) is None
+
+def test_listing_download_waits_for_start(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(agent, "alpha_vantage_get", lambda params, priority: fetched.append(params) or agent.StoredResponse(LISTING))
+    identify = agent.IdentifyTickerAgent()
+    assert identify.listing_thread is None and fetched == []
+
+    identify.start()
+    identify.start()
+    identify.listing_thread.join(5)
+    assert [params["function"] for params in fetched] == ["LISTING_STATUS"]
+    assert identify.resolver.listed
@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+import requests
+
+import agent
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_retried_5xx_responses_are_closed(monkeypatch):
+    client = agent.UpstreamClient(base_url="http://upstream.invalid/query", retries=2, backoff=0, backoff_jitter=0)
+    responses = [FakeResponse(503), FakeResponse(502), FakeResponse(200)]
+    served = iter(responses)
+    monkeypatch.setattr(client.session, "get", lambda *args, **kwargs: next(served))
+
+    assert client.get({"function": "GLOBAL_QUOTE"}) is responses[2]
+    assert [response.closed for response in responses] == [True, True, False]
+    assert client.counters["retries"] == 2
+
+def test_last_5xx_response_returned_open(monkeypatch):
+    client = agent.UpstreamClient(base_url="http://upstream.invalid/query", retries=1, backoff=0, backoff_jitter=0)
+    responses = [FakeResponse(500), FakeResponse(500)]
+    served = iter(responses)
+    monkeypatch.setattr(client.session, "get", lambda *args, **kwargs: next(served))
+
+    assert client.get({}).status_code == 500
+    assert [response.closed for response in responses] == [True, False]
+
+class RecordedResponse(FakeResponse):
+    def __init__(self, status_code, text):
+        super().__init__(status_code)
+        self.text = text
+
+QUOTE_PARAMS = {"function": "GLOBAL_QUOTE", "symbol": "AAPL", "apikey": "SECRET-KEY"}
+QUOTE_BODY = '{"Global Quote": {"05. price": "190.0"}}'
+
+@pytest.fixture
+def recorded(monkeypatch, tmp_path):
+    """A fixture directory holding one recorded quote"""
+    client = agent.RecordingUpstreamClient(fixture_dir=str(tmp_path), base_url="http://upstream.invalid/query")
+    monkeypatch.setattr(client.session, "get", lambda *args, **kwargs: RecordedResponse(200, QUOTE_BODY))
+    assert client.get(QUOTE_PARAMS).text == QUOTE_BODY
+    return tmp_path
+
+def test_recording_strips_the_api_key(recorded):
+    [path] = recorded.rglob("*.json")
+    assert path.parent.name == "GLOBAL_QUOTE"
+    assert "apikey" not in path.read_text() and "SECRET-KEY" not in path.read_text()
+    assert json.loads(path.read_text())["params"] == {"function": "GLOBAL_QUOTE", "symbol": "AAPL"}
+
+def test_replay_serves_the_recording(recorded):
+    client = agent.ReplayUpstreamClient(str(recorded))
+    response = client.get({**QUOTE_PARAMS, "apikey": "ANOTHER-KEY"})
+    assert (response.status_code, response.text) == (200, QUOTE_BODY)
+    missing = client.get({**QUOTE_PARAMS, "symbol": "MSFT"})
+    assert missing.status_code == 404
+    assert client.counters["missing"] == 1
+
+def test_replay_injects_latency(recorded):
+    client = agent.ReplayUpstreamClient(str(recorded), latency=0.05, jitter=0.05, seed=1)
+    started = time.monotonic()
+    client.get(QUOTE_PARAMS)
+    assert 0.05 <= time.monotonic() - started < 1.0
+
+def test_replay_injects_errors(recorded):
+    client = agent.ReplayUpstreamClient(str(recorded), error_rate=1.0)
+    with pytest.raises(requests.ConnectionError):
+        client.get(QUOTE_PARAMS)
+    assert (client.counters["errors"], client.in_flight) == (1, 0)
+
+def test_injected_errors_follow_the_seed(recorded):
+    def outcomes(seed):
+        client = agent.ReplayUpstreamClient(str(recorded), error_rate=0.5, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                client.get(QUOTE_PARAMS)
+                results.append(True)
+            except requests.ConnectionError:
+                results.append(False)
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert True in outcomes(7) and False in outcomes(7)